@@ -0,0 +1,166 @@
+import click
+from frappe.commands import pass_context
+
+
+@click.command("grand-reconcile-stock-entries")
+@click.option("--repair", is_flag=True, default=False, help="Queue Stock Entry creation for every note found")
+@pass_context
+def reconcile_stock_entries(context, repair=False):
+	"""List submitted Delivery Notes whose delivery-sheet Stock Entry is missing."""
+	import frappe
+
+	from grand.grand.delivery_note_events import reconcile_stock_entries
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			missing = reconcile_stock_entries(repair=repair)
+			for delivery_note in missing:
+				click.echo(f"{site}\t{delivery_note}")
+			action = "queued" if repair else "found"
+			click.secho(f"{site}: {len(missing)} Delivery Note(s) without Stock Entry {action}", fg="yellow")
+		finally:
+			frappe.destroy()
+
+
+@click.command("grand-create-deduction-jes")
+@click.option("--invoice", "invoices", multiple=True, help="Sales Invoice name; repeat for several")
+@click.option("--company")
+@click.option("--customer")
+@click.option("--from-date", help="Posting date from (YYYY-MM-DD)")
+@click.option("--to-date", help="Posting date to (YYYY-MM-DD)")
+@click.option(
+	"--submit", is_flag=True, default=False, help="Submit the Journal Entries instead of leaving Drafts"
+)
+@click.option("--now", is_flag=True, default=False, help="Run in this process and print the report")
+@pass_context
+def create_deduction_jes(context, invoices, company, customer, from_date, to_date, submit=False, now=False):
+	"""Create deduction Journal Entries for many submitted Sales Invoices."""
+	import frappe
+
+	from grand.sales_invoice_events import create_deduction_jes_job, get_invoices_for_deduction_jes
+
+	filters = {}
+	if company:
+		filters["company"] = company
+	if customer:
+		filters["customer"] = customer
+	if from_date or to_date:
+		filters["posting_date"] = ("between", [from_date or "1900-01-01", to_date or "2999-12-31"])
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			names = get_invoices_for_deduction_jes(invoices, filters, ignore_permissions=True)
+			if not now:
+				frappe.enqueue(
+					"grand.sales_invoice_events.create_deduction_jes_job",
+					queue="long",
+					timeout=3600,
+					invoices=names,
+					submit=int(submit),
+				)
+				click.secho(f"{site}: queued {len(names)} Sales Invoice(s)", fg="green")
+				continue
+
+			report = create_deduction_jes_job(names, submit=int(submit))
+			for name, result in report.items():
+				click.echo(
+					f"{name}\t{result['status']}\t{result.get('journal_entry') or result.get('error')}"
+				)
+			failed = sum(1 for result in report.values() if result["status"] == "Failed")
+			click.secho(f"{site}: {len(report)} processed, {failed} failed", fg="red" if failed else "green")
+		finally:
+			frappe.destroy()
+
+
+@click.command("grand-rebuild-lines-production")
+@click.option("--from-date", help="Only rebuild Lines dated on or after (YYYY-MM-DD)")
+@click.option("--to-date", help="Only rebuild Lines dated on or before (YYYY-MM-DD)")
+@pass_context
+def rebuild_lines_production(context, from_date=None, to_date=None):
+	"""Recompute the Lines Production aggregate from submitted Lines."""
+	import frappe
+
+	from grand.grand.doctype.lines_production.lines_production import rebuild_lines_production
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			keys = rebuild_lines_production(from_date, to_date)
+			frappe.db.commit()
+			click.secho(f"{site}: {keys} Lines Production row(s) rebuilt", fg="green")
+		finally:
+			frappe.destroy()
+
+
+@click.command("grand-sync-deduction-schema")
+@click.option("--dry-run", is_flag=True, default=False, help="Only list what is missing")
+@pass_context
+def sync_deduction_schema(context, dry_run=False):
+	"""Create missing deduction doctypes and Sales Invoice custom fields."""
+	import frappe
+
+	from grand.scripts.setup_deductions import sync_deduction_schema
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			changes = sync_deduction_schema(dry_run=dry_run)
+			pending = [
+				*(f"DocType {doctype}" for doctype in changes.doctypes),
+				*(
+					f"{doctype}.{df['fieldname']}"
+					for fields in (changes.doctype_fields, changes.custom_fields)
+					for doctype, dfs in fields.items()
+					for df in dfs
+				),
+			]
+			for change in pending:
+				click.echo(f"{site}\t{change}")
+			action = "missing" if dry_run else "created"
+			click.secho(f"{site}: {len(pending)} schema change(s) {action}", fg="green")
+		finally:
+			frappe.destroy()
+
+
+@click.command("grand-reconcile-deduction-jes")
+@click.option("--from-date", help="Posting date from (YYYY-MM-DD)")
+@click.option("--to-date", help="Posting date to (YYYY-MM-DD)")
+@click.option("--company")
+@click.option("--repair", is_flag=True, default=False, help="Create missing and submit draft Journal Entries")
+@pass_context
+def reconcile_deduction_jes(context, from_date=None, to_date=None, company=None, repair=False):
+	"""List submitted Sales Invoices whose deductions are missing, draft or mismatched in Journal Entries."""
+	import frappe
+
+	from grand.grand.deduction_reconciliation import reconcile_deduction_jes
+
+	for site in context.sites:
+		frappe.init(site=site)
+		frappe.connect()
+		try:
+			discrepancies = reconcile_deduction_jes(from_date, to_date, company, repair=repair)
+			for row in discrepancies:
+				repaired = f"\t{row.repair['status']}" if row.get("repair") else ""
+				click.echo(
+					f"{site}\t{row.name}\t{row.status}\t{row.expected_amount}\t{row.posted_amount}{repaired}"
+				)
+			click.secho(
+				f"{site}: {len(discrepancies)} Sales Invoice(s) with unposted deductions", fg="yellow"
+			)
+		finally:
+			frappe.destroy()
+
+
+commands = [
+	reconcile_stock_entries,
+	create_deduction_jes,
+	rebuild_lines_production,
+	sync_deduction_schema,
+	reconcile_deduction_jes,
+]
@@ -0,0 +1,103 @@
+"""`clearence_items_summary` of a Clearence: quantities and amounts of `items` per item
+group and item.
+
+Only `items` is summarised: `group_items` is a read-only grouping of the same lines,
+so adding it would count every line twice.
+
+On a save from the form only the rows the form marked as edited (`__unsaved`), new
+rows and removed rows are applied to the existing summary, so editing a few lines of
+a bill of quantities with thousands of rows neither compares nor rebuilds every row.
+Saves from code, which carry no such marks, rebuild the summary.
+"""
+
+import frappe
+from frappe.utils import flt
+
+SUMMARY_TABLE = "clearence_items_summary"
+SOURCE_TABLE = "items"
+KEY_FIELDS = ("item_group", "item_code")
+VALUE_FIELDS = ("qty", "amount")
+# copied from the first row of a key when its summary row is created, if the summary has them
+INFO_FIELDS = ("item_name", "uom")
+PRECISION = 6
+
+
+def update_items_summary(doc):
+	"""Bring `doc.clearence_items_summary` in line with its item rows."""
+	if not doc.meta.has_field(SUMMARY_TABLE):
+		return
+
+	info_fields = get_info_fields(doc)
+	before = None if doc.is_new() else doc.get_doc_before_save()
+	if before is None or not doc.get(SUMMARY_TABLE) or not doc.get("__unsaved"):
+		doc.set(SUMMARY_TABLE, build_summary_rows(doc, info_fields))
+		return
+
+	deltas = get_summary_deltas(before, doc)
+	if deltas:
+		doc.set(SUMMARY_TABLE, merge_summary_rows(doc.get(SUMMARY_TABLE) or [], deltas, info_fields))
+
+
+def get_info_fields(doc):
+	summary_meta = frappe.get_meta(doc.meta.get_field(SUMMARY_TABLE).options)
+	return tuple(fieldname for fieldname in INFO_FIELDS if summary_meta.has_field(fieldname))
+
+
+def build_summary_rows(doc, info_fields=()):
+	"""Full rebuild: one summary row per key with a non-zero total."""
+	totals = {}
+	for row in doc.get(SOURCE_TABLE) or []:
+		_add(totals, row)
+	return merge_summary_rows([], totals, info_fields)
+
+
+def get_summary_deltas(before, doc):
+	"""``{key: (values, row)}`` changes to the summary between `before` and `doc`.
+
+	Changed rows are new (no name yet) or marked `__unsaved`; removed rows are the
+	names of `before` missing from `doc`. Only those rows are read from `before`.
+	"""
+	rows = doc.get(SOURCE_TABLE) or []
+	names = {row.get("name") for row in rows}
+	changed = [row for row in rows if not row.get("name") or row.get("__unsaved")]
+	changed_names = {row.get("name") for row in changed}
+
+	deltas = {}
+	for old in before.get(SOURCE_TABLE) or []:
+		if old.get("name") in changed_names or old.get("name") not in names:
+			_add(deltas, old, sign=-1)
+	for row in changed:
+		_add(deltas, row)
+	return deltas
+
+
+def merge_summary_rows(rows, deltas, info_fields=()):
+	"""Apply `deltas` to summary `rows`; keys whose totals drop to zero are removed."""
+	by_key = {_key(row): row for row in rows}
+	for key, (values, source) in deltas.items():
+		row = by_key.get(key)
+		if row is None:
+			row = by_key[key] = frappe._dict(zip(KEY_FIELDS, key, strict=True))
+			for fieldname in info_fields:
+				row[fieldname] = source.get(fieldname)
+		for fieldname, value in zip(VALUE_FIELDS, values, strict=True):
+			setattr(row, fieldname, flt(flt(row.get(fieldname)) + value, PRECISION))
+
+	merged = [row for row in by_key.values() if any(flt(row.get(fieldname)) for fieldname in VALUE_FIELDS)]
+	for idx, row in enumerate(merged, 1):
+		row.idx = idx
+	return merged
+
+
+def _key(row):
+	return tuple(row.get(fieldname) for fieldname in KEY_FIELDS)
+
+
+def _add(totals, row, sign=1):
+	key = _key(row)
+	values = tuple(flt(row.get(fieldname)) * sign for fieldname in VALUE_FIELDS)
+	current = totals.get(key)
+	if current is None:
+		totals[key] = (values, row)
+	else:
+		totals[key] = (tuple(a + b for a, b in zip(current[0], values, strict=True)), current[1])
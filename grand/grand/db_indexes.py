@@ -0,0 +1,64 @@
+import frappe
+
+# doctype -> composite indexes (column tuples) backing grand's frequent lookups
+INDEXES = {
+	# sector tree and Delivery Note block/building validation
+	"Block": [("sector", "name")],
+	"Building": [("sector", "block"), ("block", "name")],
+	# Lines Production / Lines stock entries by building and item
+	"Lines Item": [("building", "item"), ("item",)],
+	"Delivery Note": [("custom_sector", "docstatus")],
+	"Delivery Note Item": [("custom_block", "custom_building")],
+	# Clearence -> Sales Invoice mapping
+	"Sales Invoice": [("clearence", "docstatus")],
+	# deduction Journal Entries by referenced invoice
+	"Journal Entry Account": [("reference_name", "reference_type")],
+}
+
+
+def get_index_name(columns):
+	return "grand_" + "_".join(columns)
+
+
+def ensure_indexes():
+	"""Create (or re-create when their columns changed) the indexes in `INDEXES`.
+
+	Idempotent and cheap when nothing is missing: one query per table for its
+	columns and one for its indexes. Columns that do not exist on a site (a custom
+	field not installed, a doctype from an app that is not installed) are skipped,
+	as are indexes an existing index already covers. Returns the indexes created.
+	"""
+	if frappe.db.db_type != "mariadb":
+		return []
+
+	created = []
+	for doctype, indexes in INDEXES.items():
+		if not frappe.db.table_exists(doctype):
+			continue
+		table_columns = set(frappe.db.get_table_columns(doctype))
+		existing = get_table_indexes(doctype)
+
+		for columns in indexes:
+			if not table_columns.issuperset(columns):
+				continue
+			index_name = get_index_name(columns)
+			if existing.get(index_name) == columns:
+				continue
+			if index_name in existing:
+				frappe.db.sql_ddl(f"alter table `tab{doctype}` drop index `{index_name}`")
+			elif any(other[: len(columns)] == columns for other in existing.values()):
+				continue
+
+			frappe.db.sql_ddl(
+				f"alter table `tab{doctype}` add index `{index_name}` ({', '.join(f'`{c}`' for c in columns)})"
+			)
+			created.append((doctype, index_name))
+	return created
+
+
+def get_table_indexes(doctype):
+	"""``{index_name: (column, ...)}`` of `doctype`'s table, in one query."""
+	indexes = {}
+	for row in frappe.db.sql(f"show index from `tab{doctype}`", as_dict=True):
+		indexes.setdefault(row.Key_name, []).append((row.Seq_in_index, row.Column_name))
+	return {name: tuple(column for _seq, column in sorted(columns)) for name, columns in indexes.items()}
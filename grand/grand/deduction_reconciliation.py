@@ -0,0 +1,210 @@
+import frappe
+from frappe import _
+from frappe.utils import add_days, add_months, cint, flt, get_last_day, nowdate
+
+from grand.grand.metrics import instrument
+from grand.grand.tracing import get_logger
+
+# allowed difference between an invoice's expected deductions and its posted JE amount
+TOLERANCE = 0.005
+REPAIR_BATCH_SIZE = 100
+# days checked back from the daily job's end date (site config `grand_deduction_reconcile_days`);
+# enough to cover last month in consolidated mode
+RECONCILE_DAYS = 40
+# discrepancies listed in the daily Error Log; the rest are only counted
+LOG_ROWS = 20
+# deduction child doctype -> SQL amount of one row `d` of invoice `si`, as
+# `grand.grand.deductions.DEDUCTION_TABLES` computes it; `deduction_table` first
+DEDUCTION_ROW_AMOUNTS = {
+	"Deduction Table": "round(d.amount, 2)",
+	"Deduction": "coalesce(nullif(round(d.value, 2), 0), round(d.percent * si.rounded_total / 100, 2))",
+}
+
+
+def get_expected_amount_sql():
+	"""SQL for the amount `prepare_deduction_je` posts for invoice `si`.
+
+	Like the builder: the `deduction_table` rows when the invoice has any,
+	otherwise the `deductions` rows, leaving out rows without an account.
+	"""
+	tables = [dt for dt in DEDUCTION_ROW_AMOUNTS if frappe.db.exists("DocType", dt)]
+	if not tables:
+		return None
+
+	def rows(doctype):
+		return f"`tab{doctype}` d where d.parent = si.name and d.parenttype = 'Sales Invoice'"
+
+	sums = [
+		f"(select coalesce(sum({DEDUCTION_ROW_AMOUNTS[dt]}), 0) from {rows(dt)} and ifnull(d.account, '') != '')"
+		for dt in tables
+	]
+	if len(sums) == 1:
+		return sums[0]
+	return f"case when exists (select 1 from {rows(tables[0])}) then {sums[0]} else {sums[1]} end"
+
+
+def get_deduction_je_discrepancies(from_date=None, to_date=None, company=None):
+	"""Submitted Sales Invoices whose deductions are not fully posted.
+
+	A single grouped join of invoices against the receivable rows of deduction
+	Journal Entries that reference them (per-invoice or consolidated). Returns one
+	row per invoice with `status` "Missing" (no entry at all), "Draft" (only
+	unsubmitted entries) or "Mismatch" (posted amount differs from the
+	`expected_amount` the Journal Entry builder posts), plus the posted amount and
+	entry names.
+	"""
+	expected_amount = get_expected_amount_sql()
+	if not expected_amount:
+		return []
+
+	conditions = []
+	if from_date:
+		conditions.append("si.posting_date >= %(from_date)s")
+	if to_date:
+		conditions.append("si.posting_date <= %(to_date)s")
+	if company:
+		conditions.append("si.company = %(company)s")
+
+	rows = frappe.db.sql(
+		f"""
+		select si.name, si.company, si.customer, si.posting_date, si.total_deductions,
+			{expected_amount} as expected_amount,
+			coalesce(sum(case when je.docstatus = 1 then jea.credit - jea.debit end), 0) as posted_amount,
+			count(distinct case when je.docstatus = 0 then je.name end) as draft_count,
+			group_concat(distinct je.name order by je.name) as journal_entries
+		from `tabSales Invoice` si
+		left join `tabJournal Entry Account` jea
+			on jea.reference_type = 'Sales Invoice' and jea.reference_name = si.name
+		left join `tabJournal Entry` je
+			on je.name = jea.parent and je.docstatus < 2
+			and je.user_remark like 'Deductions for Sales Invoice%%'
+		where si.docstatus = 1 and si.total_deductions > 0
+			{"".join(f" and {condition}" for condition in conditions)}
+		group by si.name
+		having abs(posted_amount - expected_amount) > {TOLERANCE}
+		order by si.posting_date, si.name
+		""",
+		{"from_date": from_date, "to_date": to_date, "company": company},
+		as_dict=True,
+	)
+	for row in rows:
+		row.expected_amount = flt(row.expected_amount, 2)
+		row.posted_amount = flt(row.posted_amount, 2)
+		if row.posted_amount:
+			row.status = "Mismatch"
+		elif row.draft_count:
+			row.status = "Draft"
+		else:
+			row.status = "Missing"
+	return rows
+
+
+def repair_deduction_jes(discrepancies):
+	"""Post what is missing: create JEs for "Missing" invoices and submit "Draft" ones.
+
+	Mismatches are only reported, they need a person to look at them. In
+	consolidated mode missing entries are posted per customer for the period.
+	Returns ``{invoice: {"status", ...}}`` for the repaired invoices.
+	"""
+	from grand.sales_invoice_events import (
+		create_deduction_jes_job,
+		is_consolidated_deduction_mode,
+		post_consolidated_deduction_jes,
+	)
+
+	missing = [row for row in discrepancies if row.status == "Missing"]
+	drafts = [row for row in discrepancies if row.status == "Draft"]
+	report = {}
+
+	if missing and is_consolidated_deduction_mode():
+		dates = [row.posting_date for row in missing]
+		report.update(post_consolidated_deduction_jes(min(dates), max(dates)))
+	elif missing:
+		report.update(create_deduction_jes_job([row.name for row in missing], submit=1))
+
+	report.update(submit_draft_deduction_jes(drafts))
+	return report
+
+
+def submit_draft_deduction_jes(drafts):
+	report = {}
+	for start in range(0, len(drafts), REPAIR_BATCH_SIZE):
+		for row in drafts[start : start + REPAIR_BATCH_SIZE]:
+			frappe.db.savepoint("grand_deduction_je_repair")
+			try:
+				for journal_entry in (row.journal_entries or "").split(","):
+					je = frappe.get_doc("Journal Entry", journal_entry)
+					if je.docstatus == 0:
+						je.submit()
+				report[row.name] = {"status": "Submitted", "journal_entry": row.journal_entries}
+			except Exception as e:
+				frappe.db.rollback(save_point="grand_deduction_je_repair")
+				frappe.clear_messages()
+				report[row.name] = {"status": "Failed", "error": str(e)}
+		frappe.db.commit()
+	return report
+
+
+def reconcile_deduction_jes(from_date=None, to_date=None, company=None, repair=False):
+	"""Find (and with `repair`, fix) unposted deductions; returns the discrepancies found."""
+	discrepancies = get_deduction_je_discrepancies(from_date, to_date, company)
+	if repair and discrepancies:
+		results = repair_deduction_jes(discrepancies)
+		for row in discrepancies:
+			row.repair = results.get(row.name)
+	return discrepancies
+
+
+@instrument
+def reconcile_deduction_jes_daily():
+	"""Daily scheduler job: log invoices whose deductions are not posted.
+
+	Only invoices the normal flow should already have posted are checked: those
+	of the last `RECONCILE_DAYS` days up to yesterday, or up to the end of last
+	month in consolidated mode. Repairs when site config
+	`grand_deduction_reconcile_repair` is set. Older discrepancies are left to
+	`get_unposted_deductions`.
+	"""
+	from grand.sales_invoice_events import is_consolidated_deduction_mode
+
+	if is_consolidated_deduction_mode():
+		to_date = get_last_day(add_months(nowdate(), -1))
+	else:
+		to_date = add_days(nowdate(), -1)
+	from_date = add_days(
+		to_date, -(cint(frappe.conf.get("grand_deduction_reconcile_days")) or RECONCILE_DAYS)
+	)
+
+	discrepancies = reconcile_deduction_jes(
+		from_date=from_date, to_date=to_date, repair=cint(frappe.conf.get("grand_deduction_reconcile_repair"))
+	)
+	if not discrepancies:
+		return
+
+	counts = {}
+	for row in discrepancies:
+		counts[row.status] = counts.get(row.status, 0) + 1
+	get_logger().warning(
+		{
+			"operation": "reconcile_deduction_jes",
+			"from_date": str(from_date),
+			"to_date": str(to_date),
+			**counts,
+		}
+	)
+
+	summary = ", ".join(f"{status} {count}" for status, count in sorted(counts.items()))
+	lines = [f"{from_date} - {to_date}: {summary}"]
+	lines += [
+		f"{row.name}\t{row.status}\t{row.expected_amount}\t{row.posted_amount}\t{row.journal_entries or ''}"
+		for row in discrepancies[:LOG_ROWS]
+	]
+	if len(discrepancies) > LOG_ROWS:
+		lines.append(_("... and {0} more").format(len(discrepancies) - LOG_ROWS))
+	frappe.log_error(title=_("Unposted Sales Invoice deductions"), message="\n".join(lines))
+
+
+@frappe.whitelist()
+def get_unposted_deductions(from_date=None, to_date=None, company=None):
+	frappe.has_permission("Journal Entry", "read", throw=True)
+	return get_deduction_je_discrepancies(from_date, to_date, company)
@@ -0,0 +1,141 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from grand.grand.metrics import instrument
+
+RECEIVABLE_ACCOUNT_REQUIRING_PARTY = "مدينون"
+
+
+def _get(row, fieldname):
+	return row.get(fieldname) if hasattr(row, "get") else getattr(row, fieldname, None)
+
+
+def _percent_row_amount(row, base_total):
+	# an explicit value wins; otherwise the percent of the document's rounded total
+	value = flt(_get(row, "value"), 2)
+	if value:
+		return value
+	return flt(flt(_get(row, "percent")) * base_total / 100.0, 2)
+
+
+def _amount_row_amount(row, base_total):
+	return flt(_get(row, "amount"), 2)
+
+
+# child table fieldname -> amount of one row
+DEDUCTION_TABLES = {
+	"deductions": _percent_row_amount,
+	"deduction_table": _amount_row_amount,
+}
+
+
+def collect_deductions(doc, tables=("deductions", "deduction_table")):
+	"""Walk the deduction child `tables` of `doc` once.
+
+	Returns ``frappe._dict(lines, total, missing_account)``: one Journal Entry debit
+	line per non-zero row, their total, and ``(table, idx)`` of non-zero rows that
+	have no account (those are left out of ``lines`` and ``total``).
+	"""
+	base_total = flt(doc.get("rounded_total"), 2)
+	default_cost_center = doc.get("cost_center")
+	default_project = doc.get("project")
+
+	lines = []
+	total = 0.0
+	missing_account = []
+	for table in tables:
+		row_amount = DEDUCTION_TABLES[table]
+		for row in doc.get(table) or []:
+			amount = row_amount(row, base_total)
+			if not amount:
+				continue
+
+			account = _get(row, "account")
+			if not account:
+				missing_account.append((table, _get(row, "idx")))
+				continue
+
+			total += amount
+			lines.append(
+				{
+					"account": account,
+					"debit": amount,
+					"credit": 0.0,
+					"cost_center": _get(row, "cost_center") or default_cost_center,
+					"project": _get(row, "project") or default_project,
+				}
+			)
+
+	return frappe._dict(lines=lines, total=flt(total, 2), missing_account=missing_account)
+
+
+def set_receivable_party(doc, receivable_account):
+	"""Fill `party_type`/`party` from the customer; required for the Arabic receivables account."""
+	if not doc.get("party_type") and doc.get("customer"):
+		doc.party_type = "Customer"
+	if not doc.get("party") and doc.get("customer"):
+		doc.party = doc.customer
+
+	if RECEIVABLE_ACCOUNT_REQUIRING_PARTY in receivable_account and not (
+		doc.get("party_type") and doc.get("party")
+	):
+		frappe.throw(_("Party Type and Party are required when Receivable/Payable account is 'مدينون - G'"))
+
+
+def get_deduction_je_accounts(doc, receivable_account, deductions):
+	"""Journal Entry accounts: one receivable credit for the total, then the deduction debits."""
+	receivable_row = {
+		"account": receivable_account,
+		"debit": 0.0,
+		"credit": deductions.total,
+		"cost_center": doc.get("cost_center"),
+		"project": doc.get("project"),
+		"party_type": doc.get("party_type"),
+		"party": doc.get("party"),
+		"reference_type": doc.doctype,
+		"reference_name": doc.name,
+	}
+	return [receivable_row, *deductions.lines]
+
+
+def format_missing_accounts(missing_account):
+	return ", ".join(f"{table} #{idx}" for table, idx in missing_account)
+
+
+def deduction_signature(doc):
+	"""Everything deduction values and totals depend on, for a cheap changed-or-not check."""
+	return (
+		flt(doc.get("rounded_total"), 2),
+		flt(doc.get("conversion_rate")) or 1.0,
+		tuple((flt(_get(row, "percent")), flt(_get(row, "value"), 2)) for row in doc.get("deductions") or []),
+		tuple(flt(_get(row, "amount"), 2) for row in doc.get("deduction_table") or []),
+	)
+
+
+@instrument
+def set_deduction_values(doc, method=None):
+	"""Recompute percent-based deduction values and `total_deductions`/`base_total_deductions`.
+
+	One pass over both tables; skipped when neither the totals, the conversion rate
+	nor any deduction row changed since the document was last saved.
+	"""
+	before = None if doc.is_new() else doc.get_doc_before_save()
+	if before and deduction_signature(before) == deduction_signature(doc):
+		return
+
+	base_total = flt(doc.get("rounded_total"), 2)
+	total = 0.0
+	for row in doc.get("deductions") or []:
+		if flt(row.percent):
+			row.value = flt(flt(row.percent) * base_total / 100.0, 2)
+		total += flt(row.value)
+	for row in doc.get("deduction_table") or []:
+		total += flt(row.amount)
+
+	if doc.meta.has_field("total_deductions"):
+		doc.total_deductions = flt(total, doc.precision("total_deductions"))
+	if doc.meta.has_field("base_total_deductions"):
+		doc.base_total_deductions = flt(
+			total * (flt(doc.get("conversion_rate")) or 1.0), doc.precision("base_total_deductions")
+		)
@@ -1,54 +1,355 @@
 import frappe
-from frappe.utils import nowdate
+from frappe.utils import flt, nowdate, strip_html
 
+from grand.grand.item_utils import get_conversion_factors, get_stock_uoms
+from grand.grand.metrics import instrument
+
+STOCK_ENTRY_JOB_PREFIX = "grand-dn-stock-entry"
+
+
+@instrument
 def create_stock_entry_from_delivery_sheet(doc, method):
-    if not doc.get("custom_delivery_sheet"):
-        return
-
-    source_warehouse = ""
-    if doc.get("items"):
-        first_item = doc.items[0]
-        source_warehouse = first_item.warehouse or ""
-
-    if not source_warehouse:
-        frappe.throw("⚠️ Source warehouse not set in Delivery Note items.")
-
-    stock_entry = frappe.new_doc("Stock Entry")
-    stock_entry.stock_entry_type = "Material Issue"
-    stock_entry.company = doc.company
-    stock_entry.posting_date = nowdate()
-
-    # Fetch from delivery note
-    if getattr(doc, "project", None):
-        stock_entry.project = doc.project
-
-    if getattr(doc, "project_inventory", None):
-        stock_entry.project_inventory = doc.project_inventory
-
-    for row in doc.custom_delivery_sheet:
-        if not row.item_code:
-            frappe.throw(f"Missing item_code in delivery sheet row {row.idx}")
-
-        stock_uom = frappe.db.get_value("Item", row.item_code, "stock_uom")
-        if not stock_uom:
-            frappe.throw(f"Stock UOM not found for item {row.item_code}")
-
-        stock_entry.append("items", {
-            "item_code": row.item_code,
-            "description": row.description,
-            "qty": row.qty or row.stock_qty,
-            "uom": stock_uom,
-            "stock_uom": stock_uom,
-            "s_warehouse": source_warehouse,
-            "conversion_factor": 1,
-            "basic_rate": 0.0,
-            "allow_zero_valuation_rate": 1,
-            "project_invintory": getattr(doc, "project", None),
-            "project_inventory": getattr(doc, "project_inventory", None)  # ✅ added to each item row
-        })
-
-    stock_entry.insert(ignore_permissions=True)
-    stock_entry.submit()
-
-    stock_entry.add_comment("Comment", f"Auto-created from Delivery Note {doc.name}")
-    frappe.msgprint(f"✅ Stock Entry <b>{stock_entry.name}</b> created from Delivery Note.")
+	if not doc.get("custom_delivery_sheet"):
+		return
+
+	# opt-in: keep the ledger work out of the submit request (site config `grand_async_stock_entry`)
+	if frappe.conf.get("grand_async_stock_entry"):
+		get_source_warehouse(doc)
+		validate_delivery_sheet_items(doc)
+		doc.db_set("custom_stock_entry_status", "Queued", update_modified=False)
+		enqueue_stock_entry(doc.name)
+		frappe.msgprint("Stock Entry for this Delivery Note has been queued.")
+		return
+
+	stock_entry = make_stock_entry(doc)
+	if stock_entry:
+		frappe.msgprint(f"✅ Stock Entry <b>{stock_entry.name}</b> created from Delivery Note.")
+
+
+def get_source_warehouse(doc):
+	source_warehouse = ""
+	if doc.get("items"):
+		first_item = doc.items[0]
+		source_warehouse = first_item.warehouse or ""
+
+	if not source_warehouse:
+		frappe.throw("⚠️ Source warehouse not set in Delivery Note items.")
+
+	return source_warehouse
+
+
+def validate_delivery_sheet_items(doc):
+	missing_item_rows = [str(row.idx) for row in doc.custom_delivery_sheet if not row.item_code]
+	if missing_item_rows:
+		frappe.throw(f"Missing item_code in delivery sheet rows {', '.join(missing_item_rows)}")
+
+
+def build_stock_entry(doc):
+	"""Return an unsaved Material Issue Stock Entry for the Delivery Note's delivery sheet."""
+	source_warehouse = get_source_warehouse(doc)
+	validate_delivery_sheet_items(doc)
+
+	stock_entry = frappe.new_doc("Stock Entry")
+	stock_entry.stock_entry_type = "Material Issue"
+	stock_entry.company = doc.company
+	stock_entry.posting_date = nowdate()
+	stock_entry.custom_delivery_note = doc.name
+
+	# Fetch from delivery note
+	if getattr(doc, "project", None):
+		stock_entry.project = doc.project
+
+	if getattr(doc, "project_inventory", None):
+		stock_entry.project_inventory = doc.project_inventory
+
+	# one lookup for every distinct item on the sheet instead of a query per row
+	item_codes = [row.item_code for row in doc.custom_delivery_sheet]
+	stock_uoms = get_stock_uoms(item_codes)
+	conversion_factors = get_conversion_factors(item_codes)
+
+	# opt-in (site config `grand_aggregate_delivery_sheet_items`): one Stock Entry row, and so
+	# one Stock Ledger Entry, per item in its stock UOM; warehouse and project are the same for every row here
+	aggregate = frappe.conf.get("grand_aggregate_delivery_sheet_items")
+	items = {}
+	missing_conversion = []
+	for row in doc.custom_delivery_sheet:
+		stock_uom = stock_uoms[row.item_code]
+		uom, qty, conversion_factor = get_sheet_row_qty(row, stock_uom, conversion_factors[row.item_code])
+		if not conversion_factor:
+			missing_conversion.append(f"#{row.idx} {row.item_code} ({uom})")
+			continue
+
+		if aggregate:
+			uom, qty, conversion_factor = stock_uom, flt(qty * conversion_factor), 1
+		key = row.item_code if aggregate else row.idx
+		if key in items:
+			items[key]["qty"] += qty
+			items[key]["transfer_qty"] += qty
+			items[key]["custom_delivery_sheet_rows"] += f", {row.idx}"
+			continue
+
+		items[key] = {
+			"item_code": row.item_code,
+			"description": row.description,
+			"qty": qty,
+			"uom": uom,
+			"stock_uom": stock_uom,
+			"s_warehouse": source_warehouse,
+			"conversion_factor": conversion_factor,
+			"transfer_qty": flt(qty * conversion_factor),
+			"basic_rate": 0.0,
+			"allow_zero_valuation_rate": 1,
+			"project_invintory": getattr(doc, "project", None),
+			"project_inventory": getattr(doc, "project_inventory", None),  # ✅ added to each item row
+			"custom_delivery_sheet_rows": str(row.idx),
+		}
+
+	if missing_conversion:
+		frappe.throw(f"No UOM conversion factor for delivery sheet rows {', '.join(missing_conversion)}")
+
+	for item in items.values():
+		stock_entry.append("items", item)
+
+	return stock_entry
+
+
+def get_sheet_row_qty(row, stock_uom, factors):
+	"""Return ``(uom, qty, conversion_factor)`` of a delivery sheet row.
+
+	The row's `stock_uom` field (the item's stock UOM when empty) is the unit of
+	its quantity: `qty`, or `stock_qty` when `qty` is empty. The factor is 0 when
+	the item has no conversion for that UOM.
+	"""
+	uom = row.get("stock_uom") or stock_uom
+	conversion_factor = 1 if uom == stock_uom else flt(factors.get(uom))
+	return uom, flt(row.qty) or flt(row.stock_qty), conversion_factor
+
+
+def make_stock_entry(doc):
+	"""Create and submit the Stock Entry for `doc` unless one is already linked.
+
+	The Delivery Note name is the idempotency key: the created entry is stored in
+	`custom_stock_entry`, and a note that already points to a submitted entry is skipped.
+	"""
+	existing = doc.get("custom_stock_entry")
+	if existing and frappe.db.get_value("Stock Entry", existing, "docstatus") == 1:
+		return None
+
+	stock_entry = build_stock_entry(doc)
+	stock_entry.insert(ignore_permissions=True)
+	stock_entry.submit()
+
+	stock_entry.add_comment("Comment", f"Auto-created from Delivery Note {doc.name}")
+	doc.db_set(
+		{"custom_stock_entry": stock_entry.name, "custom_stock_entry_status": "Created"},
+		update_modified=False,
+	)
+	return stock_entry
+
+
+@instrument
+def cancel_stock_entry_from_delivery_sheet(doc, method=None):
+	"""Delivery Note on_cancel: cancel the Stock Entries created from its delivery sheet.
+
+	Cancelling posts the reversing Stock Ledger Entries. Runs before frappe checks
+	for submitted documents linking to the note, so the cancel is not blocked.
+	"""
+	names = set(
+		frappe.get_all(
+			"Stock Entry", filters={"custom_delivery_note": doc.name, "docstatus": 1}, pluck="name"
+		)
+	)
+	if (
+		doc.get("custom_stock_entry")
+		and frappe.db.get_value("Stock Entry", doc.custom_stock_entry, "docstatus") == 1
+	):
+		names.add(doc.custom_stock_entry)
+	if not names and not doc.get("custom_stock_entry_status"):
+		return
+
+	for name in sorted(names):
+		stock_entry = frappe.get_doc("Stock Entry", name)
+		stock_entry.cancel()
+	doc.db_set("custom_stock_entry_status", "Cancelled", update_modified=False)
+	if names:
+		frappe.msgprint(f"Stock Entry {', '.join(sorted(names))} cancelled with the Delivery Note.")
+
+
+STOCK_ENTRY_COMMENT_PREFIX = "Auto-created from Delivery Note "
+BACKFILL_BATCH_SIZE = 500
+
+
+def backfill_stock_entry_links():
+	"""Set `custom_delivery_note` on Stock Entries created before the field existed.
+
+	The link is recovered from the "Auto-created from Delivery Note ..." comments,
+	read with one query; entries are updated in batches. Returns the number linked.
+	"""
+	rows = frappe.db.sql(
+		"""
+        select c.reference_name, c.content
+        from `tabComment` c
+        inner join `tabStock Entry` se on se.name = c.reference_name
+        where c.reference_doctype = 'Stock Entry'
+            and c.comment_type = 'Comment'
+            and c.content like %(pattern)s
+            and ifnull(se.custom_delivery_note, '') = ''
+    """,
+		{"pattern": f"%{STOCK_ENTRY_COMMENT_PREFIX}%"},
+	)
+
+	links = {}
+	for stock_entry, content in rows:
+		delivery_note = strip_html(content).split(STOCK_ENTRY_COMMENT_PREFIX, 1)[-1].strip().split()
+		if delivery_note:
+			links[stock_entry] = delivery_note[0]
+
+	existing = (
+		set(
+			frappe.get_all("Delivery Note", filters={"name": ("in", list(set(links.values())))}, pluck="name")
+		)
+		if links
+		else set()
+	)
+	links = [(se, dn) for se, dn in links.items() if dn in existing]
+
+	for start in range(0, len(links), BACKFILL_BATCH_SIZE):
+		batch = links[start : start + BACKFILL_BATCH_SIZE]
+		cases = " ".join(["when %s then %s"] * len(batch))
+		frappe.db.sql(
+			f"""
+            update `tabStock Entry`
+            set custom_delivery_note = case name {cases} end
+            where name in %s
+        """,
+			[value for pair in batch for value in pair] + [tuple(se for se, _dn in batch)],
+		)
+	return len(links)
+
+
+def enqueue_stock_entry(delivery_note):
+	frappe.enqueue(
+		"grand.grand.delivery_note_events.process_delivery_note_stock_entry",
+		queue="long",
+		job_id=f"{STOCK_ENTRY_JOB_PREFIX}::{delivery_note}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		delivery_note=delivery_note,
+	)
+
+
+@instrument
+def process_delivery_note_stock_entry(delivery_note):
+	"""Background job creating the Stock Entry for a submitted Delivery Note.
+
+	Safe to run more than once: the note row is locked first, so a retried or
+	duplicated job sees the entry linked by the first one and does nothing.
+	"""
+	docstatus = frappe.db.get_value("Delivery Note", delivery_note, "docstatus", for_update=True)
+	if docstatus != 1:
+		return
+
+	doc = frappe.get_doc("Delivery Note", delivery_note)
+	try:
+		make_stock_entry(doc)
+		frappe.db.commit()
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title=f"Stock Entry for Delivery Note {delivery_note} failed")
+		frappe.db.set_value(
+			"Delivery Note", delivery_note, "custom_stock_entry_status", "Failed", update_modified=False
+		)
+		frappe.db.commit()
+
+
+def get_delivery_notes_missing_stock_entry():
+	"""Submitted Delivery Notes with a delivery sheet but no submitted Stock Entry linked."""
+	return frappe.db.sql_list("""
+        select dn.name
+        from `tabDelivery Note` dn
+        where dn.docstatus = 1
+            and exists (
+                select 1 from `tabDelivery Sheet` ds
+                where ds.parent = dn.name and ds.parenttype = 'Delivery Note'
+            )
+            and not exists (
+                select 1 from `tabStock Entry` se
+                where se.name = dn.custom_stock_entry and se.docstatus = 1
+            )
+        order by dn.creation
+    """)
+
+
+def reconcile_stock_entries(repair=False):
+	"""Return Delivery Notes whose Stock Entry is missing; with `repair`, queue them again."""
+	missing = get_delivery_notes_missing_stock_entry()
+	if repair:
+		for delivery_note in missing:
+			frappe.db.set_value(
+				"Delivery Note", delivery_note, "custom_stock_entry_status", "Queued", update_modified=False
+			)
+			enqueue_stock_entry(delivery_note)
+		frappe.db.commit()
+	return missing
+
+
+@instrument
+def validate_block_building(doc, method=None):
+	"""Check every item's `custom_block`/`custom_building` against the note's `custom_sector`.
+
+	Blocks and buildings used anywhere on the note are fetched with one query, and
+	all violations are reported together.
+	"""
+	if not frappe.get_meta("Delivery Note Item").has_field("custom_building"):
+		return
+
+	rows = [row for row in doc.get("items") or [] if row.get("custom_block") or row.get("custom_building")]
+	if not rows:
+		return
+
+	sector = doc.get("custom_sector")
+	if not sector:
+		frappe.throw("Sector is required when items have a Block or Building set.")
+
+	blocks = {row.custom_block for row in rows if row.get("custom_block")}
+	buildings = {row.custom_building for row in rows if row.get("custom_building")}
+	known = get_blocks_and_buildings(blocks, buildings)
+
+	errors = []
+	for row in rows:
+		block = row.get("custom_block")
+		building = row.get("custom_building")
+		if block:
+			if ("Block", block) not in known:
+				errors.append(f"Row {row.idx}: Block {block} does not exist")
+			elif known[("Block", block)].sector != sector:
+				errors.append(f"Row {row.idx}: Block {block} is not in Sector {sector}")
+		if building:
+			info = known.get(("Building", building))
+			if not info:
+				errors.append(f"Row {row.idx}: Building {building} does not exist")
+			elif info.sector != sector:
+				errors.append(f"Row {row.idx}: Building {building} is not in Sector {sector}")
+			elif block and info.block != block:
+				errors.append(f"Row {row.idx}: Building {building} is not in Block {block}")
+
+	if errors:
+		frappe.throw("<br>".join(errors), title="Invalid Block / Building")
+
+
+def get_blocks_and_buildings(blocks, buildings):
+	"""Map (doctype, name) -> {sector, block} for the given names in a single query."""
+	if not (blocks or buildings):
+		return {}
+	rows = frappe.db.sql(
+		"""
+        select 'Block' as doctype, name, sector, null as block
+        from `tabBlock` where name in %(blocks)s
+        union all
+        select 'Building' as doctype, name, sector, block
+        from `tabBuilding` where name in %(buildings)s
+    """,
+		{"blocks": tuple(blocks) or ("",), "buildings": tuple(buildings) or ("",)},
+		as_dict=True,
+	)
+	return {(row.doctype, row.name): row for row in rows}
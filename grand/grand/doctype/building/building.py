@@ -1,9 +1,17 @@
 # Copyright (c) 2025, Connect 4 Systems and contributors
 # For license information, please see license.txt
 
-# import frappe
 from frappe.model.document import Document
 
+from grand.grand.hierarchy import clear_sector_tree, clear_sector_tree_for
+
 
 class Building(Document):
-	pass
+	def on_update(self):
+		clear_sector_tree_for(self)
+
+	def on_trash(self):
+		clear_sector_tree(self.sector)
+
+	def after_rename(self, old, new, merge=False):
+		clear_sector_tree(self.sector)
@@ -1,8 +1,31 @@
 // Copyright (c) 2026, Connect 4 Systems and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Clearence", {
-// 	refresh(frm) {
+frappe.ui.form.on("Clearence", {
+	refresh(frm) {
+		if (frm.doc.docstatus === 1) {
+			frm.add_custom_button(
+				__("Sales Invoice"),
+				() =>
+					frappe.model.open_mapped_doc({
+						method: "grand.grand.doctype.clearence.clearence.make_sales_invoice",
+						frm,
+					}),
+				__("Create")
+			);
+		}
+	},
+});
 
-// 	},
-// });
+// Mark edited rows so the server updates only their share of the items summary
+function mark_item_edited(frm, cdt, cdn) {
+	locals[cdt][cdn].__unsaved = 1;
+}
+
+frappe.ui.form.on("Clearence Item", {
+	item_group: mark_item_edited,
+	item_code: mark_item_edited,
+	qty: mark_item_edited,
+	rate: mark_item_edited,
+	amount: mark_item_edited,
+});
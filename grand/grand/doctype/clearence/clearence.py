@@ -1,9 +1,253 @@
 # Copyright (c) 2026, Connect 4 Systems and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint, flt
+
+from grand.grand.clearence_summary import update_items_summary
+from grand.grand.deductions import set_deduction_values
+from grand.grand.doctype.clearence_ledger.clearence_ledger import (
+	get_previous_amount,
+	update_clearence_ledger,
+)
+from grand.grand.doctype.selling_deductions_template.selling_deductions_template import (
+	apply_deductions_template,
+)
+from grand.grand.item_utils import prefetch_stock_uoms
+from grand.grand.metrics import instrument
+
+INVOICE_BATCH_SIZE = 50
 
 
 class Clearence(Document):
-	pass
+	def validate(self):
+		update_items_summary(self)
+		apply_deductions_template(self)
+		self.set_deduction_totals()
+		self.set_running_balance()
+
+	def before_submit(self):
+		# re-read the running total under a row lock so concurrent submits stay in sequence
+		self.set_running_balance(for_update=True)
+
+	def on_submit(self):
+		update_clearence_ledger(self)
+
+	def on_cancel(self):
+		update_clearence_ledger(self, sign=-1)
+
+	def set_deduction_totals(self):
+		set_deduction_values(self)
+		self.total_after_deductions = flt(
+			flt(self.rounded_total or self.grand_total) - flt(self.total_deductions),
+			self.precision("total_after_deductions"),
+		)
+
+	def set_running_balance(self, for_update=False):
+		"""Previous (already submitted for this customer and project), current and to-date amounts."""
+		self.previous_amount = flt(
+			get_previous_amount(self.customer, self.project, for_update=for_update),
+			self.precision("previous_amount"),
+		)
+		self.current_amount = flt(self.rounded_total or self.grand_total, self.precision("current_amount"))
+		self.due_amount = flt(self.previous_amount + self.current_amount, self.precision("due_amount"))
+		self.paid_percentage = (
+			flt(flt(self.paid_amount) * 100.0 / self.due_amount, self.precision("paid_percentage"))
+			if self.due_amount
+			else 0
+		)
+
+
+@frappe.whitelist()
+def make_sales_invoice(source_name, target_doc=None):
+	"""Map a submitted Clearence to a draft Sales Invoice with its items, taxes and deductions."""
+	return map_sales_invoice(source_name, target_doc)
+
+
+def map_sales_invoice(source_name, target_doc=None, defaults=None):
+	"""Build the Sales Invoice for `source_name`.
+
+	Rows are copied field by field in a single mapper pass. Company accounts and
+	item defaults come from `defaults` (see `prefetch_invoice_defaults`), so a
+	batch of clearences shares one lookup per company instead of one per row.
+	Rates are taken as billed on the clearence; pricing rules are not re-applied.
+	"""
+	from frappe.model.mapper import get_mapped_doc
+
+	defaults = defaults if defaults is not None else frappe._dict(companies={}, item_defaults={})
+
+	def set_missing_values(source, target):
+		prefetch_invoice_defaults(defaults, target.company, [row.item_code for row in target.items])
+		set_invoice_defaults(target, defaults)
+		target.run_method("calculate_taxes_and_totals")
+
+	return get_mapped_doc(
+		"Clearence",
+		source_name,
+		{
+			"Clearence": {
+				"doctype": "Sales Invoice",
+				"validation": {"docstatus": ["=", 1]},
+				"field_map": {"name": "clearence"},
+				"field_no_map": [
+					"naming_series",
+					"title",
+					"status",
+					"posting_date",
+					"posting_time",
+					"paid_amount",
+				],
+			},
+			"Clearence Item": {"doctype": "Sales Invoice Item"},
+			"Sales Taxes and Charges": {"doctype": "Sales Taxes and Charges"},
+			"Deduction": {"doctype": "Deduction"},
+		},
+		target_doc,
+		set_missing_values,
+	)
+
+
+def prefetch_invoice_defaults(defaults, company, item_codes):
+	"""Load company accounts and per-item defaults for `company` that `defaults` does not hold yet."""
+	if company not in defaults.companies:
+		defaults.companies[company] = (
+			frappe.get_cached_value(
+				"Company",
+				company,
+				["default_receivable_account", "default_income_account", "cost_center"],
+				as_dict=True,
+			)
+			or frappe._dict()
+		)
+
+	to_fetch = list({code for code in item_codes if code and (company, code) not in defaults.item_defaults})
+	if not to_fetch:
+		return
+
+	prefetch_stock_uoms(to_fetch)
+	for code in to_fetch:
+		defaults.item_defaults[(company, code)] = frappe._dict()
+	for row in frappe.get_all(
+		"Item Default",
+		filters={"parent": ("in", to_fetch), "company": company},
+		fields=["parent", "income_account", "selling_cost_center"],
+	):
+		defaults.item_defaults[(company, row.parent)] = row
+
+
+def set_invoice_defaults(invoice, defaults):
+	"""Fill the receivable account and every item's UOM, income account and cost center from `defaults`."""
+	company = defaults.companies.get(invoice.company) or frappe._dict()
+	stock_uoms = prefetch_stock_uoms([])
+	invoice.debit_to = invoice.get("debit_to") or company.default_receivable_account
+
+	for row in invoice.items:
+		item = defaults.item_defaults.get((invoice.company, row.item_code)) or frappe._dict()
+		row.stock_uom = row.get("stock_uom") or stock_uoms.get(row.item_code)
+		row.uom = row.get("uom") or row.stock_uom
+		row.conversion_factor = flt(row.get("conversion_factor")) or 1
+		row.income_account = (
+			row.get("income_account") or item.income_account or company.default_income_account
+		)
+		row.cost_center = (
+			row.get("cost_center")
+			or item.selling_cost_center
+			or invoice.get("cost_center")
+			or company.cost_center
+		)
+
+
+@frappe.whitelist()
+def make_sales_invoices(clearences, submit=0):
+	"""Queue Sales Invoices for many submitted Clearences; returns the job id and count."""
+	frappe.has_permission("Sales Invoice", "create", throw=True)
+	names = frappe.get_list(
+		"Clearence",
+		filters={"name": ("in", frappe.parse_json(clearences)), "docstatus": 1},
+		pluck="name",
+		order_by="posting_date, name",
+	)
+	if not names:
+		frappe.throw(_("No submitted Clearences selected"))
+
+	job = frappe.enqueue(
+		"grand.grand.doctype.clearence.clearence.make_sales_invoices_job",
+		queue="long",
+		timeout=3600,
+		clearences=names,
+		submit=cint(submit),
+	)
+	return {"job_id": job.id if job else None, "count": len(names)}
+
+
+@instrument
+def make_sales_invoices_job(clearences, submit=0):
+	"""Create a Sales Invoice per Clearence, skipping those already invoiced.
+
+	Defaults for every company and item involved are fetched before the first
+	mapping; each chunk is committed on its own and a failing clearence is rolled
+	back to its savepoint. Returns ``{clearence: {"status", "sales_invoice"|"error"}}``.
+	"""
+	report = {}
+	total = len(clearences)
+	invoiced = get_invoiced_clearences(clearences)
+	defaults = frappe._dict(companies={}, item_defaults={})
+	for company, item_codes in get_clearence_items_by_company(clearences).items():
+		prefetch_invoice_defaults(defaults, company, item_codes)
+
+	for start in range(0, total, INVOICE_BATCH_SIZE):
+		for name in clearences[start : start + INVOICE_BATCH_SIZE]:
+			if name in invoiced:
+				report[name] = {"status": "Skipped", "sales_invoice": invoiced[name]}
+				continue
+
+			frappe.db.savepoint("grand_clearence_invoice")
+			try:
+				invoice = map_sales_invoice(name, defaults=defaults)
+				invoice.insert()
+				if submit:
+					invoice.submit()
+				report[name] = {"status": "Created", "sales_invoice": invoice.name}
+			except Exception as e:
+				frappe.db.rollback(save_point="grand_clearence_invoice")
+				frappe.clear_messages()
+				report[name] = {"status": "Failed", "error": str(e)}
+
+		frappe.db.commit()
+		done = min(start + INVOICE_BATCH_SIZE, total)
+		frappe.publish_progress(
+			done * 100 / total, title=_("Sales Invoices"), description=f"{done} of {total}"
+		)
+
+	frappe.publish_realtime("grand_clearence_invoices_done", report, user=frappe.session.user)
+	return report
+
+
+def get_invoiced_clearences(clearences):
+	"""{clearence: sales_invoice} for clearences that already have a draft or submitted invoice."""
+	return dict(
+		frappe.get_all(
+			"Sales Invoice",
+			filters={"clearence": ("in", clearences), "docstatus": ("<", 2)},
+			fields=["clearence", "name"],
+			as_list=True,
+		)
+	)
+
+
+def get_clearence_items_by_company(clearences):
+	items = {}
+	for row in frappe.db.sql(
+		"""
+		select distinct c.company, ci.item_code
+		from `tabClearence Item` ci
+		inner join `tabClearence` c on c.name = ci.parent
+		where c.name in %(clearences)s and ci.parenttype = 'Clearence'
+		""",
+		{"clearences": clearences},
+		as_dict=True,
+	):
+		items.setdefault(row.company, []).append(row.item_code)
+	return items
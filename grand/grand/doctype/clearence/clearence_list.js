@@ -0,0 +1,21 @@
+// Copyright (c) 2026, Connect 4 Systems and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Clearence"] = {
+	onload(listview) {
+		listview.page.add_action_item(__("Create Sales Invoices"), () => {
+			const clearences = listview.get_checked_items(true);
+			frappe
+				.call({
+					method: "grand.grand.doctype.clearence.clearence.make_sales_invoices",
+					args: { clearences },
+				})
+				.then((r) => {
+					frappe.show_alert({
+						message: __("Creating {0} Sales Invoices in the background", [r.message.count]),
+						indicator: "blue",
+					});
+				});
+		});
+	},
+};
@@ -1,9 +1,65 @@
 # Copyright (c) 2026, Connect 4 Systems and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from grand.grand.doctype.clearence import clearence
+from grand.tests.utils import FakeDoc
+
 
 class TestClearence(FrappeTestCase):
-	pass
+	def test_invoice_defaults_fill_only_missing_values(self):
+		defaults = frappe._dict(
+			companies={
+				"_Test Company": frappe._dict(
+					default_receivable_account="Debtors - _TC", cost_center="Main - _TC"
+				)
+			},
+			item_defaults={("_Test Company", "Asphalt"): frappe._dict(income_account="Asphalt Sales - _TC")},
+		)
+		invoice = FakeDoc(
+			company="_Test Company",
+			items=[
+				frappe._dict(item_code="Asphalt", uom="Ton"),
+				frappe._dict(item_code="Dust", income_account="Dust Sales - _TC", cost_center="Site - _TC"),
+			],
+		)
+
+		with patch.object(clearence, "prefetch_stock_uoms", return_value={"Asphalt": "Kg", "Dust": "Ton"}):
+			clearence.set_invoice_defaults(invoice, defaults)
+
+		self.assertEqual(invoice.debit_to, "Debtors - _TC")
+		asphalt, dust = invoice.items
+		self.assertEqual((asphalt.uom, asphalt.stock_uom, asphalt.conversion_factor), ("Ton", "Kg", 1))
+		self.assertEqual((asphalt.income_account, asphalt.cost_center), ("Asphalt Sales - _TC", "Main - _TC"))
+		self.assertEqual((dust.income_account, dust.cost_center), ("Dust Sales - _TC", "Site - _TC"))
+
+	def test_bulk_job_prefetches_once_and_skips_invoiced(self):
+		mapped = []
+
+		def map_sales_invoice(name, defaults=None):
+			mapped.append((name, defaults))
+			return frappe._dict(name=f"SINV-{name}", insert=lambda: None)
+
+		with (
+			patch.object(clearence, "get_invoiced_clearences", return_value={"CLE-1": "SINV-OLD"}),
+			patch.object(
+				clearence, "get_clearence_items_by_company", return_value={"_Test Company": ["Dust"]}
+			),
+			patch.object(clearence, "prefetch_invoice_defaults") as prefetch,
+			patch.object(clearence, "map_sales_invoice", side_effect=map_sales_invoice),
+			patch.object(clearence.frappe.db, "savepoint"),
+			patch.object(clearence.frappe.db, "commit"),
+			patch.object(clearence.frappe, "publish_progress"),
+			patch.object(clearence.frappe, "publish_realtime"),
+		):
+			report = clearence.make_sales_invoices_job(["CLE-1", "CLE-2", "CLE-3"])
+
+		prefetch.assert_called_once()
+		self.assertEqual(report["CLE-1"], {"status": "Skipped", "sales_invoice": "SINV-OLD"})
+		self.assertEqual(report["CLE-3"], {"status": "Created", "sales_invoice": "SINV-CLE-3"})
+		self.assertEqual([name for name, _ in mapped], ["CLE-2", "CLE-3"])
+		self.assertIs(mapped[0][1], mapped[1][1])
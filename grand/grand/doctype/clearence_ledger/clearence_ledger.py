@@ -0,0 +1,115 @@
+# Copyright (c) 2026, Connect 4 Systems and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cstr, flt, now
+
+
+class ClearenceLedger(Document):
+	pass
+
+
+def get_ledger_name(customer, project):
+	return hashlib.md5(f"{cstr(customer)}\x1f{cstr(project)}".encode()).hexdigest()
+
+
+def get_previous_amount(customer, project, for_update=False):
+	"""Total of the Clearences already submitted for `customer` and `project`: one primary-key read."""
+	return flt(
+		frappe.db.get_value(
+			"Clearence Ledger", get_ledger_name(customer, project), "cumulative_amount", for_update=for_update
+		)
+	)
+
+
+def update_clearence_ledger(clearence, sign=1):
+	"""Add (or with `sign=-1` remove) the Clearence's amount to its customer/project running total.
+
+	The amount is the rounded (or grand) total, as `current_amount` is set, so
+	Clearences submitted before that field existed are removed correctly on cancel.
+	"""
+	timestamp = now()
+	user = frappe.session.user
+	frappe.db.sql(
+		"""
+		insert into `tabClearence Ledger`
+			(name, creation, modified, owner, modified_by, customer, project,
+			cumulative_amount, clearence_count, last_clearence)
+		values (%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, %(customer)s, %(project)s,
+			%(amount)s, %(count)s, %(clearence)s)
+		on duplicate key update
+			cumulative_amount = cumulative_amount + values(cumulative_amount),
+			clearence_count = clearence_count + values(clearence_count),
+			last_clearence = if(values(clearence_count) > 0, values(last_clearence), last_clearence),
+			modified = values(modified)
+		""",
+		{
+			"name": get_ledger_name(clearence.customer, clearence.project),
+			"now": timestamp,
+			"user": user,
+			"customer": clearence.customer,
+			"project": clearence.project,
+			"amount": flt(clearence.rounded_total or clearence.grand_total) * sign,
+			"count": sign,
+			"clearence": clearence.name,
+		},
+	)
+	if sign < 0:
+		reset_last_clearence(clearence)
+
+
+def reset_last_clearence(clearence):
+	"""Point `last_clearence` back at the latest Clearence still submitted when `clearence` was the last."""
+	frappe.db.sql(
+		"""
+		update `tabClearence Ledger` ledger
+		set ledger.last_clearence = (
+			select c.name from `tabClearence` c
+			where c.docstatus = 1 and c.name != %(clearence)s
+				and c.customer = ledger.customer and ifnull(c.project, '') = ifnull(ledger.project, '')
+			order by c.posting_date desc, c.creation desc
+			limit 1
+		)
+		where ledger.name = %(name)s and ledger.last_clearence = %(clearence)s
+		""",
+		{"name": get_ledger_name(clearence.customer, clearence.project), "clearence": clearence.name},
+	)
+
+
+def rebuild_clearence_ledger():
+	"""Recompute every running total from submitted Clearences (for backfills).
+
+	Amounts are taken like `current_amount` is set on validate, from the rounded or
+	grand total, so Clearences submitted before the ledger existed count too. Run by
+	the ``rebuild_clearence_ledger`` patch, or again with ``bench --site <site> execute
+	grand.grand.doctype.clearence_ledger.clearence_ledger.rebuild_clearence_ledger``
+	"""
+	frappe.db.delete("Clearence Ledger")
+	rows = frappe.db.sql(
+		"""
+		select customer, project, sum(coalesce(nullif(rounded_total, 0), grand_total)) as amount, count(*) as count,
+			substring_index(group_concat(name order by posting_date, creation separator ','), ',', -1) as last_clearence
+		from `tabClearence`
+		where docstatus = 1
+		group by customer, project
+		""",
+		as_dict=True,
+	)
+	for row in rows:
+		ledger = frappe.new_doc("Clearence Ledger")
+		ledger.name = get_ledger_name(row.customer, row.project)
+		ledger.update(
+			{
+				"customer": row.customer,
+				"project": row.project,
+				"cumulative_amount": flt(row.amount),
+				"clearence_count": row.count,
+				"last_clearence": row.last_clearence,
+			}
+		)
+		ledger.db_insert()
+	frappe.db.commit()
+	return len(rows)
@@ -0,0 +1,59 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand.doctype.clearence.clearence import Clearence
+from grand.grand.doctype.clearence_ledger.clearence_ledger import (
+	get_ledger_name,
+	rebuild_clearence_ledger,
+	update_clearence_ledger,
+)
+
+
+class TestClearenceLedger(FrappeTestCase):
+	def test_name_is_stable_per_customer_and_project(self):
+		self.assertEqual(get_ledger_name("_Test Customer", "P-1"), get_ledger_name("_Test Customer", "P-1"))
+		self.assertNotEqual(get_ledger_name("_Test Customer", "P-1"), get_ledger_name("_Test Customer", None))
+		self.assertNotEqual(get_ledger_name("A", "BC"), get_ledger_name("AB", "C"))
+
+	def test_running_balance_reads_the_ledger_once(self):
+		doc = frappe._dict(
+			customer="_Test Customer", project="P-1", rounded_total=250, grand_total=249.6, paid_amount=300
+		)
+		doc.precision = lambda fieldname: 2
+
+		with patch(
+			"grand.grand.doctype.clearence.clearence.get_previous_amount", return_value=1000
+		) as get_previous_amount:
+			Clearence.set_running_balance(doc)
+
+		get_previous_amount.assert_called_once_with("_Test Customer", "P-1", for_update=False)
+		self.assertEqual((doc.previous_amount, doc.current_amount, doc.due_amount), (1000, 250, 1250))
+		self.assertEqual(doc.paid_percentage, 24)
+
+	def test_cancel_subtracts_from_the_running_total(self):
+		# submitted before `current_amount` existed
+		doc = frappe._dict(name="CLR-0001", customer="_Test Customer", project="P-1", rounded_total=250)
+
+		with patch("grand.grand.doctype.clearence_ledger.clearence_ledger.frappe.db.sql") as sql:
+			update_clearence_ledger(doc, sign=-1)
+
+		upsert, reset = sql.call_args_list
+		values = upsert.args[1]
+		self.assertEqual((values["amount"], values["count"]), (-250, -1))
+		self.assertEqual(values["name"], get_ledger_name("_Test Customer", "P-1"))
+		self.assertIn("ledger.last_clearence = %(clearence)s", reset.args[0])
+		self.assertEqual(reset.args[1], {"name": values["name"], "clearence": "CLR-0001"})
+
+	def test_rebuild_sums_totals_not_current_amount(self):
+		with (
+			patch("frappe.db.delete", create=True),
+			patch("frappe.db.sql", return_value=[]) as sql,
+		):
+			self.assertEqual(rebuild_clearence_ledger(), 0)
+
+		self.assertIn("sum(coalesce(nullif(rounded_total, 0), grand_total))", sql.call_args.args[0])
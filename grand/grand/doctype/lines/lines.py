@@ -1,9 +1,24 @@
 # Copyright (c) 2025, Connect 4 Systems and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
+from frappe import _
 from frappe.model.document import Document
 
+from grand.grand.doctype.lines_production.lines_production import update_lines_production
+
 
 class lines(Document):
-	pass
+	def on_submit(self):
+		update_lines_production(self)
+
+	def before_cancel(self):
+		if self.stock_entry and frappe.db.get_value("Stock Entry", self.stock_entry, "docstatus") == 1:
+			frappe.throw(
+				_("Cancel Stock Entry {0} first; it consumes the quantities of this sheet.").format(
+					self.stock_entry
+				)
+			)
+
+	def on_cancel(self):
+		update_lines_production(self, sign=-1)
@@ -1,9 +1,105 @@
 # Copyright (c) 2025, Connect 4 Systems and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from grand.grand.lines_stock import clear_lines_stock_entry, group_lines, process_pending_lines
+
 
 class Testlines(FrappeTestCase):
-	pass
+	def test_sheets_grouped_by_warehouse_project_and_date(self):
+		sheets = [
+			frappe._dict(name="L-1", warehouse="Site - _TC", project="P1", date="2026-03-01"),
+			frappe._dict(name="L-2", warehouse="Site - _TC", project="P1", date="2026-03-01"),
+			frappe._dict(name="L-3", warehouse="Site - _TC", project="P1", date="2026-03-02"),
+		]
+		rows = [
+			frappe._dict(parent="L-1", item="Asphalt", qty=4),
+			frappe._dict(parent="L-2", item="Asphalt", qty=6),
+			frappe._dict(parent="L-2", item="Dust", qty=1),
+			frappe._dict(parent="L-3", item="Asphalt", qty=3),
+			frappe._dict(parent="L-3", item=None, qty=3),
+		]
+
+		with patch("frappe.get_all", return_value=rows) as get_all:
+			groups = group_lines(sheets)
+
+		self.assertEqual(get_all.call_count, 1)
+		first = groups[("Site - _TC", "P1", "2026-03-01")]
+		self.assertEqual(first["sheets"], ["L-1", "L-2"])
+		self.assertEqual(first["items"], {"Asphalt": 10, "Dust": 1})
+		self.assertEqual(groups[("Site - _TC", "P1", "2026-03-02")]["items"], {"Asphalt": 3})
+
+	def test_sheets_without_date_are_reported(self):
+		sheets = [frappe._dict(name="L-1", warehouse="Site - _TC", project="P1", date=None)]
+		rows = [frappe._dict(parent="L-1", item="Asphalt", qty=4)]
+
+		with (
+			patch("grand.grand.lines_stock.get_pending_lines", return_value=sheets),
+			patch("frappe.get_all", side_effect=[rows, []]),
+			patch("grand.grand.lines_stock.prefetch_stock_uoms"),
+			patch("grand.grand.lines_stock.make_lines_stock_entry") as make_lines_stock_entry,
+		):
+			report = process_pending_lines()
+
+		make_lines_stock_entry.assert_not_called()
+		self.assertEqual(report, [{"sheets": ["L-1"], "status": "Skipped", "error": "No date"}])
+
+	def test_cancelling_stock_entry_unlinks_sheets(self):
+		with patch("frappe.db.set_value", create=True) as set_value:
+			clear_lines_stock_entry(frappe._dict(doctype="Stock Entry", name="SE-1"), "on_cancel")
+
+		set_value.assert_called_once_with(
+			"lines",
+			{"stock_entry": "SE-1"},
+			{"stock_entry": None, "stock_entry_cancelled": 1},
+			update_modified=False,
+		)
+
+	def test_cancelled_stock_entry_is_not_made_again(self):
+		sheets = {
+			"L-1": frappe._dict(
+				name="L-1",
+				docstatus=1,
+				warehouse="Site - _TC",
+				project="P1",
+				date="2026-03-01",
+				stock_entry="SE-1",
+				stock_entry_cancelled=0,
+			)
+		}
+
+		def matches(sheet, filters):
+			for fieldname, condition in filters.items():
+				value = sheet.get(fieldname)
+				# ("is", "set") / ("is", "not set") or a plain value
+				expected = condition[1] == "set" if isinstance(condition, tuple) else condition
+				if (bool(value) if isinstance(condition, tuple) else value) != expected:
+					return False
+			return True
+
+		def get_all(doctype, filters=None, **kwargs):
+			if doctype == "lines":
+				return [sheet for sheet in sheets.values() if matches(sheet, filters)]
+			return [frappe._dict(parent="L-1", item="Asphalt", qty=4)] if doctype == "Lines Item" else []
+
+		def set_value(doctype, filters, values, update_modified=True):
+			for sheet in sheets.values():
+				if matches(sheet, filters):
+					sheet.update(values)
+
+		with (
+			patch("frappe.get_all", side_effect=get_all),
+			patch("frappe.db.set_value", side_effect=set_value, create=True),
+			patch("grand.grand.lines_stock.prefetch_stock_uoms"),
+			patch("grand.grand.lines_stock.make_lines_stock_entry") as make_lines_stock_entry,
+		):
+			clear_lines_stock_entry(frappe._dict(doctype="Stock Entry", name="SE-1"), "on_cancel")
+			report = process_pending_lines()
+
+		make_lines_stock_entry.assert_not_called()
+		self.assertEqual(report, [])
+		self.assertEqual((sheets["L-1"].stock_entry, sheets["L-1"].stock_entry_cancelled), (None, 1))
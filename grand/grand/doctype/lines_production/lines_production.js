@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Connect 4 Systems and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Lines Production", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,85 @@
+# Copyright (c) 2026, Connect 4 Systems and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cstr, flt, getdate, now
+
+# one Lines Production row per distinct key; its name is derived from the key
+KEY_FIELDS = ("project", "sector", "block", "building", "item", "type", "date")
+UPSERT_BATCH_SIZE = 500
+
+
+class LinesProduction(Document):
+	pass
+
+
+def get_production_name(key):
+	return hashlib.md5("\x1f".join(cstr(value) for value in key).encode()).hexdigest()
+
+
+def get_lines_deltas(doc, sign=1):
+	"""Quantities of a `lines` document summed per aggregate key, multiplied by `sign`."""
+	date = getdate(doc.date) if doc.date else None
+	deltas = {}
+	for row in doc.get("lines_service") or []:
+		if not flt(row.qty):
+			continue
+		key = (doc.project, doc.sector, row.block, row.building, row.item, row.type, date)
+		deltas[key] = deltas.get(key, 0.0) + flt(row.qty) * sign
+	return deltas
+
+
+def update_lines_production(doc, sign=1):
+	apply_production_deltas(get_lines_deltas(doc, sign))
+
+
+def apply_production_deltas(deltas):
+	"""Add `deltas` ({key: qty}) to the aggregate table with batched upserts."""
+	items = [(key, qty) for key, qty in deltas.items() if flt(qty)]
+	timestamp = now()
+	user = frappe.session.user
+	for start in range(0, len(items), UPSERT_BATCH_SIZE):
+		batch = items[start : start + UPSERT_BATCH_SIZE]
+		values = []
+		for key, qty in batch:
+			values.extend((get_production_name(key), timestamp, timestamp, user, user, *key, flt(qty)))
+		placeholders = ", ".join(["(" + ", ".join(["%s"] * (6 + len(KEY_FIELDS))) + ")"] * len(batch))
+		frappe.db.sql(
+			f"""
+			insert into `tabLines Production`
+				(name, creation, modified, owner, modified_by, {", ".join(f"`{f}`" for f in KEY_FIELDS)}, qty)
+			values {placeholders}
+			on duplicate key update qty = qty + values(qty), modified = values(modified)
+			""",
+			values,
+		)
+
+
+def rebuild_lines_production(from_date=None, to_date=None):
+	"""Recompute the aggregate from submitted `lines`, for all dates or the given range."""
+	conditions = ""
+	if from_date:
+		conditions += " and {date} >= %(from_date)s"
+	if to_date:
+		conditions += " and {date} <= %(to_date)s"
+	values = {"from_date": from_date, "to_date": to_date}
+
+	frappe.db.sql(
+		f"delete from `tabLines Production` where 1=1 {conditions.format(date='`date`')}",
+		values,
+	)
+	rows = frappe.db.sql(
+		f"""
+		select l.project, l.sector, li.block, li.building, li.item, li.type, l.date, sum(li.qty)
+		from `tablines` l
+		inner join `tabLines Item` li on li.parent = l.name and li.parenttype = 'lines'
+		where l.docstatus = 1 {conditions.format(date='l.date')}
+		group by l.project, l.sector, li.block, li.building, li.item, li.type, l.date
+		""",
+		values,
+	)
+	apply_production_deltas({tuple(row[:7]): row[7] for row in rows})
+	return len(rows)
@@ -0,0 +1,31 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand.doctype.lines_production.lines_production import get_lines_deltas, get_production_name
+
+
+class TestLinesProduction(FrappeTestCase):
+	def test_rows_sharing_a_key_are_summed(self):
+		doc = frappe._dict(
+			project="_Test Project",
+			sector="_Test Sector",
+			date="2026-03-01",
+			lines_service=[
+				frappe._dict(block="S-1", building="S-1-1", item="Asphalt 60/70", type="Asphalt", qty=4),
+				frappe._dict(block="S-1", building="S-1-1", item="Asphalt 60/70", type="Asphalt", qty=6),
+				frappe._dict(block="S-1", building="S-1-2", item="Dust", type="Dust", qty=2),
+				frappe._dict(block="S-1", building="S-1-2", item="Dust", type="Dust", qty=0),
+			],
+		)
+
+		deltas = get_lines_deltas(doc, sign=-1)
+
+		self.assertEqual(sorted(deltas.values()), [-10, -2])
+
+	def test_name_is_stable_per_key(self):
+		key = ("_Test Project", "_Test Sector", "S-1", None, "Dust", "Dust", None)
+		self.assertEqual(get_production_name(key), get_production_name(tuple(key)))
+		self.assertNotEqual(get_production_name(key), get_production_name((*key[:-1], "2026-03-01")))
@@ -1,8 +1,50 @@
 // Copyright (c) 2025, Connect 4 Systems and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Sector", {
-// 	refresh(frm) {
+frappe.ui.form.on("Sector", {
+	refresh(frm) {
+		if (frm.is_new()) return;
 
-// 	},
-// });
+		frm.add_custom_button(__("Generate Blocks & Buildings"), () => {
+			const dialog = new frappe.ui.Dialog({
+				title: __("Generate Blocks & Buildings"),
+				fields: [
+					{ fieldname: "project", fieldtype: "Link", options: "Project", label: __("Project"), reqd: 1 },
+					{
+						fieldname: "blocks",
+						fieldtype: "Data",
+						label: __("Blocks"),
+						reqd: 1,
+						description: __("Ranges and values, e.g. 1-20 or A,B,C"),
+					},
+					{
+						fieldname: "buildings",
+						fieldtype: "Data",
+						label: __("Buildings per Block"),
+						description: __("e.g. 01-12"),
+					},
+				],
+				primary_action_label: __("Generate"),
+				primary_action(values) {
+					frappe
+						.call({
+							method: "grand.grand.hierarchy.generate_hierarchy",
+							args: { sector: frm.doc.name, ...values },
+							freeze: true,
+						})
+						.then((r) => {
+							dialog.hide();
+							frappe.msgprint(
+								__("{0} Blocks and {1} Buildings created, {2} already existed", [
+									r.message.blocks,
+									r.message.buildings,
+									r.message.skipped,
+								])
+							);
+						});
+				},
+			});
+			dialog.show();
+		});
+	},
+});
@@ -1,9 +1,14 @@
 # Copyright (c) 2025, Connect 4 Systems and contributors
 # For license information, please see license.txt
 
-# import frappe
 from frappe.model.document import Document
 
+from grand.grand.hierarchy import clear_sector_tree
+
 
 class Sector(Document):
-	pass
+	def on_trash(self):
+		clear_sector_tree(self.name)
+
+	def after_rename(self, old, new, merge=False):
+		clear_sector_tree(old, new)
@@ -1,9 +1,51 @@
 # Copyright (c) 2025, Connect 4 Systems and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
 from frappe.tests.utils import FrappeTestCase
 
+from grand.grand import hierarchy
+
 
 class TestSector(FrappeTestCase):
-	pass
+	def test_sector_tree_is_cached_until_cleared(self):
+		tree = {"sector": "_Test Sector", "blocks": ["_Test Sector-1"], "buildings": {"_Test Sector-1": []}}
+		hierarchy.clear_sector_tree("_Test Sector")
+		with patch.object(hierarchy, "build_sector_tree", return_value=tree) as build:
+			self.assertEqual(hierarchy.get_sector_tree("_Test Sector"), tree)
+			self.assertEqual(hierarchy.get_sector_tree("_Test Sector"), tree)
+			self.assertEqual(build.call_count, 1)
+
+			hierarchy.clear_sector_tree("_Test Sector")
+			hierarchy.get_sector_tree("_Test Sector")
+			self.assertEqual(build.call_count, 2)
+		hierarchy.clear_sector_tree("_Test Sector")
+
+	def test_specs_expand_ranges_and_lists(self):
+		self.assertEqual(hierarchy.expand_spec("1-3,A, 2"), ["1", "2", "3", "A"])
+		self.assertEqual(hierarchy.expand_spec("08-11"), ["08", "09", "10", "11"])
+		self.assertEqual(hierarchy.expand_spec('["North", "South"]'), ["North", "South"])
+		self.assertEqual(hierarchy.expand_spec(""), [])
+
+	def test_generate_skips_existing_names_and_inserts_in_bulk(self):
+		existing = [("Block", "_Test Sector-1"), ("Building", "_Test Sector-1-01")]
+		with (
+			patch.object(hierarchy.frappe.db, "exists", return_value=True),
+			patch.object(hierarchy.frappe.db, "sql", return_value=existing) as sql,
+			patch.object(hierarchy.frappe.db, "bulk_insert", create=True) as bulk_insert,
+			patch.object(hierarchy, "clear_sector_tree") as clear_sector_tree,
+		):
+			result = hierarchy.generate_hierarchy("_Test Sector", "_Test Project", "1-3", "01-04")
+
+		self.assertEqual(result, {"sector": 0, "blocks": 2, "buildings": 11, "skipped": 2})
+		sql.assert_called_once()
+		(block, block_fields, blocks), (building, _fields, buildings) = (
+			call.args for call in bulk_insert.call_args_list
+		)
+		self.assertEqual((block, building), ("Block", "Building"))
+		self.assertEqual([row[0] for row in blocks], ["_Test Sector-2", "_Test Sector-3"])
+		self.assertEqual(dict(zip(block_fields, blocks[0], strict=True))["block"], "2")
+		self.assertEqual(buildings[0][0], "_Test Sector-1-02")
+		self.assertEqual(buildings[0][-2:], ("_Test Sector-1", "02"))
+		clear_sector_tree.assert_called_once_with("_Test Sector")
@@ -1,9 +1,108 @@
 # Copyright (c) 2026, Connect 4 Systems and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
+
+from grand.grand.metrics import instrument
+
+TEMPLATE_CACHE_KEY = "grand_selling_deductions_template"
+DEFAULT_TEMPLATE_CACHE_KEY = "grand_default_selling_deductions_template"
+DEDUCTION_FIELDS = ("account", "percent", "value", "cost_center", "project")
 
 
 class SellingDeductionsTemplate(Document):
-	pass
+	def on_update(self):
+		clear_template_cache(self.name)
+
+	def on_trash(self):
+		clear_template_cache(self.name)
+
+
+def clear_template_cache(template):
+	frappe.cache().hdel(TEMPLATE_CACHE_KEY, template)
+	frappe.cache().delete_value(DEFAULT_TEMPLATE_CACHE_KEY)
+
+
+def get_template_rows(template):
+	"""Deduction rows of `template` as plain dicts, cached until the template is saved."""
+	rows = frappe.cache().hget(TEMPLATE_CACHE_KEY, template)
+	if rows is None:
+		meta = frappe.get_meta("Deduction")
+		rows = frappe.get_all(
+			"Deduction",
+			filters={
+				"parent": template,
+				"parenttype": "Selling Deductions Template",
+				"parentfield": "deductions",
+			},
+			fields=[f for f in DEDUCTION_FIELDS if meta.has_field(f)],
+			order_by="idx",
+		)
+		rows = [dict(row) for row in rows]
+		frappe.cache().hset(TEMPLATE_CACHE_KEY, template, rows)
+	return rows
+
+
+def get_default_template():
+	template = frappe.cache().get_value(DEFAULT_TEMPLATE_CACHE_KEY)
+	if template is None:
+		template = frappe.db.get_value("Selling Deductions Template", {"default": 1}, "name") or ""
+		frappe.cache().set_value(DEFAULT_TEMPLATE_CACHE_KEY, template)
+	return template or None
+
+
+def get_template_deductions(template, rounded_total):
+	"""Template rows with `value` computed from their percent of `rounded_total`."""
+	base_total = flt(rounded_total)
+	return [
+		{
+			**row,
+			"value": flt(flt(row.get("percent")) * base_total / 100.0, 2)
+			if row.get("percent")
+			else flt(row.get("value"), 2),
+		}
+		for row in get_template_rows(template)
+	]
+
+
+@frappe.whitelist()
+def get_deductions(template, rounded_total=0):
+	frappe.has_permission("Selling Deductions Template", "read", template, throw=True)
+	return get_template_deductions(template, rounded_total)
+
+
+def get_row_values(doc):
+	return [tuple(row.get(f) for f in DEDUCTION_FIELDS) for row in doc.get("deductions") or []]
+
+
+@instrument
+def apply_deductions_template(doc, method=None):
+	"""Fill `deductions` from the document's template, or the default one for new documents.
+
+	Runs on Sales Invoice validate (and from Clearence.validate) so documents created
+	through the API or data import get the same rows as the form would add. When the
+	template changes, rows the previous template filled in are replaced; rows entered
+	on a new document or edited in the same save are kept. Returns are skipped.
+	"""
+	if not doc.meta.has_field("deductions") or not doc.meta.has_field("selling_deductions_template"):
+		return
+	if doc.get("is_return"):
+		return
+	if not (doc.is_new() or doc.has_value_changed("selling_deductions_template")):
+		return
+
+	if not doc.selling_deductions_template and doc.is_new() and not doc.get("deductions"):
+		doc.selling_deductions_template = get_default_template()
+	if not doc.selling_deductions_template:
+		return
+
+	if doc.get("deductions"):
+		before = None if doc.is_new() else doc.get_doc_before_save()
+		if not before or get_row_values(doc) != get_row_values(before):
+			return
+		doc.set("deductions", [])
+
+	for row in get_template_deductions(doc.selling_deductions_template, doc.get("rounded_total")):
+		doc.append("deductions", row)
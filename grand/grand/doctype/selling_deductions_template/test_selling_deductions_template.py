@@ -1,9 +1,93 @@
 # Copyright (c) 2026, Connect 4 Systems and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from grand.grand.doctype.selling_deductions_template import selling_deductions_template as template_module
+from grand.tests.utils import FakeDoc
+
+TEMPLATE_ROWS = [{"account": "_Test Retention - _TC", "percent": 5, "value": 100}]
+
+
+class FakeInvoice(FakeDoc):
+	meta = frappe._dict(has_field=lambda fieldname: True)
+
+	def __init__(self, before=None, **fields):
+		super().__init__(**fields)
+		self.before = before
+
+	def is_new(self):
+		return self.before is None
+
+	def get_doc_before_save(self):
+		return self.before
+
+	def has_value_changed(self, fieldname):
+		return self.get(fieldname) != self.before.get(fieldname)
+
+	def set(self, fieldname, value):
+		setattr(self, fieldname, value)
+
+	def append(self, fieldname, row):
+		self.__dict__.setdefault(fieldname, []).append(frappe._dict(row))
+
 
 class TestSellingDeductionsTemplate(FrappeTestCase):
-	pass
+	def test_values_computed_from_rounded_total(self):
+		rows = [
+			{"account": "_Test Retention - _TC", "percent": 5, "value": 0},
+			{"account": "_Test Stamp - _TC", "percent": 0, "value": 12.5},
+		]
+		with patch.object(template_module, "get_template_rows", return_value=rows):
+			deductions = template_module.get_template_deductions("_Test Template", 2000)
+
+		self.assertEqual([d["value"] for d in deductions], [100, 12.5])
+		# cached rows must not be mutated by the computation
+		self.assertEqual(rows[0]["value"], 0)
+
+	def test_save_invalidates_cached_rows(self):
+		frappe.cache().hset(template_module.TEMPLATE_CACHE_KEY, "_Test Template", [{"account": "x"}])
+		frappe.cache().set_value(template_module.DEFAULT_TEMPLATE_CACHE_KEY, "_Test Template")
+
+		template_module.clear_template_cache("_Test Template")
+
+		self.assertIsNone(frappe.cache().hget(template_module.TEMPLATE_CACHE_KEY, "_Test Template"))
+		self.assertIsNone(frappe.cache().get_value(template_module.DEFAULT_TEMPLATE_CACHE_KEY))
+
+	def apply(self, doc):
+		with (
+			patch.object(template_module, "get_template_deductions", return_value=TEMPLATE_ROWS),
+			patch.object(template_module, "get_default_template", return_value="_Test Default"),
+		):
+			template_module.apply_deductions_template(doc)
+		return doc
+
+	def test_new_invoice_gets_default_template_rows(self):
+		doc = self.apply(FakeInvoice(selling_deductions_template=None, deductions=[]))
+		self.assertEqual(doc.selling_deductions_template, "_Test Default")
+		self.assertEqual(doc.deductions, TEMPLATE_ROWS)
+
+	def test_returns_are_skipped(self):
+		doc = self.apply(FakeInvoice(is_return=1, selling_deductions_template=None, deductions=[]))
+		self.assertIsNone(doc.selling_deductions_template)
+		self.assertEqual(doc.deductions, [])
+
+	def test_template_change_refills_untouched_rows(self):
+		old_rows = [frappe._dict(account="_Test Old - _TC", percent=2, value=40)]
+		before = FakeInvoice(selling_deductions_template="_Test Old", deductions=old_rows)
+		doc = self.apply(
+			FakeInvoice(before, selling_deductions_template="_Test New", deductions=list(old_rows))
+		)
+		self.assertEqual(doc.deductions, TEMPLATE_ROWS)
+
+	def test_template_change_keeps_rows_edited_in_the_same_save(self):
+		before = FakeInvoice(
+			selling_deductions_template="_Test Old",
+			deductions=[frappe._dict(account="_Test Old - _TC", percent=2, value=40)],
+		)
+		edited = [frappe._dict(account="_Test Old - _TC", percent=3, value=60)]
+		doc = self.apply(FakeInvoice(before, selling_deductions_template="_Test New", deductions=edited))
+		self.assertEqual(doc.deductions, edited)
@@ -0,0 +1,153 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, now
+
+SECTOR_TREE_CACHE_KEY = "grand_sector_tree"
+
+
+@frappe.whitelist()
+def get_sector_tree(sector):
+	"""Blocks and buildings of `sector` as one cached payload.
+
+	``{"sector": ..., "blocks": [block, ...], "buildings": {block: [building, ...]}}``
+	"""
+	frappe.has_permission("Block", "read", throw=True)
+	frappe.has_permission("Building", "read", throw=True)
+
+	tree = frappe.cache().hget(SECTOR_TREE_CACHE_KEY, sector)
+	if tree is None:
+		tree = build_sector_tree(sector)
+		frappe.cache().hset(SECTOR_TREE_CACHE_KEY, sector, tree)
+	return tree
+
+
+def build_sector_tree(sector):
+	blocks = frappe.get_all("Block", filters={"sector": sector}, pluck="name", order_by="name")
+	buildings = {block: [] for block in blocks}
+	for building in frappe.get_all(
+		"Building", filters={"sector": sector}, fields=["name", "block"], order_by="name"
+	):
+		buildings.setdefault(building.block, []).append(building.name)
+	return {"sector": sector, "blocks": blocks, "buildings": buildings}
+
+
+def clear_sector_tree(*sectors):
+	for sector in set(sectors):
+		if sector:
+			frappe.cache().hdel(SECTOR_TREE_CACHE_KEY, sector)
+
+
+def clear_sector_tree_for(doc):
+	"""Drop the cached tree of the sector `doc` belongs to now and belonged to before this save."""
+	before = doc.get_doc_before_save()
+	clear_sector_tree(doc.sector, before.sector if before else None)
+
+
+# upper bound on the documents one generate_hierarchy call may create
+MAX_GENERATED_DOCS = 50_000
+
+
+@frappe.whitelist()
+def generate_hierarchy(sector, project, blocks, buildings, dry_run=0):
+	"""Create `sector` with its Blocks and every Block's Buildings in bulk.
+
+	`blocks` and `buildings` are compact specs (see `expand_spec`), e.g.
+	``blocks="1-20"`` and ``buildings="01-12"`` create blocks ``{sector}-1`` ..
+	``{sector}-20`` with buildings ``{block}-01`` .. ``{block}-12`` each. Names are
+	built once from the doctypes' naming formats, names that already exist are
+	found with one query and skipped, and the rest is written with batched
+	inserts. Returns the counts created (or that would be, with `dry_run`).
+	"""
+	frappe.has_permission("Block", "create", throw=True)
+	frappe.has_permission("Building", "create", throw=True)
+
+	if not frappe.db.exists("Project", project):
+		frappe.throw(_("Project {0} not found").format(project))
+
+	block_values = expand_spec(blocks)
+	building_values = expand_spec(buildings)
+	if not block_values:
+		frappe.throw(_("No blocks to create"))
+	if len(block_values) * (1 + len(building_values)) > MAX_GENERATED_DOCS:
+		frappe.throw(
+			_("At most {0} Blocks and Buildings can be generated at once").format(MAX_GENERATED_DOCS)
+		)
+
+	block_rows = {f"{sector}-{block}": block for block in block_values}
+	building_rows = {
+		f"{block_name}-{building}": (block_name, building)
+		for block_name in block_rows
+		for building in building_values
+	}
+	existing = get_existing_hierarchy_names(list(block_rows), list(building_rows))
+	block_rows = {name: block for name, block in block_rows.items() if ("Block", name) not in existing}
+	building_rows = {name: row for name, row in building_rows.items() if ("Building", name) not in existing}
+
+	result = {
+		"sector": 0 if frappe.db.exists("Sector", sector) else 1,
+		"blocks": len(block_rows),
+		"buildings": len(building_rows),
+		"skipped": len(existing),
+	}
+	if cint(dry_run):
+		return result
+
+	if result["sector"]:
+		frappe.get_doc({"doctype": "Sector", "sector": sector}).insert()
+
+	timestamp = now()
+	user = frappe.session.user
+	standard = (timestamp, timestamp, user, user)
+	frappe.db.bulk_insert(
+		"Block",
+		["name", "creation", "modified", "owner", "modified_by", "project", "sector", "block"],
+		[(name, *standard, project, sector, block) for name, block in block_rows.items()],
+		ignore_duplicates=True,
+	)
+	frappe.db.bulk_insert(
+		"Building",
+		["name", "creation", "modified", "owner", "modified_by", "project", "sector", "block", "building"],
+		[
+			(name, *standard, project, sector, block, building)
+			for name, (block, building) in building_rows.items()
+		],
+		ignore_duplicates=True,
+	)
+	clear_sector_tree(sector)
+	return result
+
+
+def expand_spec(spec):
+	"""Values of a compact spec: a list, or comma separated items and ``from-to`` ranges.
+
+	``"1-3,A"`` -> ``["1", "2", "3", "A"]``; zero padding of the range start is kept
+	(``"01-03"`` -> ``["01", "02", "03"]``). Order is kept, duplicates dropped.
+	"""
+	if isinstance(spec, str) and spec.strip().startswith("["):
+		spec = frappe.parse_json(spec)
+	parts = spec if isinstance(spec, list | tuple) else str(spec or "").split(",")
+
+	values = []
+	for part in (str(part).strip() for part in parts):
+		start, sep, end = part.partition("-")
+		if sep and start.isdigit() and end.isdigit():
+			width = len(start) if start.startswith("0") else 0
+			values.extend(str(number).zfill(width) for number in range(int(start), int(end) + 1))
+		elif part:
+			values.append(part)
+	return list(dict.fromkeys(values))
+
+
+def get_existing_hierarchy_names(blocks, buildings):
+	"""``{(doctype, name)}`` of the given Block and Building names that already exist, in one query."""
+	return {
+		(row[0], row[1])
+		for row in frappe.db.sql(
+			"""
+			select 'Block', name from `tabBlock` where name in %(blocks)s
+			union all
+			select 'Building', name from `tabBuilding` where name in %(buildings)s
+			""",
+			{"blocks": tuple(blocks) or ("",), "buildings": tuple(buildings) or ("",)},
+		)
+	}
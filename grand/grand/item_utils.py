@@ -0,0 +1,80 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from grand.grand.metrics import instrument
+
+UOM_CONVERSION_GENERATION_KEY = "grand:uom_conversion_generation"
+
+# process-wide: {site: {"generation": str, "factors": {item_code: {uom: conversion_factor}}}}
+_uom_conversion_cache = {}
+
+
+def get_stock_uoms(item_codes):
+	"""Return ``{item_code: stock_uom}`` for every code in ``item_codes``.
+
+	All codes not seen earlier in the request are fetched with a single query and
+	memoised on ``frappe.local``, so a request submitting several documents only
+	pays for each item once. Throws one error listing every unknown item.
+	"""
+	item_codes = list(dict.fromkeys(code for code in item_codes if code))
+	cache = prefetch_stock_uoms(item_codes)
+
+	missing = [code for code in item_codes if code not in cache]
+	if missing:
+		frappe.throw(_("Stock UOM not found for items: {0}").format(", ".join(missing)))
+
+	return {code: cache[code] for code in item_codes}
+
+
+def prefetch_stock_uoms(item_codes):
+	"""Load the stock UOMs of `item_codes` not cached yet into the request cache, without validating."""
+	cache = _get_request_cache()
+	to_fetch = list({code for code in item_codes if code and code not in cache})
+	if to_fetch:
+		for item in frappe.get_all("Item", filters={"name": ("in", to_fetch)}, fields=["name", "stock_uom"]):
+			if item.stock_uom:
+				cache[item.name] = item.stock_uom
+	return cache
+
+
+def _get_request_cache():
+	cache = getattr(frappe.local, "grand_stock_uom_cache", None)
+	if cache is None:
+		cache = frappe.local.grand_stock_uom_cache = {}
+	return cache
+
+
+def get_conversion_factors(item_codes):
+	"""Return ``{item_code: {uom: conversion_factor}}`` from each item's UOM Conversion Details.
+
+	Factors are kept per site for the life of the worker process; items not seen
+	yet are loaded with a single query. Saving or deleting an Item bumps a
+	generation key in Redis, which drops every worker's copy on its next lookup.
+	"""
+	factors = _get_conversion_cache()
+	to_fetch = list({code for code in item_codes if code and code not in factors})
+	if to_fetch:
+		for code in to_fetch:
+			factors[code] = {}
+		for row in frappe.get_all(
+			"UOM Conversion Detail",
+			filters={"parenttype": "Item", "parent": ("in", to_fetch)},
+			fields=["parent", "uom", "conversion_factor"],
+		):
+			factors[row.parent][row.uom] = flt(row.conversion_factor)
+	return {code: factors[code] for code in item_codes if code}
+
+
+@instrument
+def clear_uom_conversion_cache(doc=None, method=None):
+	"""Item on_update/on_trash: invalidate cached conversion factors in every worker."""
+	frappe.cache().set_value(UOM_CONVERSION_GENERATION_KEY, frappe.generate_hash(length=10))
+
+
+def _get_conversion_cache():
+	generation = frappe.cache().get_value(UOM_CONVERSION_GENERATION_KEY)
+	cache = _uom_conversion_cache.get(frappe.local.site)
+	if cache is None or cache["generation"] != generation:
+		cache = _uom_conversion_cache[frappe.local.site] = {"generation": generation, "factors": {}}
+	return cache["factors"]
@@ -0,0 +1,180 @@
+import frappe
+from frappe.utils import cint, flt
+
+from grand.grand.item_utils import get_stock_uoms, prefetch_stock_uoms
+from grand.grand.metrics import instrument
+
+LINES_STOCK_ENTRY_JOB_ID = "grand-lines-stock-entries"
+LINES_BATCH_SIZE = 500
+
+
+@frappe.whitelist()
+def make_stock_entries_from_lines(from_date=None, to_date=None):
+	"""Queue consolidated Material Issues for submitted Lines sheets that have none yet."""
+	frappe.has_permission("Stock Entry", "create", throw=True)
+	frappe.enqueue(
+		"grand.grand.lines_stock.process_pending_lines",
+		queue="long",
+		timeout=3600,
+		job_id=LINES_STOCK_ENTRY_JOB_ID,
+		deduplicate=True,
+		from_date=from_date,
+		to_date=to_date,
+	)
+
+
+@instrument
+def process_pending_lines_daily():
+	"""Daily scheduler job, enabled with site config `grand_lines_stock_entries`: sheets up to yesterday."""
+	if not cint(frappe.conf.get("grand_lines_stock_entries")):
+		return
+	from frappe.utils import add_days, nowdate
+
+	process_pending_lines(to_date=add_days(nowdate(), -1))
+
+
+def get_pending_lines(from_date=None, to_date=None):
+	filters = {
+		"docstatus": 1,
+		"stock_entry": ("is", "not set"),
+		"stock_entry_cancelled": 0,
+		"warehouse": ("is", "set"),
+	}
+	if from_date and to_date:
+		filters["date"] = ("between", [from_date, to_date])
+	elif from_date:
+		filters["date"] = (">=", from_date)
+	elif to_date:
+		filters["date"] = ("<=", to_date)
+	return frappe.get_all(
+		"lines", filters=filters, fields=["name", "warehouse", "project", "date"], order_by="date, name"
+	)
+
+
+def group_lines(sheets):
+	"""Group sheets by (warehouse, project, date) with item quantities summed across their rows.
+
+	Returns ``{key: {"sheets": [name], "items": {item: qty}}}``; rows are read in
+	batches with one query each.
+	"""
+	groups = {}
+	sheet_keys = {}
+	for sheet in sheets:
+		key = (sheet.warehouse, sheet.project, sheet.date)
+		groups.setdefault(key, {"sheets": [], "items": {}})["sheets"].append(sheet.name)
+		sheet_keys[sheet.name] = key
+
+	names = list(sheet_keys)
+	for start in range(0, len(names), LINES_BATCH_SIZE):
+		for row in frappe.get_all(
+			"Lines Item",
+			filters={"parenttype": "lines", "parent": ("in", names[start : start + LINES_BATCH_SIZE])},
+			fields=["parent", "item", "qty"],
+		):
+			if not row.item or not flt(row.qty):
+				continue
+			items = groups[sheet_keys[row.parent]]["items"]
+			items[row.item] = items.get(row.item, 0.0) + flt(row.qty)
+
+	return groups
+
+
+@instrument
+def process_pending_lines(from_date=None, to_date=None):
+	"""Create one submitted Material Issue per warehouse/project/date for pending Lines sheets.
+
+	Each group is committed on its own and failures are reported per group.
+	Returns ``[{"sheets", "status", "stock_entry"|"error"}]``.
+	"""
+	groups = group_lines(get_pending_lines(from_date, to_date))
+	if not groups:
+		return []
+
+	prefetch_stock_uoms({item for group in groups.values() for item in group["items"]})
+	companies = dict(
+		frappe.get_all(
+			"Warehouse",
+			filters={"name": ("in", list({warehouse for warehouse, _project, _date in groups}))},
+			fields=["name", "company"],
+			as_list=True,
+		)
+	)
+
+	report = []
+	for (warehouse, project, date), group in groups.items():
+		result = {"sheets": group["sheets"]}
+		if not date:
+			report.append({**result, "status": "Skipped", "error": "No date"})
+			continue
+		if not group["items"]:
+			report.append({**result, "status": "Skipped", "error": "No item quantities"})
+			continue
+
+		frappe.db.savepoint("grand_lines_stock_entry")
+		try:
+			stock_entry = make_lines_stock_entry(companies.get(warehouse), warehouse, project, date, group)
+			frappe.db.set_value(
+				"lines",
+				{"name": ("in", group["sheets"])},
+				"stock_entry",
+				stock_entry.name,
+				update_modified=False,
+			)
+			result.update(status="Created", stock_entry=stock_entry.name)
+		except Exception as e:
+			frappe.db.rollback(save_point="grand_lines_stock_entry")
+			frappe.clear_messages()
+			frappe.log_error(title=f"Lines Stock Entry failed for {warehouse} {date}")
+			result.update(status="Failed", error=str(e))
+		frappe.db.commit()
+		report.append(result)
+
+	return report
+
+
+@instrument
+def clear_lines_stock_entry(doc, method=None):
+	"""Stock Entry on_cancel: unlink the Lines sheets it was made from.
+
+	Frappe refuses to cancel a document still linked from submitted ones, and a
+	sheet refuses to cancel while its Stock Entry is submitted; unlinking here lets
+	the entry be cancelled first. The sheets are flagged `stock_entry_cancelled` so
+	the daily job does not issue them again; amending a sheet queues it anew.
+	"""
+	frappe.db.set_value(
+		"lines",
+		{"stock_entry": doc.name},
+		{"stock_entry": None, "stock_entry_cancelled": 1},
+		update_modified=False,
+	)
+
+
+def make_lines_stock_entry(company, warehouse, project, date, group):
+	stock_uoms = get_stock_uoms(group["items"])
+
+	stock_entry = frappe.new_doc("Stock Entry")
+	stock_entry.stock_entry_type = "Material Issue"
+	stock_entry.company = company
+	stock_entry.set_posting_time = 1
+	stock_entry.posting_date = date
+	stock_entry.project = project
+	for item_code, qty in group["items"].items():
+		stock_entry.append(
+			"items",
+			{
+				"item_code": item_code,
+				"qty": flt(qty),
+				"uom": stock_uoms[item_code],
+				"stock_uom": stock_uoms[item_code],
+				"conversion_factor": 1,
+				"s_warehouse": warehouse,
+				"basic_rate": 0.0,
+				"allow_zero_valuation_rate": 1,
+				"project": project,
+			},
+		)
+
+	stock_entry.insert(ignore_permissions=True)
+	stock_entry.submit()
+	stock_entry.add_comment("Comment", f"Auto-created from Lines {', '.join(group['sheets'])}")
+	return stock_entry
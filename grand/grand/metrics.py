@@ -0,0 +1,176 @@
+import functools
+import time
+
+import frappe
+
+from grand.grand.tracing import get_logger
+
+METRICS_CACHE_KEY = "grand_metrics"
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+LABELS = ("handler", "doctype", "event")
+
+
+def instrument(func):
+	"""Record calls, errors, DB queries and latency of a document hook or background job.
+
+	Enabled with site config `grand_metrics`; when it is unset the wrapper only
+	reads the flag. Each call is written to a per-site Redis hash in one round
+	trip, readable in Prometheus text format through `get_metrics`. Doc event
+	calls are labelled with the document's doctype and the event name.
+	"""
+	handler = f"{func.__module__}.{func.__qualname__}"
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		if not frappe.conf.get("grand_metrics"):
+			return func(*args, **kwargs)
+
+		labels = get_call_labels(handler, args, kwargs)
+		queries = _start_query_count()
+		start = time.perf_counter()
+		failed = True
+		try:
+			result = func(*args, **kwargs)
+			failed = False
+			return result
+		finally:
+			seconds = time.perf_counter() - start
+			record_call(labels, seconds, _stop_query_count(queries), failed)
+
+	wrapper.grand_instrumented = True
+	return wrapper
+
+
+def get_call_labels(handler, args, kwargs):
+	"""``handler|doctype|event``; doctype and event are only set for ``(doc, method)`` hook calls."""
+	doc = args[0] if args else kwargs.get("doc")
+	doctype = getattr(doc, "doctype", None)
+	if not isinstance(doctype, str):
+		return f"{handler}||"
+	event = kwargs.get("method", args[1] if len(args) > 1 else None)
+	return "|".join((handler, doctype, event if isinstance(event, str) else ""))
+
+
+def record_call(labels, seconds, queries, failed):
+	try:
+		cache = frappe.cache()
+		key = cache.make_key(METRICS_CACHE_KEY)
+		pipe = cache.pipeline()
+		pipe.hincrby(key, f"{labels}|calls", 1)
+		if failed:
+			pipe.hincrby(key, f"{labels}|errors", 1)
+		pipe.hincrby(key, f"{labels}|queries", queries)
+		pipe.hincrbyfloat(key, f"{labels}|seconds", seconds)
+		pipe.hincrby(key, f"{labels}|le={get_bucket(seconds)}", 1)
+		pipe.execute()
+	except Exception:
+		# metrics must never fail the save or job they measure
+		get_logger().warning({"operation": "record_metrics", "labels": labels}, exc_info=True)
+
+
+def get_bucket(seconds):
+	for bound in LATENCY_BUCKETS:
+		if seconds <= bound:
+			return bound
+	return "+Inf"
+
+
+def _start_query_count():
+	"""Count `frappe.db.sql` calls until the outermost instrumented call returns."""
+	local = frappe.local
+	if frappe.db is None:
+		return 0
+	if not getattr(local, "grand_query_counter", None):
+		counter = frappe._dict(db=frappe.db, sql=frappe.db.sql, count=0, depth=0)
+
+		def counted_sql(*args, **kwargs):
+			counter.count += 1
+			return counter.sql(*args, **kwargs)
+
+		counter.db.sql = counted_sql
+		local.grand_query_counter = counter
+	local.grand_query_counter.depth += 1
+	return local.grand_query_counter.count
+
+
+def _stop_query_count(started_at):
+	counter = getattr(frappe.local, "grand_query_counter", None)
+	if not counter:
+		return 0
+	counter.depth -= 1
+	if not counter.depth:
+		counter.db.sql = counter.sql
+		frappe.local.grand_query_counter = None
+	return counter.count - started_at
+
+
+def get_metric_values():
+	"""``{labels: {metric: value}}`` from the Redis hash, in one query."""
+	cache = frappe.cache()
+	raw = cache.execute_command("HGETALL", cache.make_key(METRICS_CACHE_KEY)) or {}
+	values = {}
+	for field, value in raw.items():
+		field = field.decode() if isinstance(field, bytes) else field
+		value = value.decode() if isinstance(value, bytes) else value
+		labels, metric = field.rsplit("|", 1)
+		values.setdefault(labels, {})[metric] = float(value)
+	return values
+
+
+def format_metrics(values):
+	"""Prometheus text exposition of `values` as returned by `get_metric_values`."""
+	counters = (
+		("grand_handler_calls_total", "calls", "Calls of grand document hooks and background jobs."),
+		("grand_handler_errors_total", "errors", "Calls that raised an exception."),
+		("grand_handler_queries_total", "queries", "Database queries run by the calls."),
+	)
+	lines = []
+	for name, metric, help_text in counters:
+		lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+		for labels, metrics in sorted(values.items()):
+			lines.append(f"{name}{{{format_labels(labels)}}} {_format_number(metrics.get(metric, 0))}")
+
+	name = "grand_handler_duration_seconds"
+	lines += [
+		f"# HELP {name} Latency of grand document hooks and background jobs.",
+		f"# TYPE {name} histogram",
+	]
+	for labels, metrics in sorted(values.items()):
+		label_text = format_labels(labels)
+		cumulative = 0
+		for bound in (*LATENCY_BUCKETS, "+Inf"):
+			cumulative += metrics.get(f"le={bound}", 0)
+			lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {_format_number(cumulative)}')
+		lines.append(f"{name}_sum{{{label_text}}} {metrics.get('seconds', 0)}")
+		lines.append(f"{name}_count{{{label_text}}} {_format_number(metrics.get('calls', 0))}")
+	return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+	return ",".join(
+		f'{label}="{_escape(value)}"' for label, value in zip(LABELS, labels.split("|"), strict=True) if value
+	)
+
+
+def _escape(value):
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value):
+	return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def clear_metrics():
+	frappe.cache().delete_value(METRICS_CACHE_KEY)
+
+
+@frappe.whitelist()
+def get_metrics():
+	"""Prometheus scrape endpoint: ``/api/method/grand.grand.metrics.get_metrics``."""
+	from werkzeug.wrappers import Response
+
+	frappe.only_for("System Manager")
+	return Response(
+		format_metrics(get_metric_values()), content_type="text/plain; version=0.0.4; charset=utf-8"
+	)
@@ -0,0 +1,50 @@
+// Copyright (c) 2026, Connect 4 Systems and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Lines Production Summary"] = {
+	filters: [
+		{
+			fieldname: "from_date",
+			label: __("From Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.month_start(),
+		},
+		{
+			fieldname: "to_date",
+			label: __("To Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.get_today(),
+		},
+		{
+			fieldname: "project",
+			label: __("Project"),
+			fieldtype: "Link",
+			options: "Project",
+		},
+		{
+			fieldname: "sector",
+			label: __("Sector"),
+			fieldtype: "Link",
+			options: "Sector",
+		},
+		{
+			fieldname: "block",
+			label: __("Block"),
+			fieldtype: "Link",
+			options: "Block",
+		},
+		{
+			fieldname: "type",
+			label: __("Type"),
+			fieldtype: "Select",
+			options: "\nAsphalt\nDust",
+		},
+		{
+			fieldname: "group_by",
+			label: __("Group By"),
+			fieldtype: "Select",
+			options: "Sector\nBlock\nBuilding",
+			default: "Block",
+		},
+	],
+};
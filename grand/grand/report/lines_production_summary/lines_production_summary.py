@@ -0,0 +1,64 @@
+# Copyright (c) 2026, Connect 4 Systems and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+# level -> columns that identify a row at that level
+GROUP_BY = {
+	"Sector": ["project", "sector"],
+	"Block": ["project", "sector", "block"],
+	"Building": ["project", "sector", "block", "building"],
+}
+LINK_COLUMNS = {
+	"project": (_("Project"), "Project", 140),
+	"sector": (_("Sector"), "Sector", 120),
+	"block": (_("Block"), "Block", 140),
+	"building": (_("Building"), "Building", 160),
+	"item": (_("Item"), "Item", 160),
+}
+
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	group_fields = [*GROUP_BY.get(filters.group_by or "Block"), "item", "type"]
+	return get_columns(group_fields), get_data(filters, group_fields)
+
+
+def get_columns(group_fields):
+	columns = []
+	for fieldname in group_fields:
+		if fieldname == "type":
+			columns.append({"label": _("Type"), "fieldname": "type", "fieldtype": "Data", "width": 90})
+			continue
+		label, options, width = LINK_COLUMNS[fieldname]
+		columns.append(
+			{"label": label, "fieldname": fieldname, "fieldtype": "Link", "options": options, "width": width}
+		)
+	columns.append({"label": _("Qty"), "fieldname": "qty", "fieldtype": "Float", "width": 120})
+	return columns
+
+
+def get_data(filters, group_fields):
+	conditions = []
+	for fieldname in ("project", "sector", "block", "building", "item", "type"):
+		if filters.get(fieldname):
+			conditions.append(f"`{fieldname}` = %({fieldname})s")
+	if filters.from_date:
+		conditions.append("`date` >= %(from_date)s")
+	if filters.to_date:
+		conditions.append("`date` <= %(to_date)s")
+
+	group_by = ", ".join(f"`{f}`" for f in group_fields)
+	return frappe.db.sql(
+		f"""
+		select {group_by}, sum(qty) as qty
+		from `tabLines Production`
+		where {" and ".join(conditions) or "1=1"}
+		group by {group_by}
+		having sum(qty) != 0
+		order by {group_by}
+		""",
+		filters,
+		as_dict=True,
+	)
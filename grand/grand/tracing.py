@@ -0,0 +1,102 @@
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import frappe
+
+# process-local ring buffers of finished traces per site, sized by site config `grand_trace_buffer`
+_recent_traces = {}
+
+
+def start_trace(operation, **context):
+	"""Return a stage timer for `operation`.
+
+	Tracing is enabled with site config `grand_trace` set to a log level name
+	("INFO" logs timings, "DEBUG" also logs payloads); any other truthy value means
+	INFO. When it is unset a shared no-op trace is returned.
+	"""
+	level = frappe.conf.get("grand_trace")
+	if not level:
+		return NULL_TRACE
+
+	level = logging.getLevelName(str(level).upper())
+	if not isinstance(level, int):
+		level = logging.INFO
+	return Trace(operation, level, context)
+
+
+class Trace:
+	def __init__(self, operation, level, context):
+		self.operation = operation
+		self.level = level
+		self.context = context
+		self.stages = {}
+		self.started = time.perf_counter()
+
+	@contextmanager
+	def stage(self, name):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.stages[name] = round((time.perf_counter() - start) * 1000, 3)
+
+	def debug(self, **data):
+		"""Attach `data` to the trace record, only when tracing at DEBUG level."""
+		if self.level <= logging.DEBUG:
+			self.context.update(data)
+
+	def finish(self, status="ok", **data):
+		record = {
+			"operation": self.operation,
+			"status": status,
+			"total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+			"stages_ms": self.stages,
+			**self.context,
+			**data,
+		}
+		get_logger().log(self.level, record)
+		buffer = _get_buffer()
+		if buffer is not None:
+			buffer.append(record)
+		return record
+
+
+class _NullTrace:
+	_stage = nullcontext()
+
+	def stage(self, name):
+		return self._stage
+
+	def debug(self, **data):
+		pass
+
+	def finish(self, status="ok", **data):
+		pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def get_logger():
+	return frappe.logger("grand", allow_site=True)
+
+
+def _get_buffer():
+	size = frappe.conf.get("grand_trace_buffer")
+	if not size:
+		return None
+	buffer = _recent_traces.get(frappe.local.site)
+	if buffer is None or buffer.maxlen != int(size):
+		buffer = _recent_traces[frappe.local.site] = deque(buffer or (), maxlen=int(size))
+	return buffer
+
+
+@frappe.whitelist()
+def get_recent_traces(operation=None):
+	"""Traces of this site kept in this worker's ring buffer, newest last."""
+	frappe.only_for("System Manager")
+	return [
+		t for t in _recent_traces.get(frappe.local.site) or () if not operation or t["operation"] == operation
+	]
@@ -22,22 +22,47 @@ app_license = "mit"
 # ]
 
 doc_events = {
-    "Delivery Note": {
-        "on_submit": "grand.grand.delivery_note_events.create_stock_entry_from_delivery_sheet"
-    }
+	"Delivery Note": {
+		"validate": "grand.grand.delivery_note_events.validate_block_building",
+		"on_submit": "grand.grand.delivery_note_events.create_stock_entry_from_delivery_sheet",
+		"on_cancel": "grand.grand.delivery_note_events.cancel_stock_entry_from_delivery_sheet",
+	},
+	"Stock Entry": {
+		# unlink Lines sheets so the entry (and then the sheets) can be cancelled
+		"on_cancel": "grand.grand.lines_stock.clear_lines_stock_entry"
+	},
+	"Item": {
+		# UOM conversion factors are cached per worker process
+		"on_update": "grand.grand.item_utils.clear_uom_conversion_cache",
+		"on_trash": "grand.grand.item_utils.clear_uom_conversion_cache",
+	},
 }
 
 # Create Journal Entry from sales invoice deductions on submit
-doc_events.update({
-    "Sales Invoice": {
-        # removed automatic JE creation on submit; JE will be created via button after submit
-    }
-})
-
-
-
-
-
+doc_events.update(
+	{
+		"Sales Invoice": {
+			# removed automatic JE creation on submit; JE will be created via button after submit
+			"validate": [
+				"grand.grand.doctype.selling_deductions_template.selling_deductions_template.apply_deductions_template",
+				"grand.grand.deductions.set_deduction_values",
+			]
+		}
+	}
+)
+
+scheduler_events = {
+	"daily": [
+		# no-op unless site config `grand_lines_stock_entries` is set
+		"grand.grand.lines_stock.process_pending_lines_daily",
+		# logs (and optionally posts) deductions missing a submitted Journal Entry
+		"grand.grand.deduction_reconciliation.reconcile_deduction_jes_daily",
+	],
+	"monthly": [
+		# no-op unless site config `grand_deduction_je_mode` is "consolidated"
+		"grand.sales_invoice_events.post_previous_month_deduction_jes"
+	],
+}
 
 
 # include js, css files in header of desk.html
@@ -62,7 +87,8 @@ doc_events.update({
 # doctype_js = {"doctype" : "public/js/doctype.js"}
 # include a client script for Sales Invoice
 doctype_js = {
-    "Sales Invoice": "public/js/sales_invoice.js"
+	"Sales Invoice": "public/js/sales_invoice.js",
+	"Delivery Note": "public/js/doctype/delivery_note.js",
 }
 # doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
@@ -105,6 +131,10 @@ doctype_js = {
 # before_install = "grand.install.before_install"
 # after_install = "grand.install.after_install"
 
+# the lookup indexes are first added by a patch; re-checked on every migrate so
+# they follow columns that appear later (custom fields, apps installed afterwards)
+after_migrate = ["grand.grand.db_indexes.ensure_indexes"]
+
 # Uninstallation
 # ------------
 
@@ -261,4 +291,3 @@ doctype_js = {
 # default_log_clearing_doctypes = {
 # 	"Logging DocType Name": 30  # days to retain logs
 # }
-
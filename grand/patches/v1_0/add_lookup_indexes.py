@@ -0,0 +1,5 @@
+from grand.grand.db_indexes import ensure_indexes
+
+
+def execute():
+	ensure_indexes()
@@ -0,0 +1,5 @@
+from grand.grand.delivery_note_events import backfill_stock_entry_links
+
+
+def execute():
+	backfill_stock_entry_links()
@@ -0,0 +1,5 @@
+from grand.grand.doctype.clearence_ledger.clearence_ledger import rebuild_clearence_ledger
+
+
+def execute():
+	rebuild_clearence_ledger()
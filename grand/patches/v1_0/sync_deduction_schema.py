@@ -0,0 +1,5 @@
+from grand.scripts.setup_deductions import sync_deduction_schema
+
+
+def execute():
+	sync_deduction_schema()
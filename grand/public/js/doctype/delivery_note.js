@@ -16,6 +16,9 @@ const CHILD_FIELDS = {
 // If Sector’s link to Warehouse is misspelled (e.g. 'warhouse'), change here:
 const SECTOR_WAREHOUSE_FIELDNAME = "warehouse"; // or "warhouse"
 
+// Whole Sector → Block → Building subtree in one cached server call
+const SECTOR_TREE_METHOD = "grand.grand.hierarchy.get_sector_tree";
+
 
 // ===== Helpers =====
 function set_parent_sector_query(frm) {
@@ -26,9 +29,20 @@ function set_parent_sector_query(frm) {
   }));
 }
 
+// The Type, Block and Building fields are site customizations, not shipped with
+// the app: leave the items alone when they are missing
+function has_item_child_fields(frm) {
+  return Boolean(
+    frm.fields_dict[PARENT_FIELDS.type] &&
+      frappe.meta.has_field("Delivery Note Item", CHILD_FIELDS.block) &&
+      frappe.meta.has_field("Delivery Note Item", CHILD_FIELDS.building)
+  );
+}
+
 // Hide/show BOTH the grid columns and the row dialog fields
 // Also toggle "reqd" so save won't fail when hidden
 function toggle_item_child_fields(frm) {
+  if (!has_item_child_fields(frm)) return;
   const show = frm.doc[PARENT_FIELDS.type] === "Lines";
   const grid = frm.get_field(CHILD_FIELDS.table).grid;
   const FIELDS = [CHILD_FIELDS.block, CHILD_FIELDS.building];
@@ -64,38 +78,65 @@ function toggle_item_child_fields(frm) {
   }
 }
 
-function set_child_queries(frm) {
+// Load (once per sector) the blocks and buildings of the selected Sector
+function load_sector_tree(frm) {
+  const sector = frm.doc[PARENT_FIELDS.sector];
+  if (!sector || !has_item_child_fields(frm)) {
+    frm.__sector_tree = null;
+    return Promise.resolve(null);
+  }
+  if (frm.__sector_tree && frm.__sector_tree.sector === sector) {
+    return Promise.resolve(frm.__sector_tree);
+  }
+  return frappe.xcall(SECTOR_TREE_METHOD, { sector }).then(tree => {
+    frm.__sector_tree = tree;
+    return tree;
+  });
+}
+
+function get_tree_buildings(tree, block) {
+  if (!tree) return [];
+  if (block) return tree.buildings[block] || [];
+  return [].concat(...Object.values(tree.buildings));
+}
+
+// Block and Building are picked from the cached sector tree and filtered in the
+// browser (Autocomplete), so opening or typing in them sends no search request.
+// The server still checks them against the sector on validate.
+function set_child_options(frm) {
   const grid = frm.fields_dict[CHILD_FIELDS.table]?.grid;
-  if (!grid) return;
+  if (!grid || !has_item_child_fields(frm)) return;
+
+  const tree = frm.__sector_tree;
+  grid.update_docfield_property(CHILD_FIELDS.block, "fieldtype", "Autocomplete");
+  grid.update_docfield_property(CHILD_FIELDS.block, "options", tree ? tree.blocks : []);
+  grid.update_docfield_property(CHILD_FIELDS.building, "fieldtype", "Autocomplete");
+  grid.update_docfield_property(CHILD_FIELDS.building, "options", get_tree_buildings(tree));
+  (frm.doc[CHILD_FIELDS.table] || []).forEach(row => set_row_building_options(frm, row));
+}
 
-  // Block filtered by parent Sector
-  grid.get_field(CHILD_FIELDS.block).get_query = function (doc /* parent */, cdt, cdn) {
-    if (!doc[PARENT_FIELDS.sector]) {
-      return { filters: { name: ["in", []] } };
-    }
-    return {
-      filters: {
-        sector: doc[PARENT_FIELDS.sector]
-      }
-    };
-  };
+// Narrow a row's Building choices to the buildings of its Block
+function set_row_building_options(frm, row) {
+  const grid_row = frm.fields_dict[CHILD_FIELDS.table].grid.grid_rows_by_docname[row.name];
+  if (!grid_row) return;
 
-  // Building filtered by parent Sector AND (optionally) row Block
-  grid.get_field(CHILD_FIELDS.building).get_query = function (doc /* parent */, cdt, cdn) {
-    const row = frappe.get_doc(cdt, cdn);
-    if (!doc[PARENT_FIELDS.sector]) {
-      return { filters: { name: ["in", []] } };
-    }
-    const filters = { sector: doc[PARENT_FIELDS.sector] };
-    if (row[CHILD_FIELDS.block]) {
-      filters.block = row[CHILD_FIELDS.block];
-    }
-    return { filters };
-  };
+  const buildings = get_tree_buildings(frm.__sector_tree, row[CHILD_FIELDS.block]);
+  const docfield = (grid_row.docfields || []).find(df => df.fieldname === CHILD_FIELDS.building);
+  if (docfield) docfield.options = buildings;
+
+  const control = grid_row.on_grid_fields_dict && grid_row.on_grid_fields_dict[CHILD_FIELDS.building];
+  if (control) {
+    control.df.options = buildings;
+    control.set_data ? control.set_data(buildings) : control.refresh();
+  }
+}
+
+function refresh_sector_tree(frm) {
+  return load_sector_tree(frm).then(() => set_child_options(frm));
 }
 
 function clear_child_values_on_sector_change(frm) {
-  if (!Array.isArray(frm.doc[CHILD_FIELDS.table])) return;
+  if (!has_item_child_fields(frm) || !Array.isArray(frm.doc[CHILD_FIELDS.table])) return;
   frm.doc[CHILD_FIELDS.table].forEach(r => {
     r[CHILD_FIELDS.block] = null;
     r[CHILD_FIELDS.building] = null;
@@ -114,12 +155,11 @@ frappe.ui.form.on("Delivery Note", {
 
   refresh(frm) {
     set_parent_sector_query(frm);
-    set_child_queries(frm);
     toggle_item_child_fields(frm);
+    refresh_sector_tree(frm);
   },
 
   onload_post_render(frm) {
-    set_child_queries(frm);
     toggle_item_child_fields(frm);
   },
 
@@ -135,8 +175,8 @@ frappe.ui.form.on("Delivery Note", {
 
   // Sector affects child filters; clear incompatible values
   [PARENT_FIELDS.sector](frm) {
-    set_child_queries(frm);
     clear_child_values_on_sector_change(frm);
+    refresh_sector_tree(frm);
   },
 
   // Show/hide child fields when Type changes (Main vs Lines)
@@ -154,9 +194,14 @@ frappe.ui.form.on("Delivery Note", {
 
 // ===== Child Row Events =====
 frappe.ui.form.on("Delivery Note Item", {
-  // When Block changes, clear Building to force re-pick from filtered list
+  // When Block changes, clear Building unless it still belongs to the new Block
   [CHILD_FIELDS.block](frm, cdt, cdn) {
     const row = frappe.get_doc(cdt, cdn);
+    set_row_building_options(frm, row);
+    const building = row[CHILD_FIELDS.building];
+    if (building && get_tree_buildings(frm.__sector_tree, row[CHILD_FIELDS.block]).includes(building)) {
+      return;
+    }
     row[CHILD_FIELDS.building] = null;
     frm.refresh_field(CHILD_FIELDS.table);
   }
@@ -35,11 +35,12 @@ frappe.ui.form.on("Sales Invoice", {
     },
     selling_deductions_template: function(frm){
         if(frm.doc.selling_deductions_template) {
+            // rows come from grand's cached template resolver with values already computed
             frappe.call({
-                method: "contractor.www.api.get_deductions",
+                method: "grand.grand.doctype.selling_deductions_template.selling_deductions_template.get_deductions",
                 args: {
-                    "master_doctype": frappe.meta.get_docfield(frm.doc.doctype, "selling_deductions_template").options,
-                    "master_name": frm.doc.selling_deductions_template
+                    "template": frm.doc.selling_deductions_template,
+                    "rounded_total": frm.doc.rounded_total
                 },
                 callback: function(r) {
                     if(!r.exc) {
@@ -103,22 +104,19 @@ frappe.ui.form.on("Deduction", {
 
 function compute_deduction_totals(frm){
     let total = 0.0;
-    let base_total = 0.0;
 
     (frm.doc.deductions || []).forEach(r => {
-        const v = parseFloat(r.value) || 0;
-        total += v;
-        base_total += v; // assuming same currency; adjust if needed
+        total += parseFloat(r.value) || 0;
     });
 
     (frm.doc.deduction_table || []).forEach(r => {
-        const a = parseFloat(r.amount) || 0;
-        total += a;
-        base_total += a;
+        total += parseFloat(r.amount) || 0;
     });
 
+    // same conversion as the server-side recomputation (grand.grand.deductions.set_deduction_values)
+    const conversion_rate = parseFloat(frm.doc.conversion_rate) || 1;
+    let base_total = Math.round(total * conversion_rate * 100) / 100;
     total = Math.round(total * 100) / 100;
-    base_total = Math.round(base_total * 100) / 100;
     // Only set fields if they exist on the Sales Invoice doctype.
     const has_total = frappe.meta.get_docfield(frm.doc.doctype, 'total_deductions');
     const has_base_total = frappe.meta.get_docfield(frm.doc.doctype, 'base_total_deductions');
@@ -1,321 +1,451 @@
 import frappe
-from frappe.utils import flt
-import frappe
-from frappe import _
-from frappe.model.document import Document
-from frappe.utils.data import nowdate
-from frappe import _
-from frappe import throw
-from frappe import get_doc
-from frappe import get_cached_doc
-from frappe import enqueue
-from frappe import log_error
-from frappe import get_site_path
-from frappe import local
-from frappe import scrub
-from frappe import permissions
-from frappe import msgprint
-from frappe import cint
+from frappe.utils import add_months, cint, flt, get_first_day, get_last_day, nowdate
+
+from grand.grand.deductions import (
+	collect_deductions,
+	format_missing_accounts,
+	get_deduction_je_accounts,
+	set_receivable_party,
+)
+from grand.grand.metrics import instrument
+from grand.grand.tracing import NULL_TRACE, start_trace
 
 
+@instrument
 def create_journal_entry_from_deductions(doc, method=None):
-    """Create a Journal Entry on Sales Invoice submit from deduction child tables.
-
-    - Reads `deductions` (percent/value) and `deduction_table` (amount) child tables.
-    - For each row creates a debit to the deduction `account` and a credit to
-      the Sales Invoice `debit_to` (receivable) account, preserving cost_center.
-    """
-    if not (getattr(doc, "deductions", None) or getattr(doc, "deduction_table", None)):
-        return
-
-    company = doc.company
-    posting_date = getattr(doc, "posting_date", None) or frappe.utils.nowdate()
-    receivable_account = getattr(doc, "debit_to", None)
-    if not receivable_account:
-        frappe.log_error(message=f"Sales Invoice {doc.name} has no receivable account (debit_to). JE not created.", title=f"Sales Invoice {doc.name}")
-        return
-
-    # If receivable/payable account is the Arabic receivables account, require party info
-    if receivable_account and ("مدينون - G" in receivable_account or "مدينون" in receivable_account):
-        # Auto-fill party fields from standard Sales Invoice `customer` when possible
-        if not getattr(doc, "party_type", None) and getattr(doc, "customer", None):
-            setattr(doc, "party_type", "Customer")
-        if not getattr(doc, "party", None) and getattr(doc, "customer", None):
-            setattr(doc, "party", getattr(doc, "customer"))
-
-        if not getattr(doc, "party_type", None) or not getattr(doc, "party", None):
-            frappe.throw("Party Type and Party are required when Receivable/Payable account is 'مدينون - G'")
-
-    # Build deduction credit lines and a single customer receivable debit for the total
-    accounts = []
-    total_deductions = 0.0
-
-    # process percent-based deductions (child table `Deduction`)
-    for row in getattr(doc, "deductions", []) or []:
-        try:
-            # support both Document-style rows and dict-like rows
-            value = flt(row.get("value") if hasattr(row, "get") else getattr(row, "value", None), 2) if (hasattr(row, "get") and row.get("value") is not None) or getattr(row, "value", None) else flt((flt(row.get("percent") if hasattr(row, "get") else getattr(row, "percent", 0), 2) * flt(doc.rounded_total, 2) / 100.0), 2)
-        except Exception:
-            value = 0.0
-        if not value:
-            continue
-        total_deductions = flt(total_deductions + value, 2)
-        accounts.append({
-            "account": (row.get("account") if hasattr(row, "get") else getattr(row, "account", None)),
-            "debit": value,
-            "credit": 0.0,
-            "cost_center": (row.get("cost_center") if hasattr(row, "get") else getattr(row, "cost_center", None)) or getattr(doc, "cost_center", None),
-            "project": (row.get("project") if hasattr(row, "get") else getattr(row, "project", None)) or getattr(doc, "project", None)
-        })
-
-    # process free-form deduction table (child table `Deduction Table`)
-    for row in getattr(doc, "deduction_table", []) or []:
-        try:
-            amt = flt(row.get("amount") if hasattr(row, "get") else getattr(row, "amount", 0), 2)
-        except Exception:
-            try:
-                amt = flt(float(row.get("amount") if hasattr(row, "get") else getattr(row, "amount", 0)))
-            except Exception:
-                amt = 0.0
-        if not amt:
-            continue
-        total_deductions = flt(total_deductions + amt, 2)
-        accounts.append({
-            "account": (row.get("account") if hasattr(row, "get") else getattr(row, "account", None)),
-            "debit": amt,
-            "credit": 0.0,
-            "cost_center": (row.get("cost_center") if hasattr(row, "get") else getattr(row, "cost_center", None)) or getattr(doc, "cost_center", None),
-            "project": (row.get("project") if hasattr(row, "get") else getattr(row, "project", None)) or getattr(doc, "project", None)
-        })
-
-    # No deductions => nothing to do
-    if not accounts:
-        return
-
-    # Add a single receivable (customer) credit for the total of deductions and place it first
-    receivable_row = {
-        "account": receivable_account,
-        "debit": 0.0,
-        "credit": total_deductions,
-        "cost_center": getattr(doc, "cost_center", None),
-        "project": getattr(doc, "project", None),
-        "party_type": getattr(doc, "party_type", None),
-        "party": getattr(doc, "party", None),
-        "reference_type": "Sales Invoice",
-        "reference_name": getattr(doc, "name", None)
-    }
-    accounts.insert(0, receivable_row)
-
-    # Normalize amounts to floats and remove any accidental zero/zero lines
-    cleaned_accounts = []
-    for a in accounts:
-        a["debit"] = flt(a.get("debit", 0.0), 2)
-        a["credit"] = flt(a.get("credit", 0.0), 2)
-        if not (a["debit"] == 0.0 and a["credit"] == 0.0):
-            cleaned_accounts.append(a)
-
-    if not cleaned_accounts:
-        # nothing to post
-        return
-
-    # Validate each row has an account and non-zero amounts (not both zero)
-    for idx, a in enumerate(cleaned_accounts, start=1):
-        if not a.get("account"):
-            frappe.throw(f"JE row {idx} is missing an Account: {a}")
-        if a.get("debit", 0.0) == 0.0 and a.get("credit", 0.0) == 0.0:
-            frappe.throw(f"Row {idx}: Both Debit and Credit values cannot be zero (row data: {a})")
-
-    # Validate totals
-    total_debit = flt(sum([a.get("debit", 0.0) for a in cleaned_accounts]), 2)
-    total_credit = flt(sum([a.get("credit", 0.0) for a in cleaned_accounts]), 2)
-    if total_debit == 0.0 or total_credit == 0.0:
-        frappe.throw(f"Both total Debit and Credit must be non-zero for deductions Journal Entry (debit={total_debit}, credit={total_credit})")
-    if abs(total_debit - total_credit) > 0.01:
-        frappe.throw(f"Total Debit ({total_debit}) and Credit ({total_credit}) do not balance for deductions Journal Entry")
-
-    # Log prepared accounts for debugging before creating JE
-    try:
-        frappe.log_error(message=f"Prepared JE accounts for {doc.name}: {cleaned_accounts}", title=f"Prepared JE {doc.name}")
-    except Exception:
-        pass
-
-    je = frappe.get_doc({
-        "doctype": "Journal Entry",
-        "voucher_type": "Journal Entry",
-        "company": company,
-        "posting_date": posting_date,
-        "user_remark": f"Deductions for Sales Invoice {doc.name}",
-        "accounts": cleaned_accounts
-    })
-
-    je.insert()
-    try:
-        je.submit()
-    except Exception:
-        # if submit fails due to permissions, leave as Draft and log
-        frappe.log_error(message=f"Failed to submit JE {je.name} for Sales Invoice {doc.name}. Accounts: {cleaned_accounts}")
+	"""Create a Journal Entry on Sales Invoice submit from deduction child tables.
+
+	- Reads `deductions` (percent/value) and `deduction_table` (amount) child tables.
+	- For each row creates a debit to the deduction `account` and a credit to
+	  the Sales Invoice `debit_to` (receivable) account, preserving cost_center.
+	"""
+	if not (getattr(doc, "deductions", None) or getattr(doc, "deduction_table", None)):
+		return
+
+	# consolidated mode: deductions stay pending and are posted per customer/period
+	if is_consolidated_deduction_mode():
+		return
+
+	receivable_account = getattr(doc, "debit_to", None)
+	if not receivable_account:
+		frappe.log_error(
+			message=f"Sales Invoice {doc.name} has no receivable account (debit_to). JE not created.",
+			title=f"Sales Invoice {doc.name}",
+		)
+		return
+
+	trace = start_trace("deduction_je", sales_invoice=doc.name)
+	with trace.stage("validate"):
+		set_receivable_party(doc, receivable_account)
+
+	# single pass over both deduction tables: debit lines plus their total
+	with trace.stage("parse"):
+		deductions = collect_deductions(doc)
+	if deductions.missing_account:
+		frappe.throw(
+			f"Deduction rows are missing an Account: {format_missing_accounts(deductions.missing_account)}"
+		)
+
+	# No deductions => nothing to do
+	if not deductions.lines:
+		return
+
+	if not deductions.total:
+		frappe.throw("Total deduction amount is zero. Cannot create Journal Entry.")
+
+	accounts = get_deduction_je_accounts(doc, receivable_account, deductions)
+	trace.debug(accounts=accounts)
+
+	je = make_deduction_journal_entry(doc, accounts)
+	with trace.stage("insert"):
+		je.insert()
+	status = "submitted"
+	with trace.stage("submit"):
+		try:
+			je.submit()
+		except Exception:
+			# if submit fails due to permissions, leave as Draft and log
+			status = "draft"
+			frappe.log_error(
+				message=f"Failed to submit JE {je.name} for Sales Invoice {doc.name}. Accounts: {accounts}"
+			)
+	trace.finish(status=status, journal_entry=je.name)
 
 
 @frappe.whitelist()
+@instrument
 def create_deduction_je(sinv_name):
-    """Create a Draft Journal Entry for Sales Invoice `sinv_name` using deduction rows.
-
-    Returns the Journal Entry name.
-    """
-    sinv = frappe.get_doc("Sales Invoice", sinv_name)
-
-    if not (getattr(sinv, "deductions", None) or getattr(sinv, "deduction_table", None)):
-        frappe.throw("No deduction rows found on Sales Invoice")
-
-    receivable_account = getattr(sinv, "debit_to", None)
-    if not receivable_account:
-        frappe.throw("Sales Invoice has no Receivable account (debit_to)")
-
-    # If receivable/payable account is the Arabic receivables account, require party info
-    if receivable_account and ("مدينون - G" in receivable_account or "مدينون" in receivable_account):
-        # Auto-fill party fields from standard Sales Invoice `customer` when possible
-        if not getattr(sinv, "party_type", None) and getattr(sinv, "customer", None):
-            setattr(sinv, "party_type", "Customer")
-        if not getattr(sinv, "party", None) and getattr(sinv, "customer", None):
-            setattr(sinv, "party", getattr(sinv, "customer"))
-
-        if not getattr(sinv, "party_type", None) or not getattr(sinv, "party", None):
-            frappe.throw("Party Type and Party are required when Receivable/Payable account is 'مدينون - G'")
-
-    # prepare lines: deduction rows as debits, receivable as a single credit
-    accounts = []
-    total_deductions = 0.0
-
-    # Prefer explicit amounts from `deduction_table` (user-entered amounts). If none present,
-    # fall back to percent/value rows in `deductions`.
-    dt_rows = getattr(sinv, "deduction_table", []) or []
-    if dt_rows:
-        for row in dt_rows:
-            amt = flt(row.amount, 2) if getattr(row, "amount", None) else 0.0
-            if not amt:
-                continue
-            total_deductions = flt(total_deductions + amt, 2)
-            accounts.append({
-                "account": row.account,
-                "debit": amt,
-                "credit": 0.0,
-                "cost_center": getattr(row, "cost_center", None) or getattr(sinv, "cost_center", None),
-                "project": getattr(row, "project", None) or getattr(sinv, "project", None)
-            })
-    else:
-        for row in getattr(sinv, "deductions", []) or []:
-            # support both Document-style rows and dict-like rows
-            if hasattr(row, "get"):
-                value = flt(row.get("value") or 0.0, 2)
-                percent = row.get("percent") or 0
-                account = row.get("account")
-                cost_center = row.get("cost_center")
-                project = row.get("project")
-            else:
-                value = flt(getattr(row, "value", 0.0), 2)
-                percent = getattr(row, "percent", 0)
-                account = getattr(row, "account", None)
-                cost_center = getattr(row, "cost_center", None)
-                project = getattr(row, "project", None)
-
-            if not value:
-                try:
-                    value = flt((flt(percent or 0) * flt(sinv.rounded_total or 0) / 100.0), 2)
-                except Exception:
-                    value = 0.0
-            if not value:
-                continue
-            total_deductions = flt(total_deductions + value, 2)
-            accounts.append({
-                "account": account,
-                "debit": value,
-                "credit": 0.0,
-                "cost_center": cost_center or getattr(sinv, "cost_center", None),
-                "project": project or getattr(sinv, "project", None)
-            })
-
-    # Remove any deduction rows missing account or with zero amounts
-    valid_accounts = []
-    for a in accounts:
-        a_debit = flt(a.get("debit", 0.0), 2)
-        if not a.get("account"):
-            # skip rows without account
-            continue
-        if a_debit == 0.0:
-            # skip zero-amount rows
-            continue
-        a["debit"] = a_debit
-        a["credit"] = flt(a.get("credit", 0.0), 2)
-        valid_accounts.append(a)
-
-    if not valid_accounts:
-        frappe.throw("No valid deduction amounts found to create JE")
-
-    # Derive total deductions from the deduction rows to avoid parsing mismatches
-    total_deductions = flt(sum([a.get("debit", 0.0) for a in valid_accounts]), 2)
-    if not total_deductions or flt(total_deductions, 2) == 0.0:
-        frappe.throw("Total deduction amount is zero. Cannot create Journal Entry.")
-
-    # Ensure party info is present for receivable if required (and fill from customer when available)
-    if not getattr(sinv, "party_type", None) and getattr(sinv, "customer", None):
-        setattr(sinv, "party_type", "Customer")
-    if not getattr(sinv, "party", None) and getattr(sinv, "customer", None):
-        setattr(sinv, "party", getattr(sinv, "customer"))
-
-    receivable_row = {
-        "account": receivable_account,
-        "debit": 0.0,
-        "credit": flt(total_deductions, 2),
-        "cost_center": getattr(sinv, "cost_center", None),
-        "project": getattr(sinv, "project", None),
-        "party_type": getattr(sinv, "party_type", None),
-        "party": getattr(sinv, "party", None) or getattr(sinv, "customer", None),
-        "reference_type": "Sales Invoice",
-        "reference_name": sinv.name
-    }
-
-    # insert receivable first
-    accounts.insert(0, receivable_row)
-
-    # clean and validate
-    cleaned_accounts = []
-    for a in accounts:
-        a["debit"] = flt(a.get("debit", 0.0), 2)
-        a["credit"] = flt(a.get("credit", 0.0), 2)
-        if not (a["debit"] == 0.0 and a["credit"] == 0.0):
-            cleaned_accounts.append(a)
-
-    if not cleaned_accounts:
-        frappe.throw("Prepared Journal Entry has no non-zero lines")
-    # Log prepared accounts for debugging
-    try:
-        frappe.log_error(message=f"Prepared JE accounts for {sinv.name}: {cleaned_accounts}", title=f"Prepared JE {sinv.name}")
-    except Exception:
-        pass
-
-    # Validate each row has an account and non-zero amounts (include row data in error)
-    for idx, a in enumerate(cleaned_accounts, start=1):
-        if not a.get("account"):
-            frappe.throw(f"JE row {idx} is missing an Account: {a}")
-        if a.get("debit", 0.0) == 0.0 and a.get("credit", 0.0) == 0.0:
-            frappe.throw(f"Row {idx}: Both Debit and Credit values cannot be zero (row data: {a})")
-
-    total_debit = flt(sum([a.get("debit", 0.0) for a in cleaned_accounts]), 2)
-    total_credit = flt(sum([a.get("credit", 0.0) for a in cleaned_accounts]), 2)
-    if total_debit == 0.0 or total_credit == 0.0:
-        frappe.throw(f"Both total Debit and Credit must be non-zero for deductions Journal Entry (debit={total_debit}, credit={total_credit})")
-    if abs(total_debit - total_credit) > 0.01:
-        frappe.throw(f"Total Debit ({total_debit}) and Credit ({total_credit}) do not balance for deductions Journal Entry")
-
-    je = frappe.get_doc({
-        "doctype": "Journal Entry",
-        "voucher_type": "Journal Entry",
-        "company": sinv.company,
-        "posting_date": sinv.posting_date or nowdate(),
-        "user_remark": f"Deductions for Sales Invoice {sinv.name}",
-        "accounts": cleaned_accounts,
-        "docstatus": 0
-    })
-
-    je.insert()
-    return je.name
+	"""Create a Draft Journal Entry for Sales Invoice `sinv_name` using deduction rows.
+
+	Returns the Journal Entry name.
+	"""
+	sinv = frappe.get_doc("Sales Invoice", sinv_name)
+	trace = start_trace("deduction_je_draft", sales_invoice=sinv.name)
+	je = prepare_deduction_je(sinv, trace)
+	with trace.stage("insert"):
+		je.insert()
+	trace.finish(journal_entry=je.name)
+	return je.name
+
+
+def prepare_deduction_je(sinv, trace=NULL_TRACE):
+	"""Return the unsaved Draft deduction Journal Entry for `sinv`, throwing when nothing can be posted."""
+	if not (getattr(sinv, "deductions", None) or getattr(sinv, "deduction_table", None)):
+		frappe.throw("No deduction rows found on Sales Invoice")
+
+	receivable_account = getattr(sinv, "debit_to", None)
+	if not receivable_account:
+		frappe.throw("Sales Invoice has no Receivable account (debit_to)")
+
+	with trace.stage("validate"):
+		set_receivable_party(sinv, receivable_account)
+
+	# Prefer explicit amounts from `deduction_table` (user-entered amounts). If none present,
+	# fall back to percent/value rows in `deductions`. Rows without an account are skipped.
+	tables = ("deduction_table",) if sinv.get("deduction_table") else ("deductions",)
+	with trace.stage("parse"):
+		deductions = collect_deductions(sinv, tables)
+
+	if not deductions.lines:
+		frappe.throw("No valid deduction amounts found to create JE")
+	if not deductions.total:
+		frappe.throw("Total deduction amount is zero. Cannot create Journal Entry.")
+
+	accounts = get_deduction_je_accounts(sinv, receivable_account, deductions)
+	trace.debug(accounts=accounts)
+
+	return make_deduction_journal_entry(sinv, accounts)
+
+
+def make_deduction_journal_entry(sinv, accounts):
+	"""Return an unsaved Draft Journal Entry posting `accounts` for Sales Invoice `sinv`."""
+	return frappe.get_doc(
+		{
+			"doctype": "Journal Entry",
+			"voucher_type": "Journal Entry",
+			"company": sinv.company,
+			"posting_date": sinv.get("posting_date") or nowdate(),
+			"user_remark": f"Deductions for Sales Invoice {sinv.name}",
+			"accounts": accounts,
+			"docstatus": 0,
+		}
+	)
+
+
+DEDUCTION_JE_BATCH_SIZE = 100
+
+# Sales Invoice fields needed to build a deduction JE without loading the full document
+DEDUCTION_INVOICE_FIELDS = [
+	"name",
+	"company",
+	"posting_date",
+	"customer",
+	"debit_to",
+	"cost_center",
+	"project",
+	"rounded_total",
+]
+DEDUCTION_ROW_FIELDS = {
+	"deductions": ("Deduction", ["account", "percent", "value", "cost_center", "project"]),
+	"deduction_table": ("Deduction Table", ["account", "amount", "cost_center", "project"]),
+}
+
+
+@frappe.whitelist()
+def create_deduction_jes(sales_invoices=None, filters=None, submit=0):
+	"""Queue deduction Journal Entries for many submitted Sales Invoices.
+
+	`sales_invoices` is a list of names and/or `filters` a Sales Invoice filter dict.
+	Returns the background job id and the number of invoices queued.
+	"""
+	frappe.has_permission("Journal Entry", "create", throw=True)
+	invoices = get_invoices_for_deduction_jes(frappe.parse_json(sales_invoices), frappe.parse_json(filters))
+	if not invoices:
+		frappe.throw("No submitted Sales Invoices match")
+
+	job = frappe.enqueue(
+		"grand.sales_invoice_events.create_deduction_jes_job",
+		queue="long",
+		timeout=3600,
+		invoices=invoices,
+		submit=cint(submit),
+	)
+	return {"job_id": job.id if job else None, "count": len(invoices)}
+
+
+def get_invoices_for_deduction_jes(sales_invoices=None, filters=None, ignore_permissions=False):
+	filters = dict(filters or {})
+	filters["docstatus"] = 1
+	if sales_invoices:
+		filters["name"] = ("in", list(sales_invoices))
+	get_list = frappe.get_all if ignore_permissions else frappe.get_list
+	return get_list("Sales Invoice", filters=filters, pluck="name", order_by="posting_date, name")
+
+
+@instrument
+def create_deduction_jes_job(invoices, submit=0):
+	"""Build deduction JEs for `invoices` in chunked transactions.
+
+	Each chunk is loaded with one query per table and committed on its own; a
+	failing invoice is rolled back to its savepoint and reported instead of
+	stopping the batch. Returns ``{invoice: {"status", "journal_entry"|"error"}}``.
+	"""
+	report = {}
+	total = len(invoices)
+	for start in range(0, total, DEDUCTION_JE_BATCH_SIZE):
+		chunk = invoices[start : start + DEDUCTION_JE_BATCH_SIZE]
+		docs = load_invoices_for_deductions(chunk)
+		already_posted = get_invoices_with_deduction_je(chunk)
+
+		for name in chunk:
+			if name in already_posted:
+				report[name] = {"status": "Skipped", "journal_entry": already_posted[name]}
+				continue
+			if name not in docs:
+				report[name] = {"status": "Failed", "error": "Sales Invoice not found or not submitted"}
+				continue
+
+			frappe.db.savepoint("grand_deduction_je")
+			try:
+				je = prepare_deduction_je(docs[name])
+				je.insert()
+				if submit:
+					je.submit()
+				report[name] = {"status": "Created", "journal_entry": je.name}
+			except Exception as e:
+				frappe.db.rollback(save_point="grand_deduction_je")
+				frappe.clear_messages()
+				report[name] = {"status": "Failed", "error": str(e)}
+
+		frappe.db.commit()
+		done = min(start + DEDUCTION_JE_BATCH_SIZE, total)
+		frappe.publish_progress(
+			done * 100 / total, title="Deduction Journal Entries", description=f"{done} of {total}"
+		)
+
+	frappe.publish_realtime("grand_deduction_jes_done", report, user=frappe.session.user)
+	return report
+
+
+def load_invoices_for_deductions(names):
+	"""Load submitted Sales Invoices with their deduction rows: one query per table, not per invoice."""
+	invoices = {
+		inv.name: inv
+		for inv in frappe.get_all(
+			"Sales Invoice", filters={"name": ("in", names), "docstatus": 1}, fields=DEDUCTION_INVOICE_FIELDS
+		)
+	}
+	for inv in invoices.values():
+		inv.doctype = "Sales Invoice"
+
+	for table, (child_doctype, fields) in DEDUCTION_ROW_FIELDS.items():
+		for inv in invoices.values():
+			inv[table] = []
+		if not invoices or not frappe.db.exists("DocType", child_doctype):
+			continue
+		meta = frappe.get_meta(child_doctype)
+		rows = frappe.get_all(
+			child_doctype,
+			filters={"parenttype": "Sales Invoice", "parentfield": table, "parent": ("in", list(invoices))},
+			fields=["parent", "idx", *[f for f in fields if meta.has_field(f)]],
+			order_by="parent, idx",
+		)
+		for row in rows:
+			invoices[row.parent][table].append(row)
+
+	return invoices
+
+
+def get_invoices_with_deduction_je(names):
+	"""Map invoice -> existing (draft or submitted) deduction Journal Entry, for `names`.
+
+	Matches both per-invoice ("Deductions for Sales Invoice X") and consolidated
+	("Deductions for Sales Invoices of ...") entries.
+	"""
+	rows = frappe.db.sql(
+		"""
+        select jea.reference_name, je.name
+        from `tabJournal Entry Account` jea
+        inner join `tabJournal Entry` je on je.name = jea.parent
+        where jea.reference_type = 'Sales Invoice'
+            and jea.reference_name in %(names)s
+            and je.docstatus < 2
+            and je.user_remark like 'Deductions for Sales Invoice%%'
+    """,
+		{"names": names},
+	)
+	return dict(rows)
+
+
+def is_consolidated_deduction_mode():
+	return frappe.conf.get("grand_deduction_je_mode") == "consolidated"
+
+
+@frappe.whitelist()
+def create_consolidated_deduction_jes(from_date, to_date, company=None, customer=None, submit=1):
+	"""Queue consolidated deduction Journal Entries for invoices posted between the dates."""
+	frappe.has_permission("Journal Entry", "create", throw=True)
+	job = frappe.enqueue(
+		"grand.sales_invoice_events.post_consolidated_deduction_jes",
+		queue="long",
+		timeout=3600,
+		from_date=from_date,
+		to_date=to_date,
+		company=company,
+		customer=customer,
+		submit=cint(submit),
+	)
+	return {"job_id": job.id if job else None}
+
+
+@instrument
+def post_previous_month_deduction_jes():
+	"""Monthly scheduler job: consolidate last month's pending deductions."""
+	if not is_consolidated_deduction_mode():
+		return
+	last_month = add_months(nowdate(), -1)
+	post_consolidated_deduction_jes(get_first_day(last_month), get_last_day(last_month))
+
+
+def get_pending_deduction_invoices(from_date, to_date, company=None, customer=None):
+	"""Submitted Sales Invoices in the period with deduction rows and no deduction JE yet."""
+	conditions = ""
+	if company:
+		conditions += " and si.company = %(company)s"
+	if customer:
+		conditions += " and si.customer = %(customer)s"
+
+	child_tables = [dt for dt in ("Deduction", "Deduction Table") if frappe.db.exists("DocType", dt)]
+	has_rows = " or ".join(
+		f"exists (select 1 from `tab{dt}` d where d.parent = si.name and d.parenttype = 'Sales Invoice')"
+		for dt in child_tables
+	)
+	if not has_rows:
+		return []
+
+	names = frappe.db.sql_list(
+		f"""
+        select si.name
+        from `tabSales Invoice` si
+        where si.docstatus = 1
+            and si.posting_date between %(from_date)s and %(to_date)s
+            and ({has_rows})
+            {conditions}
+        order by si.posting_date, si.name
+    """,
+		{"from_date": from_date, "to_date": to_date, "company": company, "customer": customer},
+	)
+
+	posted = set()
+	for start in range(0, len(names), DEDUCTION_JE_BATCH_SIZE):
+		posted.update(get_invoices_with_deduction_je(names[start : start + DEDUCTION_JE_BATCH_SIZE]))
+	return [name for name in names if name not in posted]
+
+
+@instrument
+def post_consolidated_deduction_jes(from_date, to_date, company=None, customer=None, submit=1):
+	"""Post one deduction Journal Entry per company/customer/receivable account for the period.
+
+	Each invoice keeps its own receivable credit line (with `reference_name`) so it
+	can be allocated against the invoice; deduction debits sharing account, cost
+	center and project are summed into a single line. Returns a per-invoice report.
+	"""
+	report = {}
+	groups = {}
+	names = get_pending_deduction_invoices(from_date, to_date, company, customer)
+	for start in range(0, len(names), DEDUCTION_JE_BATCH_SIZE):
+		docs = load_invoices_for_deductions(names[start : start + DEDUCTION_JE_BATCH_SIZE])
+		for inv in docs.values():
+			deductions = collect_deductions(inv)
+			if not inv.debit_to:
+				report[inv.name] = {
+					"status": "Failed",
+					"error": "Sales Invoice has no Receivable account (debit_to)",
+				}
+			elif deductions.missing_account:
+				report[inv.name] = {
+					"status": "Failed",
+					"error": f"Deduction rows are missing an Account: {format_missing_accounts(deductions.missing_account)}",
+				}
+			elif deductions.total:
+				groups.setdefault((inv.company, inv.customer, inv.debit_to), []).append((inv, deductions))
+
+	for (company, customer, receivable_account), entries in groups.items():
+		invoice_names = [inv.name for inv, _deductions in entries]
+		frappe.db.savepoint("grand_consolidated_deduction_je")
+		try:
+			je = make_consolidated_deduction_je(
+				company, customer, receivable_account, entries, from_date, to_date
+			)
+			je.insert()
+			if cint(submit):
+				je.submit()
+			result = {"status": "Created", "journal_entry": je.name}
+		except Exception as e:
+			frappe.db.rollback(save_point="grand_consolidated_deduction_je")
+			frappe.clear_messages()
+			result = {"status": "Failed", "error": str(e)}
+		for name in invoice_names:
+			report[name] = dict(result)
+		frappe.db.commit()
+
+	return report
+
+
+def make_consolidated_deduction_je(company, customer, receivable_account, entries, from_date, to_date):
+	"""Return an unsaved Journal Entry covering `entries` ([(invoice, deductions)]) of one customer."""
+	accounts = []
+	debits = {}
+	for inv, deductions in entries:
+		accounts.append(
+			{
+				"account": receivable_account,
+				"debit": 0.0,
+				"credit": deductions.total,
+				"cost_center": inv.get("cost_center"),
+				"project": inv.get("project"),
+				"party_type": "Customer",
+				"party": customer,
+				"reference_type": "Sales Invoice",
+				"reference_name": inv.name,
+			}
+		)
+		# fast path: invoices sharing deduction accounts collapse into one debit line each
+		for line in deductions.lines:
+			key = (line["account"], line["cost_center"], line["project"])
+			debits[key] = debits.get(key, 0.0) + line["debit"]
+
+	for (account, cost_center, project), amount in debits.items():
+		accounts.append(
+			{
+				"account": account,
+				"debit": flt(amount, 2),
+				"credit": 0.0,
+				"cost_center": cost_center,
+				"project": project,
+			}
+		)
+
+	return frappe.get_doc(
+		{
+			"doctype": "Journal Entry",
+			"voucher_type": "Journal Entry",
+			"company": company,
+			"posting_date": to_date,
+			"user_remark": f"Deductions for Sales Invoices of {customer} ({from_date} to {to_date})",
+			"accounts": accounts,
+			"docstatus": 0,
+		}
+	)
+
+
+@frappe.whitelist()
+def get_consolidated_deduction_invoices(journal_entry):
+	"""Sales Invoices (and credited amount) covered by a deduction Journal Entry."""
+	frappe.has_permission("Journal Entry", "read", journal_entry, throw=True)
+	return frappe.get_all(
+		"Journal Entry Account",
+		filters={"parent": journal_entry, "parenttype": "Journal Entry", "reference_type": "Sales Invoice"},
+		fields=["reference_name as sales_invoice", "credit_in_account_currency as amount"],
+		order_by="idx",
+	)
@@ -1,75 +1,177 @@
 import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 
+# desired state; sync_deduction_schema only adds what a site is missing
+DEDUCTION_DOCTYPES = {
+	# Deduction doctype (child table)
+	"Deduction": [
+		{"fieldname": "account", "fieldtype": "Link", "label": "Account", "options": "Account", "reqd": 1},
+		{"fieldname": "percent", "fieldtype": "Percent", "label": "Percent"},
+		{"fieldname": "value", "fieldtype": "Float", "label": "Value", "read_only": 1},
+		{"fieldname": "project", "fieldtype": "Link", "label": "Project", "options": "Project"},
+	],
+	# Deduction Table doctype (alternate child table)
+	"Deduction Table": [
+		{"fieldname": "account", "fieldtype": "Link", "label": "Account", "options": "Account", "reqd": 1},
+		{"fieldname": "description", "fieldtype": "Data", "label": "Description"},
+		{"fieldname": "cost_center", "fieldtype": "Link", "label": "Cost Center", "options": "Cost Center"},
+		{"fieldname": "amount", "fieldtype": "Float", "label": "Amount", "reqd": 1},
+		{"fieldname": "project", "fieldtype": "Link", "label": "Project", "options": "Project"},
+	],
+}
 
-def create_doctype_if_missing(name, module, fields, istable=0):
-    if frappe.db.exists("DocType", name):
-        return
+DEDUCTION_CUSTOM_FIELDS = {
+	"Sales Invoice": [
+		{
+			"fieldname": "deductions",
+			"label": "Deductions",
+			"fieldtype": "Table",
+			"options": "Deduction",
+			"insert_after": "items",
+		},
+		{
+			"fieldname": "deduction_table",
+			"label": "Deduction Table",
+			"fieldtype": "Table",
+			"options": "Deduction Table",
+			"insert_after": "deductions",
+		},
+		# Additional fields to support contractor deductions and templates
+		{
+			"fieldname": "selling_deductions_template",
+			"label": "Selling Deductions Template",
+			"fieldtype": "Link",
+			"options": "Selling Deductions Template",
+			"insert_after": "deduction_table",
+		},
+		{
+			"fieldname": "contractor_order",
+			"label": "A Contractor Order?",
+			"fieldtype": "Check",
+			"insert_after": "selling_deductions_template",
+		},
+		{
+			"fieldname": "sect_totals",
+			"label": "",
+			"fieldtype": "Section Break",
+			"insert_after": "contractor_order",
+		},
+		{
+			"fieldname": "base_total_deductions",
+			"label": "Base Total Deductions",
+			"fieldtype": "Currency",
+			"options": "Company:company:default_currency",
+			"insert_after": "sect_totals",
+		},
+		{
+			"fieldname": "total_deductions",
+			"label": "Total Deductions",
+			"fieldtype": "Currency",
+			"options": "currency",
+			"insert_after": "base_total_deductions",
+		},
+		# Link to Clearence doc (see grand.grand.doctype.clearence.clearence.make_sales_invoice)
+		{
+			"fieldname": "clearence",
+			"label": "Clearence",
+			"fieldtype": "Link",
+			"options": "Clearence",
+			"insert_after": "total_deductions",
+		},
+	],
+}
 
-    doctype = frappe.get_doc({
-        "doctype": "DocType",
-        "name": name,
-        "module": module,
-        "custom": 1,
-        "istable": istable,
-        "fields": fields,
-    })
-    doctype.insert()
 
+def get_existing_fieldnames(doctype):
+	"""Fieldnames of `doctype`, standard and custom, in one query."""
+	return set(
+		frappe.db.sql_list(
+			"""
+        select fieldname from `tabDocField` where parent = %(doctype)s and parenttype = 'DocType'
+        union
+        select fieldname from `tabCustom Field` where dt = %(doctype)s
+        """,
+			{"doctype": doctype},
+		)
+	)
 
-def create_custom_field_if_missing(dt, fieldname, label, fieldtype, options=None, insert_after=None):
-    cf_name = f"{dt}-{fieldname}"
-    if frappe.db.exists("Custom Field", {"dt": dt, "fieldname": fieldname}):
-        return
 
-    data = {
-        "doctype": "Custom Field",
-        "dt": dt,
-        "fieldname": fieldname,
-        "label": label,
-        "fieldtype": fieldtype,
-        "insert_after": insert_after or "items",
-    }
-    if options:
-        data["options"] = options
+def get_schema_changes():
+	"""Doctypes, doctype fields and custom fields the site is missing.
 
-    frappe.get_doc(data).insert()
+	Returns ``frappe._dict(doctypes, doctype_fields, custom_fields)``: doctype names
+	to create, ``{doctype: [fields]}`` to append to existing custom doctypes, and
+	``{doctype: [fields]}`` to pass to `create_custom_fields`.
+	"""
+	existing = {
+		d.name: d.custom
+		for d in frappe.get_all(
+			"DocType", filters={"name": ("in", list(DEDUCTION_DOCTYPES))}, fields=["name", "custom"]
+		)
+	}
+	changes = frappe._dict(doctypes=[], doctype_fields={}, custom_fields={})
+	for doctype, fields in DEDUCTION_DOCTYPES.items():
+		if doctype not in existing:
+			changes.doctypes.append(doctype)
+		elif existing[doctype]:
+			# standard doctypes are synced from the app's JSON on migrate
+			have = get_existing_fieldnames(doctype)
+			missing = [df for df in fields if df["fieldname"] not in have]
+			if missing:
+				changes.doctype_fields[doctype] = missing
+
+	for doctype, fields in DEDUCTION_CUSTOM_FIELDS.items():
+		have = get_existing_fieldnames(doctype)
+		missing = [df for df in fields if df["fieldname"] not in have]
+		if missing:
+			changes.custom_fields[doctype] = missing
+	return changes
+
+
+def sync_deduction_schema(dry_run=False):
+	"""Create the missing deduction doctypes and Sales Invoice custom fields.
+
+	Idempotent: existing pieces are left untouched, and nothing is written when the
+	site is up to date. Custom fields go through `create_custom_fields`, which
+	rebuilds each doctype's meta and table once for all its new fields.
+	Returns the changes (applied unless `dry_run`).
+	"""
+	changes = get_schema_changes()
+	if dry_run or not (changes.doctypes or changes.doctype_fields or changes.custom_fields):
+		return changes
+
+	for doctype in changes.doctypes:
+		frappe.get_doc(
+			{
+				"doctype": "DocType",
+				"name": doctype,
+				"module": "Grand",
+				"custom": 1,
+				"istable": 1,
+				"editable_grid": 1,
+				"fields": DEDUCTION_DOCTYPES[doctype],
+			}
+		).insert()
+
+	for doctype, fields in changes.doctype_fields.items():
+		doc = frappe.get_doc("DocType", doctype)
+		for df in fields:
+			doc.append("fields", df)
+		doc.save()
+
+	if changes.custom_fields:
+		create_custom_fields(changes.custom_fields, update=False)
+
+	frappe.db.commit()
+	return changes
 
 
 def create_all():
-    """Create Deduction doctypes and Sales Invoice custom fields if missing.
-
-    Run with:
-      bench --site <site> execute grand.grand.scripts.setup_deductions.create_all
-    """
-    # Deduction doctype (child table)
-    deduction_fields = [
-        {"fieldname": "account", "fieldtype": "Link", "label": "Account", "options": "Account", "reqd": 1},
-        {"fieldname": "percent", "fieldtype": "Percent", "label": "Percent"},
-        {"fieldname": "value", "fieldtype": "Float", "label": "Value", "read_only": 1},
-        {"fieldname": "project", "fieldtype": "Link", "label": "Project", "options": "Project"},
-    ]
-    create_doctype_if_missing("Deduction", "Grand", deduction_fields, istable=1)
-
-    # Deduction Table doctype (alternate child table)
-    dt_fields = [
-        {"fieldname": "account", "fieldtype": "Link", "label": "Account", "options": "Account", "reqd": 1},
-        {"fieldname": "description", "fieldtype": "Data", "label": "Description"},
-        {"fieldname": "cost_center", "fieldtype": "Link", "label": "Cost Center", "options": "Cost Center"},
-        {"fieldname": "amount", "fieldtype": "Float", "label": "Amount", "reqd": 1},
-        {"fieldname": "project", "fieldtype": "Link", "label": "Project", "options": "Project"},
-    ]
-    create_doctype_if_missing("Deduction Table", "Grand", dt_fields, istable=1)
-
-    # Custom fields on Sales Invoice
-    create_custom_field_if_missing("Sales Invoice", "deductions", "Deductions", "Table", options="Deduction", insert_after="items")
-    create_custom_field_if_missing("Sales Invoice", "deduction_table", "Deduction Table", "Table", options="Deduction Table", insert_after="deductions")
-    # Additional fields to support contractor deductions and templates
-    create_custom_field_if_missing("Sales Invoice", "selling_deductions_template", "Selling Deductions Template", "Link", options="Selling Deductions Template", insert_after="deduction_table")
-    create_custom_field_if_missing("Sales Invoice", "contractor_order", "A Contractor Order?", "Check", insert_after="selling_deductions_template")
-    create_custom_field_if_missing("Sales Invoice", "sect_totals", "", "Section Break", insert_after="contractor_order")
-    create_custom_field_if_missing("Sales Invoice", "base_total_deductions", "Base Total Deductions", "Currency", insert_after="sect_totals")
-    create_custom_field_if_missing("Sales Invoice", "total_deductions", "Total Deductions", "Currency", insert_after="base_total_deductions")
-    # Link to Clearence doc (used by contractor app mapping)
-    create_custom_field_if_missing("Sales Invoice", "clearence", "Clearence", "Link", options="Clearence", insert_after="total_deductions")
-
-    frappe.db.commit()
+	"""Create Deduction doctypes and Sales Invoice custom fields if missing.
+
+	Run with:
+	  bench --site <site> execute grand.scripts.setup_deductions.create_all
+	or for several sites at once:
+	  bench --site all grand-sync-deduction-schema
+	"""
+	return sync_deduction_schema()
@@ -0,0 +1,159 @@
+"""Benchmark helpers: a stubbed frappe data layer that counts queries and writes,
+and baselines of those counts stored in ``benchmark_baselines.json`` next to this
+file. Wall times are measured for the report only; they depend on the machine.
+
+Regenerate the baselines after an intended change with
+``GRAND_UPDATE_BENCHMARKS=1 bench --site <site> run-tests --app grand --module grand.tests.test_benchmarks``.
+"""
+
+import json
+import os
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+import frappe
+
+from grand.grand import item_utils
+from grand.tests.utils import FakeDoc
+
+BASELINE_FILE = Path(__file__).with_name("benchmark_baselines.json")
+# counts compared against the baselines; the same on every machine
+COUNTERS = ("queries", "writes")
+REPEAT = 3
+
+
+class StubDoc(FakeDoc):
+	"""Document stand-in whose writes are counted by the active `StubFrappe`."""
+
+	def __init__(self, stub, **fields):
+		super().__init__(**fields)
+		self._stub = stub
+		self.name = self.get("name") or f"_Test {self.get('doctype') or 'Doc'} {stub.next_id()}"
+
+	def append(self, table, row):
+		rows = self.__dict__.setdefault(table, [])
+		row = frappe._dict(row, idx=len(rows) + 1)
+		rows.append(row)
+		return row
+
+	def insert(self, *args, **kwargs):
+		self._stub.writes += 1
+		return self
+
+	def submit(self):
+		self._stub.writes += 1
+		return self
+
+	def db_set(self, *args, **kwargs):
+		self._stub.writes += 1
+
+	def add_comment(self, *args, **kwargs):
+		self._stub.writes += 1
+
+
+class StubFrappe:
+	"""Patch frappe's database and document API; every read is one query, every write one write.
+
+	`tables` maps a doctype to a callable ``(filters) -> rows`` answering
+	`frappe.get_all`; `docs` maps ``(doctype, name)`` to what `frappe.get_doc` returns.
+	"""
+
+	def __init__(self, tables=None, docs=None, conf=None):
+		self.tables = tables or {}
+		self.docs = docs or {}
+		self.conf = conf or {}
+		self.queries = 0
+		self.writes = 0
+		self._ids = 0
+
+	def next_id(self):
+		self._ids += 1
+		return self._ids
+
+	def _read(self, result):
+		self.queries += 1
+		return result
+
+	def get_all(self, doctype, filters=None, fields=None, **kwargs):
+		return self._read(self.tables.get(doctype, lambda filters: [])(filters))
+
+	def get_doc(self, doctype, name=None, *args, **kwargs):
+		if isinstance(doctype, dict):
+			return StubDoc(self, **doctype)
+		return self._read(self.docs[(doctype, name)])
+
+	def new_doc(self, doctype, *args, **kwargs):
+		return StubDoc(self, doctype=doctype)
+
+	def __enter__(self):
+		self._stack = ExitStack()
+		# every run starts like a fresh worker
+		frappe.local.grand_stock_uom_cache = None
+		item_utils._uom_conversion_cache.clear()
+		for target, replacement in (
+			("frappe.get_all", self.get_all),
+			("frappe.get_list", self.get_all),
+			("frappe.get_doc", self.get_doc),
+			("frappe.new_doc", self.new_doc),
+			("frappe.db.sql", lambda *args, **kwargs: self._read([])),
+			("frappe.db.get_value", lambda *args, **kwargs: self._read(None)),
+			("frappe.db.exists", lambda *args, **kwargs: self._read(True)),
+			("frappe.msgprint", lambda *args, **kwargs: None),
+			("frappe.log_error", lambda *args, **kwargs: None),
+		):
+			self._stack.enter_context(patch(target, replacement, create=True))
+		self._stack.enter_context(
+			patch.dict(
+				frappe.conf,
+				{
+					"grand_trace": None,
+					"grand_metrics": None,
+					"grand_async_stock_entry": 0,
+					"grand_deduction_je_mode": None,
+					**self.conf,
+				},
+			)
+		)
+		return self
+
+	def __exit__(self, *exc):
+		self._stack.close()
+		frappe.local.grand_stock_uom_cache = None
+
+
+def measure(run, make_stub):
+	"""Best wall time in ms of `REPEAT` runs of `run(stub)`, with the queries and writes of one run."""
+	best = None
+	for _ in range(REPEAT):
+		with make_stub() as stub:
+			start = time.perf_counter()
+			run(stub)
+			elapsed = (time.perf_counter() - start) * 1000
+		best = elapsed if best is None else min(best, elapsed)
+	return {"queries": stub.queries, "writes": stub.writes, "wall_ms": round(best, 3)}
+
+
+def load_baselines():
+	if not BASELINE_FILE.exists():
+		return {}
+	return json.loads(BASELINE_FILE.read_text())
+
+
+def save_baselines(results):
+	baselines = {key: {counter: result[counter] for counter in COUNTERS} for key, result in results.items()}
+	BASELINE_FILE.write_text(json.dumps(baselines, indent=1, sort_keys=True) + "\n")
+
+
+def should_update_baselines():
+	return bool(os.environ.get("GRAND_UPDATE_BENCHMARKS"))
+
+
+def get_regressions(result, baseline):
+	"""Reasons `result` is worse than `baseline`: query and write counts must not grow at all."""
+	return [
+		f"{counter} {baseline[counter]} -> {result[counter]}"
+		for counter in COUNTERS
+		if result[counter] > baseline[counter]
+	]
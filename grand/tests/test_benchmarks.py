@@ -0,0 +1,183 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+"""Hot-path benchmarks of grand's document hooks against a stubbed frappe layer.
+
+Each scenario runs with synthetic documents of several sizes and is compared to
+the stored baseline: query and write counts must not grow. Wall times are only
+printed, as they vary between machines (see `grand.tests.benchmark`).
+"""
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand.delivery_note_events import create_stock_entry_from_delivery_sheet
+from grand.grand.doctype.lines_production.lines_production import update_lines_production
+from grand.grand.lines_stock import group_lines
+from grand.sales_invoice_events import create_deduction_je, create_journal_entry_from_deductions
+from grand.tests.benchmark import (
+	StubDoc,
+	StubFrappe,
+	get_regressions,
+	load_baselines,
+	measure,
+	save_baselines,
+	should_update_baselines,
+)
+
+SIZES = (10, 100, 1000)
+DISTINCT_ITEMS = 25
+
+
+def make_sales_invoice(stub, rows):
+	return StubDoc(
+		stub,
+		doctype="Sales Invoice",
+		name="_Test SINV Benchmark",
+		company="_Test Company",
+		customer="_Test Customer",
+		debit_to="Debtors - _TC",
+		posting_date="2026-10-01",
+		rounded_total=100000,
+		cost_center="Main - _TC",
+		project=None,
+		deductions=[
+			frappe._dict(idx=idx, account="_Test Deduction - _TC", percent=0.05, value=0)
+			for idx in range(1, rows + 1)
+		],
+		deduction_table=[
+			frappe._dict(idx=idx, account="_Test Retention - _TC", amount=10, cost_center=None)
+			for idx in range(1, rows + 1)
+		],
+	)
+
+
+def make_delivery_note(stub, rows):
+	return StubDoc(
+		stub,
+		doctype="Delivery Note",
+		name="_Test DN Benchmark",
+		company="_Test Company",
+		project=None,
+		project_inventory=None,
+		custom_stock_entry=None,
+		items=[frappe._dict(warehouse="Stores - _TC")],
+		custom_delivery_sheet=[
+			frappe._dict(
+				idx=idx,
+				item_code=f"_Test Sheet Item {idx % DISTINCT_ITEMS}",
+				description="",
+				qty=1,
+				stock_qty=1,
+			)
+			for idx in range(1, rows + 1)
+		],
+	)
+
+
+def make_lines(rows):
+	return frappe._dict(
+		name="_Test Lines Benchmark",
+		project="_Test Project",
+		sector="_Test Sector",
+		date="2026-10-01",
+		warehouse="Stores - _TC",
+		lines_service=[
+			frappe._dict(
+				block=f"B{idx % 10}",
+				building=f"B{idx % 10}-{idx % 7}",
+				item=f"Item {idx % DISTINCT_ITEMS}",
+				type="Asphalt",
+				qty=2,
+			)
+			for idx in range(1, rows + 1)
+		],
+	)
+
+
+def item_uoms(filters):
+	return [frappe._dict(name=code, stock_uom="Nos") for code in filters["name"][1]]
+
+
+def lines_items(sheets):
+	def get_rows(filters):
+		names = set(filters["parent"][1])
+		return [
+			frappe._dict(parent=sheet.name, item=row.item, qty=row.qty)
+			for sheet in sheets
+			if sheet.name in names
+			for row in sheet.lines_service
+		]
+
+	return get_rows
+
+
+def deduction_je_on_submit(rows):
+	return measure(
+		lambda stub: create_journal_entry_from_deductions(make_sales_invoice(stub, rows)),
+		StubFrappe,
+	)
+
+
+def deduction_je_draft(rows):
+	def make_stub():
+		stub = StubFrappe()
+		stub.docs[("Sales Invoice", "_Test SINV Benchmark")] = make_sales_invoice(stub, rows)
+		return stub
+
+	return measure(lambda stub: create_deduction_je("_Test SINV Benchmark"), make_stub)
+
+
+def delivery_sheet_stock_entry(rows):
+	return measure(
+		lambda stub: create_stock_entry_from_delivery_sheet(make_delivery_note(stub, rows), "on_submit"),
+		lambda: StubFrappe(tables={"Item": item_uoms}),
+	)
+
+
+def lines_on_submit(rows):
+	return measure(lambda stub: update_lines_production(make_lines(rows)), StubFrappe)
+
+
+def lines_stock_grouping(rows):
+	# `rows` sheets of 20 items each
+	sheets = [frappe._dict(make_lines(20), name=f"_Test Lines {idx}") for idx in range(rows)]
+	return measure(
+		lambda stub: group_lines(sheets), lambda: StubFrappe(tables={"Lines Item": lines_items(sheets)})
+	)
+
+
+SCENARIOS = {
+	"create_journal_entry_from_deductions": deduction_je_on_submit,
+	"create_deduction_je": deduction_je_draft,
+	"create_stock_entry_from_delivery_sheet": delivery_sheet_stock_entry,
+	"update_lines_production": lines_on_submit,
+	"group_lines": lines_stock_grouping,
+}
+
+
+class TestBenchmarks(FrappeTestCase):
+	def test_hot_paths_against_baselines(self):
+		baselines = load_baselines()
+		results, regressions = {}, []
+		for scenario, run in SCENARIOS.items():
+			for size in SIZES:
+				key = f"{scenario}[{size}]"
+				results[key] = result = run(size)
+				print(
+					f"{key:<48} queries={result['queries']:<4} writes={result['writes']:<3} {result['wall_ms']:9.3f}ms"
+				)
+				if key in baselines:
+					regressions.extend(
+						f"{key}: {problem}" for problem in get_regressions(result, baselines[key])
+					)
+
+		if should_update_baselines():
+			save_baselines(results)
+			return
+		self.assertFalse(regressions, "\n".join(regressions))
+		self.assertFalse(set(results) - set(baselines), "benchmark baselines missing; regenerate them")
+
+	def test_query_counts_do_not_grow_with_rows(self):
+		for run in (deduction_je_on_submit, deduction_je_draft, delivery_sheet_stock_entry):
+			self.assertEqual(run(10)["queries"], run(1000)["queries"], run.__name__)
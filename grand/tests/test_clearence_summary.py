@@ -0,0 +1,140 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+import copy
+import random
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand.clearence_summary import (
+	build_summary_rows,
+	get_summary_deltas,
+	merge_summary_rows,
+	update_items_summary,
+)
+from grand.tests.utils import FakeDoc
+
+ITEM_GROUPS = ("Asphalt", "Dust", "Concrete", "Steel")
+
+
+def make_clearence(lines, seed=1):
+	rng = random.Random(seed)
+	return FakeDoc(
+		items=[
+			frappe._dict(
+				name=f"row-{idx}",
+				item_group=ITEM_GROUPS[idx % len(ITEM_GROUPS)],
+				item_code=f"_Test BOQ Item {idx % 250}",
+				item_name=f"BOQ {idx % 250}",
+				uom="Nos",
+				qty=rng.randint(1, 50),
+				amount=round(rng.uniform(10, 5000), 2),
+			)
+			for idx in range(lines)
+		],
+		group_items=[],
+	)
+
+
+def edit(doc, changes, seed=2):
+	"""Copy of `doc` as the form saves it after `changes` rows are edited, one removed,
+	one re-keyed and one added; edited rows carry the form's `__unsaved` mark."""
+	rng = random.Random(seed)
+	after = copy.deepcopy(doc)
+	for row in rng.sample(after.items, changes):
+		row.qty += 3
+		row.amount = round(row.amount * 1.1, 2)
+		row["__unsaved"] = 1
+	after.items.pop(rng.randrange(len(after.items)))
+	after.items[0].item_code = "_Test BOQ Item New"
+	after.items[0]["__unsaved"] = 1
+	after.items.append(frappe._dict(item_group="Steel", item_code="_Test BOQ Item 7", qty=4, amount=40.5))
+	return after
+
+
+def as_totals(rows):
+	return {(row.item_group, row.item_code): (round(row.qty, 4), round(row.amount, 4)) for row in rows}
+
+
+class TestClearenceItemsSummary(FrappeTestCase):
+	def test_incremental_matches_full_rebuild(self):
+		before = make_clearence(500)
+		after = edit(before, changes=20)
+
+		rows = merge_summary_rows(build_summary_rows(before), get_summary_deltas(before, after))
+
+		self.assertEqual(as_totals(rows), as_totals(build_summary_rows(after)))
+		self.assertEqual([row.idx for row in rows], list(range(1, len(rows) + 1)))
+
+	def test_key_removed_when_its_last_row_goes(self):
+		before = FakeDoc(
+			items=[frappe._dict(name="a", item_group="Dust", item_code="D", qty=2, amount=10)], group_items=[]
+		)
+		after = FakeDoc(items=[], group_items=[])
+
+		self.assertEqual(
+			merge_summary_rows(build_summary_rows(before), get_summary_deltas(before, after)), []
+		)
+
+	def test_only_new_marked_and_removed_rows_are_applied(self):
+		before = make_clearence(8)
+		after = copy.deepcopy(before)
+		# unmarked rows are trusted to match the saved version and are not compared
+		after.items[1].qty = 99
+		after.items[2].qty += 1
+		after.items[2]["__unsaved"] = 1
+		after.items.pop(3)
+
+		deltas = get_summary_deltas(before, after)
+
+		self.assertEqual(set(deltas), {("Concrete", "_Test BOQ Item 2"), ("Steel", "_Test BOQ Item 3")})
+		self.assertEqual(deltas[("Concrete", "_Test BOQ Item 2")][0], (1, 0))
+
+	def test_group_items_are_not_counted(self):
+		doc = make_clearence(8)
+		# read-only grouping of the same lines
+		doc.group_items = [
+			frappe._dict(name=f"group-{row.name}", item_group=row.item_group, qty=row.qty, amount=row.amount)
+			for row in doc.items
+		]
+		without_groups = build_summary_rows(make_clearence(8))
+
+		self.assertEqual(as_totals(build_summary_rows(doc)), as_totals(without_groups))
+		self.assertEqual(sum(row.qty for row in build_summary_rows(doc)), sum(row.qty for row in doc.items))
+
+	def test_saves_from_code_rebuild_the_summary(self):
+		before = make_clearence(8)
+		doc = copy.deepcopy(before)
+		# changed in code: no `__unsaved` marks on the document or its rows
+		doc.items[0].qty += 5
+		doc.clearence_items_summary = build_summary_rows(before)
+		doc.meta = MagicMock()
+		doc.is_new = lambda: False
+		doc.get_doc_before_save = lambda: before
+		doc.set = lambda fieldname, value: setattr(doc, fieldname, value)
+		summary_meta = MagicMock()
+		summary_meta.has_field.side_effect = lambda fieldname: fieldname == "uom"
+
+		with patch("frappe.get_meta", return_value=summary_meta):
+			update_items_summary(doc)
+
+		self.assertEqual(as_totals(doc.clearence_items_summary), as_totals(build_summary_rows(doc)))
+		self.assertEqual(doc.clearence_items_summary[0].uom, "Nos")
+		self.assertNotIn("item_name", doc.clearence_items_summary[0])
+
+	def test_edit_of_5000_lines_keeps_saved_summary_rows(self):
+		"""Editing a few rows of a 5,000-line clearence touches only their keys."""
+		before = make_clearence(5000)
+		summary = build_summary_rows(before)
+		after = edit(before, changes=10)
+
+		deltas = get_summary_deltas(before, after)
+		updated = merge_summary_rows(summary, deltas)
+
+		# every rebuilt row is a new child row to insert; incremental keeps the saved ones
+		kept = {id(row) for row in summary}
+		self.assertEqual(as_totals(updated), as_totals(build_summary_rows(after)))
+		self.assertLessEqual(len(deltas), 14)
+		self.assertLessEqual(sum(id(row) not in kept for row in updated), 2)
@@ -0,0 +1,106 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand import db_indexes
+
+# (doctype, columns the query needs, query) for the lookups the indexes back
+LOOKUPS = [
+	("Block", ("sector",), "select name from `tabBlock` where sector = %(value)s order by name"),
+	("Building", ("sector", "block"), "select name, block from `tabBuilding` where sector = %(value)s"),
+	("Building", ("block",), "select name from `tabBuilding` where block = %(value)s"),
+	(
+		"Lines Item",
+		("building", "item"),
+		"select parent from `tabLines Item` where building = %(value)s and item = %(value)s",
+	),
+	("Lines Item", ("item",), "select parent, qty from `tabLines Item` where item = %(value)s"),
+	(
+		"Delivery Note",
+		("custom_sector",),
+		"select name from `tabDelivery Note` where custom_sector = %(value)s and docstatus = 1",
+	),
+	(
+		"Delivery Note Item",
+		("custom_block", "custom_building"),
+		"select parent from `tabDelivery Note Item` where custom_block = %(value)s and custom_building = %(value)s",
+	),
+	(
+		"Sales Invoice",
+		("clearence",),
+		"select name from `tabSales Invoice` where clearence = %(value)s and docstatus < 2",
+	),
+	(
+		"Journal Entry Account",
+		("reference_type", "reference_name"),
+		"""select parent, credit from `tabJournal Entry Account`
+		where reference_type = 'Sales Invoice' and reference_name = %(value)s""",
+	),
+]
+
+
+class TestLookupIndexPlans(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		if frappe.db.db_type != "mariadb":
+			raise unittest.SkipTest("query plans are checked on MariaDB only")
+		db_indexes.ensure_indexes()
+
+	def test_lookups_use_an_index(self):
+		for doctype, columns, query in LOOKUPS:
+			with self.subTest(doctype=doctype, columns=columns):
+				if not frappe.db.table_exists(doctype):
+					continue
+				if not set(columns).issubset(frappe.db.get_table_columns(doctype)):
+					continue
+
+				plan = frappe.db.sql(f"explain {query}", {"value": "_Test Value"}, as_dict=True)
+				rows = [row for row in plan if row.table == f"tab{doctype}"]
+				for row in rows:
+					self.assertNotEqual(row.type, "ALL", f"full scan: {query}")
+					self.assertTrue(row.key, f"no index used: {query}")
+
+	def test_ensure_indexes_is_idempotent(self):
+		self.assertEqual(db_indexes.ensure_indexes(), [])
+
+
+class TestEnsureIndexes(FrappeTestCase):
+	def ensure(self, existing):
+		with (
+			patch.object(db_indexes, "INDEXES", {"Building": [("sector", "block"), ("block", "name")]}),
+			patch.object(db_indexes.frappe.db, "db_type", "mariadb", create=True),
+			patch.object(db_indexes.frappe.db, "table_exists", return_value=True, create=True),
+			patch.object(
+				db_indexes.frappe.db,
+				"get_table_columns",
+				return_value=["name", "sector", "block"],
+				create=True,
+			),
+			patch.object(db_indexes, "get_table_indexes", return_value=existing),
+			patch.object(db_indexes.frappe.db, "sql_ddl", create=True) as sql_ddl,
+		):
+			created = db_indexes.ensure_indexes()
+		return created, [call.args[0] for call in sql_ddl.call_args_list]
+
+	def test_covered_and_current_indexes_are_left_alone(self):
+		created, statements = self.ensure(
+			{
+				"PRIMARY": ("name",),
+				"sector_block_name": ("sector", "block", "name"),
+				"grand_block_name": ("block", "name"),
+			}
+		)
+		self.assertEqual((created, statements), ([], []))
+
+	def test_changed_index_is_recreated(self):
+		created, statements = self.ensure({"PRIMARY": ("name",), "grand_block_name": ("block",)})
+
+		self.assertEqual(created, [("Building", "grand_sector_block"), ("Building", "grand_block_name")])
+		self.assertIn("drop index `grand_block_name`", statements[1])
+		self.assertIn("add index `grand_block_name` (`block`, `name`)", statements[2])
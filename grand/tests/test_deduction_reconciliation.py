@@ -0,0 +1,100 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand import deduction_reconciliation
+
+
+def invoice(name, total_deductions, posted_amount=0, draft_count=0, journal_entries=None):
+	return frappe._dict(
+		name=name,
+		posting_date="2026-09-30",
+		total_deductions=total_deductions,
+		posted_amount=posted_amount,
+		draft_count=draft_count,
+		journal_entries=journal_entries,
+	)
+
+
+class TestDeductionReconciliation(FrappeTestCase):
+	def test_discrepancies_found_in_one_query(self):
+		rows = [
+			invoice("SINV-1", 100),
+			invoice("SINV-2", 100, draft_count=1, journal_entries="JE-2"),
+			invoice("SINV-3", 100, posted_amount=90.004, journal_entries="JE-3"),
+		]
+		with (
+			patch.object(deduction_reconciliation.frappe.db, "exists", return_value=True),
+			patch.object(deduction_reconciliation.frappe.db, "sql", return_value=rows) as sql,
+		):
+			found = deduction_reconciliation.get_deduction_je_discrepancies(to_date="2026-09-30")
+
+		sql.assert_called_once()
+		self.assertIn("abs(posted_amount - expected_amount)", sql.call_args.args[0])
+		self.assertEqual([row.status for row in found], ["Missing", "Draft", "Mismatch"])
+		self.assertEqual(found[2].posted_amount, 90)
+
+	def test_expected_amount_follows_the_journal_entry_builder(self):
+		with patch.object(deduction_reconciliation.frappe.db, "exists", return_value=True):
+			expected = deduction_reconciliation.get_expected_amount_sql()
+
+		# `deduction_table` rows replace the `deductions` ones when there are any
+		self.assertTrue(expected.startswith("case when exists (select 1 from `tabDeduction Table` d"))
+		deduction_table, deductions = expected.split(" else ")
+		self.assertIn("sum(round(d.amount, 2))", deduction_table)
+		self.assertIn("from `tabDeduction` d", deductions)
+		self.assertIn("ifnull(d.account, '') != ''", deductions)
+
+		with patch.object(deduction_reconciliation.frappe.db, "exists", return_value=False):
+			self.assertEqual(deduction_reconciliation.get_deduction_je_discrepancies(), [])
+
+	def test_repair_creates_missing_and_submits_drafts_only(self):
+		rows = [
+			frappe._dict(invoice("SINV-1", 100), status="Missing"),
+			frappe._dict(invoice("SINV-2", 100, journal_entries="JE-2"), status="Draft"),
+			frappe._dict(invoice("SINV-3", 100, posted_amount=90), status="Mismatch"),
+		]
+		with (
+			patch("grand.sales_invoice_events.is_consolidated_deduction_mode", return_value=False),
+			patch(
+				"grand.sales_invoice_events.create_deduction_jes_job",
+				return_value={"SINV-1": {"status": "Created"}},
+			) as create_jobs,
+			patch.object(
+				deduction_reconciliation,
+				"submit_draft_deduction_jes",
+				return_value={"SINV-2": {"status": "Submitted"}},
+			) as submit_drafts,
+		):
+			report = deduction_reconciliation.repair_deduction_jes(rows)
+
+		create_jobs.assert_called_once_with(["SINV-1"], submit=1)
+		self.assertEqual([row.name for row in submit_drafts.call_args.args[0]], ["SINV-2"])
+		self.assertNotIn("SINV-3", report)
+
+	def test_daily_job_checks_a_recent_window_and_logs_a_summary(self):
+		rows = [frappe._dict(invoice(f"SINV-{idx}", 100), status="Missing") for idx in range(25)]
+		rows.append(frappe._dict(invoice("SINV-D", 100, journal_entries="JE-D"), status="Draft"))
+		with (
+			patch("grand.sales_invoice_events.is_consolidated_deduction_mode", return_value=False),
+			patch.object(deduction_reconciliation, "nowdate", return_value="2026-10-18"),
+			patch.object(deduction_reconciliation, "reconcile_deduction_jes", return_value=rows) as reconcile,
+			patch.object(deduction_reconciliation, "get_logger") as get_logger,
+			patch("frappe.log_error") as log_error,
+		):
+			deduction_reconciliation.reconcile_deduction_jes_daily()
+
+		self.assertEqual(
+			(str(reconcile.call_args.kwargs["from_date"]), str(reconcile.call_args.kwargs["to_date"])),
+			("2026-09-07", "2026-10-17"),
+		)
+		logged = get_logger.return_value.warning.call_args.args[0]
+		self.assertEqual((logged["Missing"], logged["Draft"]), (25, 1))
+		message = log_error.call_args.kwargs["message"].splitlines()
+		self.assertEqual(message[0], "2026-09-07 - 2026-10-17: Draft 1, Missing 25")
+		self.assertEqual(len(message), 1 + deduction_reconciliation.LOG_ROWS + 1)
+		self.assertEqual(message[-1], "... and 6 more")
@@ -0,0 +1,250 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from grand.grand.deductions import collect_deductions, get_deduction_je_accounts, set_deduction_values
+from grand.tests.benchmark import StubFrappe
+from grand.tests.utils import FakeDoc
+
+
+def make_invoice(rows):
+	return frappe._dict(
+		doctype="Sales Invoice",
+		name="_Test SINV Deductions",
+		rounded_total=10000,
+		cost_center="Main - _TC",
+		project=None,
+		deductions=[
+			frappe._dict(idx=idx, account="_Test Deduction - _TC", percent=1.5, value=0)
+			for idx in range(1, rows + 1)
+		],
+		deduction_table=[
+			frappe._dict(idx=idx, account="_Test Retention - _TC", amount=25, cost_center=None)
+			for idx in range(1, rows + 1)
+		],
+	)
+
+
+def pre_engine_accounts(doc):
+	"""Journal Entry lines as `create_journal_entry_from_deductions` built them before the engine.
+
+	Copied from that function with only the party defaults, checks and Journal
+	Entry creation left out.
+	"""
+	accounts = []
+	total_deductions = 0.0
+
+	for row in getattr(doc, "deductions", []) or []:
+		try:
+			value = (
+				flt(row.get("value") if hasattr(row, "get") else getattr(row, "value", None), 2)
+				if (hasattr(row, "get") and row.get("value") is not None) or getattr(row, "value", None)
+				else flt(
+					(
+						flt(row.get("percent") if hasattr(row, "get") else getattr(row, "percent", 0), 2)
+						* flt(doc.rounded_total, 2)
+						/ 100.0
+					),
+					2,
+				)
+			)
+		except Exception:
+			value = 0.0
+		if not value:
+			continue
+		total_deductions = flt(total_deductions + value, 2)
+		accounts.append(
+			{
+				"account": (row.get("account") if hasattr(row, "get") else getattr(row, "account", None)),
+				"debit": value,
+				"credit": 0.0,
+				"cost_center": (
+					row.get("cost_center") if hasattr(row, "get") else getattr(row, "cost_center", None)
+				)
+				or getattr(doc, "cost_center", None),
+				"project": (row.get("project") if hasattr(row, "get") else getattr(row, "project", None))
+				or getattr(doc, "project", None),
+			}
+		)
+
+	for row in getattr(doc, "deduction_table", []) or []:
+		try:
+			amt = flt(row.get("amount") if hasattr(row, "get") else getattr(row, "amount", 0), 2)
+		except Exception:
+			try:
+				amt = flt(float(row.get("amount") if hasattr(row, "get") else getattr(row, "amount", 0)))
+			except Exception:
+				amt = 0.0
+		if not amt:
+			continue
+		total_deductions = flt(total_deductions + amt, 2)
+		accounts.append(
+			{
+				"account": (row.get("account") if hasattr(row, "get") else getattr(row, "account", None)),
+				"debit": amt,
+				"credit": 0.0,
+				"cost_center": (
+					row.get("cost_center") if hasattr(row, "get") else getattr(row, "cost_center", None)
+				)
+				or getattr(doc, "cost_center", None),
+				"project": (row.get("project") if hasattr(row, "get") else getattr(row, "project", None))
+				or getattr(doc, "project", None),
+			}
+		)
+
+	accounts.insert(
+		0,
+		{
+			"account": "Debtors - _TC",
+			"debit": 0.0,
+			"credit": total_deductions,
+			"cost_center": getattr(doc, "cost_center", None),
+			"project": getattr(doc, "project", None),
+		},
+	)
+
+	cleaned_accounts = []
+	for a in accounts:
+		a["debit"] = flt(a.get("debit", 0.0), 2)
+		a["credit"] = flt(a.get("credit", 0.0), 2)
+		if not (a["debit"] == 0.0 and a["credit"] == 0.0):
+			cleaned_accounts.append(a)
+	return cleaned_accounts
+
+
+class TestDeductionEngine(FrappeTestCase):
+	def test_lines_and_total(self):
+		doc = make_invoice(2)
+		doc.deductions[1].value = 40
+		doc.deduction_table.append(frappe._dict(idx=3, account=None, amount=10))
+		doc.deduction_table.append(frappe._dict(idx=4, account="_Test Retention - _TC", amount=0))
+
+		deductions = collect_deductions(doc)
+
+		self.assertEqual([line["debit"] for line in deductions.lines], [150, 40, 25, 25])
+		self.assertEqual(deductions.total, 240)
+		self.assertEqual(deductions.missing_account, [("deduction_table", 3)])
+		self.assertEqual(deductions.lines[0]["cost_center"], "Main - _TC")
+
+		accounts = get_deduction_je_accounts(doc, "Debtors - _TC", deductions)
+		self.assertEqual(accounts[0]["credit"], 240)
+		self.assertEqual(accounts[0]["reference_name"], doc.name)
+		self.assertEqual(sum(a["debit"] for a in accounts), sum(a["credit"] for a in accounts))
+
+	def test_matches_pre_engine_journal_entry_lines(self):
+		doc = make_invoice(50)
+		# before the engine, only an unset value fell back to the percent on submit
+		for row in doc.deductions:
+			row.value = None
+		doc.deductions[3].value = 40
+		doc.deduction_table[5].amount = 0
+
+		fields = ("account", "debit", "credit", "cost_center", "project")
+		accounts = get_deduction_je_accounts(doc, "Debtors - _TC", collect_deductions(doc))
+		self.assertEqual(
+			[tuple(a[f] for f in fields) for a in pre_engine_accounts(doc)],
+			[tuple(a.get(f) for f in fields) for a in accounts],
+		)
+
+	def test_no_queries_per_deduction_row(self):
+		doc = make_invoice(2000)
+		with StubFrappe() as stub:
+			get_deduction_je_accounts(doc, "Debtors - _TC", collect_deductions(doc))
+		self.assertEqual(stub.queries, 0)
+
+	def test_values_and_totals_recomputed_on_change(self):
+		doc = self.make_saved_invoice(before=None)
+		doc.conversion_rate = 2
+		set_deduction_values(doc)
+
+		self.assertEqual(doc.deductions[0].value, 150)
+		self.assertEqual(doc.total_deductions, 175)
+		self.assertEqual(doc.base_total_deductions, 350)
+
+	def test_unchanged_invoice_is_not_recomputed(self):
+		before = make_invoice(1)
+		doc = self.make_saved_invoice(before=before)
+		doc.deductions[0].value = before.deductions[0].value = 99
+		set_deduction_values(doc)
+		self.assertIsNone(doc.total_deductions)
+
+		doc.rounded_total = 20000
+		set_deduction_values(doc)
+		self.assertEqual(doc.deductions[0].value, 300)
+
+	def make_saved_invoice(self, before):
+		invoice = make_invoice(1)
+		return FakeDoc(
+			**invoice,
+			total_deductions=None,
+			meta=frappe._dict(has_field=lambda fieldname: True),
+			precision=lambda fieldname: 2,
+			is_new=lambda: before is None,
+			get_doc_before_save=lambda: before,
+		)
+
+
+class TestDeductionJEBatch(FrappeTestCase):
+	def test_failures_are_reported_per_invoice(self):
+		from grand import sales_invoice_events
+
+		good = make_invoice(1)
+		good.update(
+			name="SINV-GOOD", company="_Test Company", debit_to="Debtors - _TC", customer="_Test Customer"
+		)
+		bad = make_invoice(1)
+		bad.update(name="SINV-BAD", company="_Test Company", debit_to=None)
+
+		journal_entry = MagicMock()
+		journal_entry.name = "JV-0001"
+		with (
+			patch.object(
+				sales_invoice_events,
+				"load_invoices_for_deductions",
+				return_value={"SINV-GOOD": good, "SINV-BAD": bad},
+			),
+			patch.object(
+				sales_invoice_events, "get_invoices_with_deduction_je", return_value={"SINV-DONE": "JV-0000"}
+			),
+			patch.object(sales_invoice_events, "make_deduction_journal_entry", return_value=journal_entry),
+			patch("frappe.db.savepoint"),
+			patch("frappe.db.rollback"),
+			patch("frappe.db.commit"),
+			patch("frappe.log_error"),
+			patch("frappe.publish_progress"),
+			patch("frappe.publish_realtime"),
+		):
+			report = sales_invoice_events.create_deduction_jes_job(
+				["SINV-BAD", "SINV-GOOD", "SINV-DONE", "SINV-GONE"]
+			)
+
+		self.assertEqual(report["SINV-GOOD"], {"status": "Created", "journal_entry": "JV-0001"})
+		self.assertEqual(report["SINV-BAD"]["status"], "Failed")
+		self.assertEqual(report["SINV-DONE"]["status"], "Skipped")
+		self.assertEqual(report["SINV-GONE"]["status"], "Failed")
+		journal_entry.insert.assert_called_once()
+
+	def test_consolidated_je_aggregates_shared_accounts(self):
+		from grand.sales_invoice_events import make_consolidated_deduction_je
+
+		entries = []
+		for name in ("SINV-A", "SINV-B", "SINV-C"):
+			inv = make_invoice(2)
+			inv.name = name
+			entries.append((inv, collect_deductions(inv)))
+
+		with patch("frappe.get_doc", side_effect=lambda doc: doc):
+			je = make_consolidated_deduction_je(
+				"_Test Company", "_Test Customer", "Debtors - _TC", entries, "2026-01-01", "2026-01-31"
+			)
+
+		credits = [a for a in je["accounts"] if a["credit"]]
+		debits = [a for a in je["accounts"] if a["debit"]]
+		self.assertEqual([a["reference_name"] for a in credits], ["SINV-A", "SINV-B", "SINV-C"])
+		self.assertEqual(len(debits), 2)
+		self.assertEqual(sum(a["debit"] for a in debits), sum(a["credit"] for a in credits))
@@ -0,0 +1,252 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand import item_utils
+from grand.grand.delivery_note_events import (
+	backfill_stock_entry_links,
+	build_stock_entry,
+	cancel_stock_entry_from_delivery_sheet,
+	validate_block_building,
+)
+from grand.tests.utils import FakeDoc
+
+DISTINCT_ITEMS = 25
+
+
+def make_delivery_note(rows):
+	return FakeDoc(
+		name="_Test DN Sheet",
+		company="_Test Company",
+		project=None,
+		project_inventory=None,
+		items=[frappe._dict(warehouse="Stores - _TC")],
+		custom_delivery_sheet=[
+			frappe._dict(
+				idx=idx,
+				item_code=f"_Test Sheet Item {idx % DISTINCT_ITEMS}",
+				description="",
+				qty=1,
+				stock_qty=1,
+			)
+			for idx in range(1, rows + 1)
+		],
+	)
+
+
+def fake_item_rows(doctype, filters=None, fields=None, **kwargs):
+	if doctype == "UOM Conversion Detail":
+		return [frappe._dict(parent=code, uom="Box", conversion_factor=12) for code in filters["parent"][1]]
+	return [frappe._dict(name=code, stock_uom="Nos") for code in filters["name"][1]]
+
+
+def clear_item_caches():
+	frappe.local.grand_stock_uom_cache = None
+	item_utils._uom_conversion_cache.clear()
+
+
+class TestDeliverySheetStockEntry(FrappeTestCase):
+	def setUp(self):
+		clear_item_caches()
+
+	def build(self, rows, delivery_note=None):
+		stock_entry = MagicMock()
+		with (
+			patch("frappe.get_all", side_effect=fake_item_rows) as get_all,
+			patch("frappe.new_doc", return_value=stock_entry),
+		):
+			build_stock_entry(delivery_note or make_delivery_note(rows))
+		return stock_entry, get_all.call_count
+
+	def test_item_lookups_are_one_query_per_table(self):
+		stock_entry, queries = self.build(200)
+		self.assertEqual(queries, 2)
+		self.assertEqual(stock_entry.append.call_count, 200)
+
+		# conversion factors outlive the request
+		frappe.local.grand_stock_uom_cache = None
+		_stock_entry, queries = self.build(200)
+		self.assertEqual(queries, 1)
+
+	def test_sheet_uom_converted_to_stock_uom(self):
+		delivery_note = make_delivery_note(2)
+		delivery_note.custom_delivery_sheet[0].update(stock_uom="Box", qty=2)
+		delivery_note.custom_delivery_sheet[1].update(stock_uom="Box", qty=0, stock_qty=5)
+
+		stock_entry, _queries = self.build(2, delivery_note)
+
+		# `stock_qty` is in the row's UOM too
+		for row, qty in zip(
+			(call.args[1] for call in stock_entry.append.call_args_list), (2, 5), strict=True
+		):
+			self.assertEqual(
+				(row["uom"], row["qty"], row["conversion_factor"], row["transfer_qty"]),
+				("Box", qty, 12, qty * 12),
+			)
+
+	def test_aggregated_rows_are_summed_in_stock_uom(self):
+		delivery_note = make_delivery_note(DISTINCT_ITEMS + 1)
+		delivery_note.custom_delivery_sheet[0].update(stock_uom="Box", qty=2)
+
+		with patch.dict(frappe.conf, {"grand_aggregate_delivery_sheet_items": 1}):
+			stock_entry, _queries = self.build(0, delivery_note)
+
+		row = stock_entry.append.call_args_list[0].args[1]
+		self.assertEqual((row["uom"], row["qty"], row["conversion_factor"]), ("Nos", 25, 1))
+
+	def test_missing_conversion_reported_together(self):
+		delivery_note = make_delivery_note(3)
+		for row in delivery_note.custom_delivery_sheet:
+			row.stock_uom = "Pallet"
+
+		with self.assertRaises(frappe.ValidationError) as ctx:
+			self.build(3, delivery_note)
+		for idx in (1, 2, 3):
+			self.assertIn(f"#{idx} _Test Sheet Item {idx} (Pallet)", str(ctx.exception))
+
+	def test_missing_items_reported_together(self):
+		with patch("frappe.get_all", return_value=[]), patch("frappe.new_doc", return_value=MagicMock()):
+			with self.assertRaises(frappe.ValidationError) as ctx:
+				build_stock_entry(make_delivery_note(3))
+		for idx in (1, 2, 3):
+			self.assertIn(f"_Test Sheet Item {idx}", str(ctx.exception))
+
+	def test_aggregation_merges_rows_per_item(self):
+		with patch.dict(frappe.conf, {"grand_aggregate_delivery_sheet_items": 1}):
+			stock_entry, _queries = self.build(60)
+
+		rows = [call.args[1] for call in stock_entry.append.call_args_list]
+		self.assertEqual(len(rows), DISTINCT_ITEMS)
+		self.assertEqual(sum(row["qty"] for row in rows), 60)
+		first = next(row for row in rows if row["item_code"] == "_Test Sheet Item 1")
+		self.assertEqual(first["custom_delivery_sheet_rows"], "1, 26, 51")
+
+	def test_aggregation_ledger_rows(self):
+		"""Stock Entry rows (one Stock Ledger Entry each on submit) with and without aggregation."""
+		for rows in (100, 1000):
+			results = {}
+			for aggregate in (0, 1):
+				clear_item_caches()
+				with patch.dict(frappe.conf, {"grand_aggregate_delivery_sheet_items": aggregate}):
+					stock_entry, _queries = self.build(rows)
+				results[aggregate] = stock_entry.append.call_count
+			self.assertEqual(results, {0: rows, 1: DISTINCT_ITEMS})
+
+	def test_item_queries_do_not_grow_with_rows(self):
+		for rows in (10, 100, 1000):
+			clear_item_caches()
+			_stock_entry, queries = self.build(rows)
+			self.assertEqual(queries, 2)
+
+
+def make_lines_delivery_note(rows, sector="_Test Sector"):
+	return FakeDoc(
+		name="_Test DN Lines",
+		custom_sector=sector,
+		items=[
+			frappe._dict(
+				idx=idx,
+				custom_block=f"{sector}-B{idx % 20}",
+				custom_building=f"{sector}-B{idx % 20}-{idx % 7}",
+			)
+			for idx in range(1, rows + 1)
+		],
+	)
+
+
+def hierarchy_rows(query, values, as_dict=False):
+	rows = [
+		frappe._dict(doctype="Block", name=name, sector=name.rsplit("-", 1)[0], block=None)
+		for name in values["blocks"]
+	]
+	rows += [
+		frappe._dict(doctype="Building", name=name, sector=name.split("-")[0], block=name.rsplit("-", 1)[0])
+		for name in values["buildings"]
+	]
+	return rows
+
+
+class TestDeliveryNoteBlockBuilding(FrappeTestCase):
+	def validate(self, doc):
+		with (
+			patch("frappe.get_meta", return_value=MagicMock(has_field=lambda fieldname: True)),
+			patch("frappe.db.sql", side_effect=hierarchy_rows) as sql,
+		):
+			validate_block_building(doc)
+		return sql.call_count
+
+	def test_all_violations_reported_together(self):
+		doc = make_lines_delivery_note(3)
+		doc.items[0].custom_building = "Other Sector-B1-1"
+		doc.items[2].custom_block = "Other Sector-B3"
+		with self.assertRaises(frappe.ValidationError) as ctx:
+			self.validate(doc)
+		self.assertIn("Row 1: Building Other Sector-B1-1 is not in Sector _Test Sector", str(ctx.exception))
+		self.assertIn("Row 3: Block Other Sector-B3 is not in Sector _Test Sector", str(ctx.exception))
+
+	def test_building_must_belong_to_row_block(self):
+		doc = make_lines_delivery_note(1)
+		doc.items[0].custom_building = "_Test Sector-B9-1"
+		with self.assertRaises(frappe.ValidationError) as ctx:
+			self.validate(doc)
+		self.assertIn("is not in Block _Test Sector-B1", str(ctx.exception))
+
+	def test_validation_on_1000_rows_is_one_query(self):
+		"""1,000 item rows are checked with a single set-based query."""
+		self.assertEqual(self.validate(make_lines_delivery_note(1000)), 1)
+
+
+class TestDeliveryNoteStockEntryLink(FrappeTestCase):
+	def test_stock_entry_points_back_to_the_note(self):
+		clear_item_caches()
+		stock_entry = MagicMock()
+		with (
+			patch("frappe.get_all", side_effect=fake_item_rows),
+			patch("frappe.new_doc", return_value=stock_entry),
+		):
+			build_stock_entry(make_delivery_note(2))
+		self.assertEqual(stock_entry.custom_delivery_note, "_Test DN Sheet")
+
+	def test_cancel_cascades_to_linked_stock_entries(self):
+		delivery_note = MagicMock()
+		delivery_note.name = "_Test DN Sheet"
+		delivery_note.get.side_effect = {
+			"custom_stock_entry": "SE-2",
+			"custom_stock_entry_status": "Created",
+		}.get
+		delivery_note.custom_stock_entry = "SE-2"
+		stock_entries = {"SE-1": MagicMock(), "SE-2": MagicMock()}
+
+		with (
+			patch("frappe.get_all", return_value=["SE-1"]),
+			patch("frappe.db.get_value", return_value=1, create=True),
+			patch("frappe.get_doc", side_effect=lambda doctype, name: stock_entries[name]),
+			patch("frappe.msgprint"),
+		):
+			cancel_stock_entry_from_delivery_sheet(delivery_note)
+
+		for stock_entry in stock_entries.values():
+			stock_entry.cancel.assert_called_once()
+		delivery_note.db_set.assert_called_once_with(
+			"custom_stock_entry_status", "Cancelled", update_modified=False
+		)
+
+	def test_backfill_parses_comments_once(self):
+		comments = [
+			("SE-1", "<p>Auto-created from Delivery Note DN-0001</p>"),
+			("SE-2", "Auto-created from Delivery Note DN-0002"),
+			("SE-3", "Auto-created from Delivery Note DN-GONE"),
+		]
+		with (
+			patch("frappe.db.sql", side_effect=[comments, None]) as sql,
+			patch("frappe.get_all", return_value=["DN-0001", "DN-0002"]),
+		):
+			linked = backfill_stock_entry_links()
+
+		self.assertEqual(linked, 2)
+		self.assertEqual(sql.call_count, 2)
+		self.assertEqual(sql.call_args.args[1], ["SE-1", "DN-0001", "SE-2", "DN-0002", ("SE-1", "SE-2")])
@@ -0,0 +1,62 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+import subprocess
+import sys
+
+from frappe.tests.utils import FrappeTestCase
+
+import grand.hooks
+
+# must only be imported on first use, not when a worker loads the hooks
+LAZY_MODULES = ("erpnext", "frappe.model.mapper", "frappe.custom.doctype.custom_field.custom_field")
+PRELOADED = ("frappe", "frappe.utils", "frappe.model.document")
+
+
+def get_hook_modules():
+	"""Modules of every doc_events and scheduler_events handler."""
+	paths = []
+	for events in grand.hooks.doc_events.values():
+		for handlers in events.values():
+			paths.extend([handlers] if isinstance(handlers, str) else handlers)
+	for handlers in grand.hooks.scheduler_events.values():
+		paths.extend(handlers)
+	return sorted({path.rsplit(".", 1)[0] for path in paths})
+
+
+def measure_imports(modules):
+	"""``{module: cumulative_us}`` for `modules` and the names each of them pulled in."""
+	code = ";".join(f"import {module}" for module in (*PRELOADED, "grand.hooks", *modules))
+	stderr = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+	).stderr
+
+	cumulative, pulled_in = {}, []
+	for line in stderr.splitlines():
+		if not line.startswith("import time:") or "|" not in line[13:]:
+			continue
+		_self, total, name = line[12:].split("|")
+		if not total.strip().isdigit():
+			continue
+		depth = len(name) - len(name.lstrip()) - 1
+		name = name.strip()
+		if depth == 0 and name in PRELOADED:
+			# children are listed before their parent: start over after each preloaded module
+			pulled_in = []
+			continue
+		pulled_in.append(name)
+		if depth == 0 and name.startswith("grand"):
+			cumulative[name] = int(total)
+	return cumulative, pulled_in
+
+
+class TestImportTime(FrappeTestCase):
+	def test_hook_modules_defer_heavy_imports(self):
+		modules = get_hook_modules()
+		cumulative, pulled_in = measure_imports(modules)
+
+		# timings depend on the machine: reported, not asserted
+		for module, total in sorted(cumulative.items(), key=lambda item: -item[1]):
+			print(f"import {module:<70} {total / 1000:8.2f}ms")
+		for module in LAZY_MODULES:
+			self.assertNotIn(module, pulled_in)
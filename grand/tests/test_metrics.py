@@ -0,0 +1,146 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+import importlib
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+import grand.hooks
+from grand.grand import metrics
+
+# methods run through frappe.enqueue
+JOBS = (
+	"grand.grand.delivery_note_events.process_delivery_note_stock_entry",
+	"grand.grand.doctype.clearence.clearence.make_sales_invoices_job",
+	"grand.grand.lines_stock.process_pending_lines",
+	"grand.sales_invoice_events.create_deduction_jes_job",
+	"grand.sales_invoice_events.post_consolidated_deduction_jes",
+)
+
+
+class FakeRedis:
+	"""The part of frappe's Redis client the metrics use, backed by a dict."""
+
+	def __init__(self):
+		self.hashes = {}
+
+	def make_key(self, key):
+		return f"_test_site|{key}"
+
+	def pipeline(self):
+		return self
+
+	def hincrby(self, name, key, amount):
+		values = self.hashes.setdefault(name, {})
+		values[key] = values.get(key, 0) + amount
+
+	hincrbyfloat = hincrby
+
+	def execute(self):
+		pass
+
+	def execute_command(self, command, name):
+		return {key.encode(): str(value).encode() for key, value in self.hashes.get(name, {}).items()}
+
+
+def get_hook_handlers():
+	paths = []
+	for events in grand.hooks.doc_events.values():
+		for handlers in events.values():
+			paths.extend([handlers] if isinstance(handlers, str) else handlers)
+	for handlers in grand.hooks.scheduler_events.values():
+		paths.extend(handlers)
+	return sorted(set(paths))
+
+
+@metrics.instrument
+def _test_hook(doc, method=None):
+	frappe.db.sql("select 1")
+	_test_job(doc.name)
+	if doc.get("fail"):
+		raise frappe.ValidationError("failed")
+
+
+@metrics.instrument
+def _test_job(name):
+	frappe.db.sql("select 2")
+
+
+class TestMetrics(FrappeTestCase):
+	def setUp(self):
+		self.redis = FakeRedis()
+		for patcher in (
+			patch("frappe.cache", return_value=self.redis),
+			patch("frappe.db.sql", MagicMock(return_value=[]), create=True),
+			patch.dict(frappe.conf, {"grand_metrics": 1}),
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def get_values(self):
+		return metrics.get_metric_values()
+
+	def test_hook_and_nested_job_are_recorded(self):
+		sql = frappe.db.sql
+		_test_hook(frappe._dict(doctype="Delivery Note", name="_Test DN"), "on_submit")
+
+		values = self.get_values()
+		hook = values[f"{__name__}._test_hook|Delivery Note|on_submit"]
+		job = values[f"{__name__}._test_job||"]
+		self.assertEqual((hook["calls"], hook["queries"], hook.get("errors")), (1, 2, None))
+		self.assertEqual((job["calls"], job["queries"]), (1, 1))
+		self.assertEqual(sum(v for k, v in hook.items() if k.startswith("le=")), 1)
+		self.assertIs(frappe.db.sql, sql)
+
+	def test_errors_are_recorded_and_raised(self):
+		sql = frappe.db.sql
+		with self.assertRaises(frappe.ValidationError):
+			_test_hook(frappe._dict(doctype="Delivery Note", name="_Test DN", fail=1), "on_submit")
+
+		hook = self.get_values()[f"{__name__}._test_hook|Delivery Note|on_submit"]
+		self.assertEqual((hook["calls"], hook["errors"]), (1, 1))
+		self.assertIs(frappe.db.sql, sql)
+
+	def test_disabled_records_nothing(self):
+		with patch.dict(frappe.conf, {"grand_metrics": None}):
+			_test_hook(frappe._dict(doctype="Delivery Note", name="_Test DN"), "on_submit")
+		self.assertEqual(self.redis.hashes, {})
+
+	def test_recording_failures_do_not_fail_the_call(self):
+		with patch.object(self.redis, "execute", side_effect=ConnectionError):
+			_test_job("_Test DN")
+
+	def test_prometheus_histogram_is_cumulative(self):
+		values = {
+			"grand.x.hook|Delivery Note|on_submit": {
+				"calls": 3,
+				"errors": 1,
+				"queries": 12,
+				"seconds": 0.5,
+				"le=0.005": 1,
+				"le=0.25": 2,
+			},
+			'grand.x.job|Item "A"|': {"calls": 1, "queries": 1, "seconds": 400, "le=+Inf": 1},
+		}
+		text = metrics.format_metrics(values)
+
+		labels = 'handler="grand.x.hook",doctype="Delivery Note",event="on_submit"'
+		self.assertIn(f"grand_handler_calls_total{{{labels}}} 3", text)
+		self.assertIn(f"grand_handler_errors_total{{{labels}}} 1", text)
+		self.assertIn(f'grand_handler_duration_seconds_bucket{{{labels},le="0.1"}} 1', text)
+		self.assertIn(f'grand_handler_duration_seconds_bucket{{{labels},le="0.25"}} 3', text)
+		self.assertIn(f'grand_handler_duration_seconds_bucket{{{labels},le="+Inf"}} 3', text)
+		self.assertIn(f"grand_handler_duration_seconds_count{{{labels}}} 3", text)
+		self.assertIn(
+			'grand_handler_duration_seconds_bucket{handler="grand.x.job",doctype="Item \\"A\\"",le="300"} 0',
+			text,
+		)
+
+	def test_every_hook_and_job_is_instrumented(self):
+		for path in (*get_hook_handlers(), *JOBS):
+			with self.subTest(path=path):
+				module, name = path.rsplit(".", 1)
+				handler = getattr(importlib.import_module(module), name)
+				self.assertTrue(getattr(handler, "grand_instrumented", False))
@@ -0,0 +1,59 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.scripts import setup_deductions
+
+
+class TestSetupDeductions(FrappeTestCase):
+	def sync(self, doctypes, fieldnames):
+		def sql_list(query, values):
+			return fieldnames[values["doctype"]]
+
+		with (
+			patch.object(setup_deductions.frappe, "get_all", return_value=doctypes),
+			patch.object(
+				setup_deductions.frappe.db, "sql_list", create=True, side_effect=sql_list
+			) as sql_list,
+			patch.object(setup_deductions.frappe.db, "commit", create=True),
+			patch.object(setup_deductions.frappe, "get_doc") as get_doc,
+			patch.object(setup_deductions, "create_custom_fields") as create_custom_fields,
+		):
+			changes = setup_deductions.sync_deduction_schema()
+		return changes, sql_list.call_count, get_doc, create_custom_fields
+
+	def test_up_to_date_site_writes_nothing(self):
+		changes, queries, get_doc, create_custom_fields = self.sync(
+			[frappe._dict(name="Deduction", custom=0), frappe._dict(name="Deduction Table", custom=1)],
+			{
+				"Deduction Table": [
+					df["fieldname"] for df in setup_deductions.DEDUCTION_DOCTYPES["Deduction Table"]
+				],
+				"Sales Invoice": [
+					df["fieldname"] for df in setup_deductions.DEDUCTION_CUSTOM_FIELDS["Sales Invoice"]
+				],
+			},
+		)
+
+		self.assertEqual(queries, 2)
+		get_doc.assert_not_called()
+		create_custom_fields.assert_not_called()
+		self.assertFalse(changes.doctypes or changes.doctype_fields or changes.custom_fields)
+
+	def test_only_missing_pieces_are_created_in_one_call(self):
+		changes, queries, get_doc, create_custom_fields = self.sync(
+			[frappe._dict(name="Deduction", custom=0)],
+			{"Sales Invoice": ["deductions", "deduction_table", "selling_deductions_template"]},
+		)
+
+		self.assertEqual(queries, 1)
+		self.assertEqual(changes.doctypes, ["Deduction Table"])
+		get_doc.assert_called_once()
+		create_custom_fields.assert_called_once()
+		created = [df["fieldname"] for df in create_custom_fields.call_args.args[0]["Sales Invoice"]]
+		self.assertEqual(created[0], "contractor_order")
+		self.assertNotIn("deductions", created)
@@ -0,0 +1,46 @@
+# Copyright (c) 2026, Connect 4 Systems and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from grand.grand import tracing
+
+
+class TestTracing(FrappeTestCase):
+	def test_disabled_trace_is_shared_noop(self):
+		with patch.dict(frappe.conf, {"grand_trace": None}):
+			trace = tracing.start_trace("deduction_je", sales_invoice="SINV-1")
+		self.assertIs(trace, tracing.NULL_TRACE)
+		with trace.stage("parse"):
+			pass
+		self.assertIsNone(trace.finish())
+
+	def test_stage_timings_land_in_ring_buffer(self):
+		with patch.dict(frappe.conf, {"grand_trace": "INFO", "grand_trace_buffer": 2}):
+			for name in ("SINV-1", "SINV-2", "SINV-3"):
+				trace = tracing.start_trace("deduction_je", sales_invoice=name)
+				with trace.stage("parse"):
+					pass
+				trace.debug(accounts=["not logged at INFO"])
+				trace.finish(journal_entry="JV-1")
+
+		recent = list(tracing._recent_traces[frappe.local.site])
+		self.assertEqual([t["sales_invoice"] for t in recent], ["SINV-2", "SINV-3"])
+		self.assertIn("parse", recent[-1]["stages_ms"])
+		self.assertNotIn("accounts", recent[-1])
+
+	def test_ring_buffer_is_kept_per_site(self):
+		with (
+			patch.dict(frappe.conf, {"grand_trace": "INFO", "grand_trace_buffer": 5}),
+			patch("frappe.only_for", create=True),
+		):
+			with patch.object(frappe.local, "site", "_test_other_site"):
+				tracing.start_trace("deduction_je", sales_invoice="OTHER-1").finish()
+				self.assertEqual(len(tracing.get_recent_traces()), 1)
+			tracing.start_trace("deduction_je", sales_invoice="SINV-1").finish()
+
+			recent = tracing.get_recent_traces()
+		self.assertNotIn("OTHER-1", [t["sales_invoice"] for t in recent])
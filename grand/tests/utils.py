@@ -0,0 +1,12 @@
+class FakeDoc:
+	"""Attribute bag standing in for a Document whose doctype is not installed on the test site.
+
+	`frappe._dict` cannot be used for parents with an `items` table because the
+	attribute resolves to `dict.items`.
+	"""
+
+	def __init__(self, **fields):
+		self.__dict__.update(fields)
+
+	def get(self, fieldname, default=None):
+		return self.__dict__.get(fieldname, default)